@@ -1,9 +1,11 @@
 import streamlit as st
-import os, zipfile, io, pysubs2, re
+import os, zipfile, io, pysubs2, re, json
 from pathlib import Path
-from sub_engine import (merge_subtitles, extract_episode_code, translate_subs, 
+from sub_engine import (translate_subs, 
                         shift_subtitles, normalize_subtitle, analyze_corruption, 
-                        repair_corrupted_encoding)
+                        repair_corrupted_encoding, sanitize_subtitles, StageProfiler,
+                        EpisodeIndex, parse_track_keywords, track_order, track_settings, resolve_overlaps, MergeSession,
+                        detect_boilerplate, boilerplate_keys, CueIndex)
 
 st.set_page_config(page_title="Subtitles Forge", layout="wide", page_icon="🎬")
 
@@ -11,6 +13,10 @@ st.set_page_config(page_title="Subtitles Forge", layout="wide", page_icon="🎬"
 for key in ["m_res", "t_res", "s_res", "clean_res", "processing_log"]:
     if key not in st.session_state: 
         st.session_state[key] = {} if "res" in key else []
+if "m_keys" not in st.session_state:
+    st.session_state.m_keys = {}  # Merged file name -> merge_sessions key, for the time preview
+if "profiler" not in st.session_state:
+    st.session_state.profiler = StageProfiler()
 
 # Utility function for safe file cleanup
 def safe_cleanup(file_paths):
@@ -22,6 +28,87 @@ def safe_cleanup(file_paths):
         except Exception as e:
             st.warning(f"Could not delete {path}: {e}")
 
+def new_profiler():
+    """Start a fresh stage profiler for a processing run"""
+    st.session_state.profiler = StageProfiler(trace_memory=st.session_state.get("trace_memory", False))
+    return st.session_state.profiler
+
+def parse_timestamp(text):
+    """HH:MM:SS(.ms), MM:SS(.ms) or seconds as milliseconds (None if malformed)"""
+    try:
+        seconds = 0.0
+        for part in text.strip().replace(",", ".").split(":"):
+            seconds = seconds * 60 + float(part)
+        return int(seconds * 1000)
+    except ValueError:
+        return None
+
+def cue_rows(track_name, index, time_ms, window_ms):
+    """
+    Table rows of the cues of an indexed track around time_ms: ▶ marks the
+    ones active at time_ms, "Overlaps" counts the other cues of the track
+    each one overlaps
+    """
+    active = set(index.at(time_ms))
+    rows = []
+    for i in index.between(time_ms - window_ms, time_ms + window_ms):
+        line = index.events[i]
+        rows.append({"Track": track_name, "": "▶" if i in active else "",
+                     "Start": pysubs2.time.ms_to_str(line.start, fractions=True),
+                     "End": pysubs2.time.ms_to_str(line.end, fractions=True),
+                     "Overlaps": len(index.overlapping(i)) or "",
+                     "Text": re.sub(r'<[^>]+>', '', line.plaintext).replace("\n", " / ")})
+    return rows
+
+def index_uploads(files, track_keywords):
+    """Group uploaded files by episode (items are positions in `files`), cached across reruns"""
+    key = (tuple((f.name, f.size) for f in files), tuple(track_keywords))
+    cached = st.session_state.get("episode_index")
+    if cached is None or cached[0] != key:
+        index = EpisodeIndex(track_keywords)
+        for pos, f in enumerate(files):
+            index.add(f.name, pos)
+        cached = st.session_state.episode_index = (key, index)
+    return cached[1]
+
+def merge_session(code, pair, profiler, track_keywords):
+    """
+    Normalized, parsed tracks of one episode, kept across reruns: new merge
+    settings then only re-run the shift/match/color stages. Files whose name
+    carries no track keyword take the role of their identified language.
+    
+    Returns:
+        Tuple of (cache key, MergeSession, file names in track order)
+    """
+    key = (code, tuple((f.name, f.size) for f in pair), tuple(track_keywords))
+    sessions = st.session_state.setdefault("merge_sessions", {})
+    if key in sessions:
+        st.session_state.processing_log.append(f"{code}: reusing normalized tracks")
+        return (key, *sessions[key])
+    
+    temp_files = []
+    try:
+        tracks = []
+        for k, upload in enumerate(pair):
+            raw, clean = f"r{k + 1}.srt", f"c{k + 1}.srt"
+            temp_files.extend([raw, clean])
+            
+            # Save uploaded file, normalize encoding and identify the language from the same parse
+            with open(raw, "wb") as f: f.write(upload.getbuffer())
+            with profiler.file(upload.name):
+                _, enc, tier, lang = normalize_subtitle(raw, clean, identify=True)
+            st.session_state.processing_log.append(
+                f"{upload.name}: {enc} ({tier}), {lang['language']} {lang['confidence']}%")
+            tracks.append((track_order(upload.name, track_keywords, lang["language"]), k, upload.name, clean))
+        
+        tracks.sort()
+        with profiler.file(code):
+            session = MergeSession.from_files([clean for *_, clean in tracks])
+        sessions[key] = (session, [name for _, _, name, _ in tracks])
+    finally:
+        safe_cleanup(temp_files)
+    return (key, *sessions[key])
+
 # Add sidebar with app info and tips
 with st.sidebar:
     st.header("ℹ️ About")
@@ -39,8 +126,9 @@ with st.sidebar:
     with st.expander("Merger Tips"):
         st.markdown("""
         - Upload files in pairs (same episode code)
-        - Use keyword to identify Track B (e.g., "FR", "TH")
+        - Use keyword to identify Track B (e.g., "FR", "TH"); files without it in their name are placed by their detected language
         - Adjust threshold if subs don't align
+        - Try global alignment when one track splits sentences differently
         - Color coding helps distinguish tracks
         """)
     
@@ -53,10 +141,25 @@ with st.sidebar:
     
     st.divider()
     
-    if st.session_state.processing_log:
+    st.checkbox("Trace memory peaks (slower)", key="trace_memory",
+                help="Record tracemalloc peaks for each processing stage")
+    
+    profiler = st.session_state.profiler
+    if st.session_state.processing_log or profiler.records:
         with st.expander("📋 Processing Log", expanded=False):
             for log_entry in st.session_state.processing_log[-10:]:  # Last 10 entries
                 st.text(log_entry)
+            
+            if profiler.records:
+                st.caption("⏱️ Stage timings")
+                for name in profiler.summary():
+                    st.text(f"{name}: {profiler.breakdown(name)}")
+                
+                st.download_button("Export timings (JSON)", json.dumps(profiler.to_json(), indent=2),
+                                   "timings.json", "application/json", use_container_width=True)
+                st.download_button("Export Chrome trace", json.dumps(profiler.to_chrome_trace()),
+                                   "timings.trace.json", "application/json", use_container_width=True,
+                                   help="Open in ui.perfetto.dev or chrome://tracing")
 
 st.title("🎬 Subtitles Forge")
 tabs = st.tabs(["🔗 Merger", "🤖 AI Translator", "⏱️ Quick Sync", "🧼 Sanitizer", "🔧 Repair"])
@@ -79,8 +182,12 @@ with tabs[0]:
         col_t = c3.selectbox("Color track?", ["None", "Track A", "Track B"], index=2,
                             help="Which track to colorize in the output")
         hex_v = c3.color_picker("Color", "#FFFF54")
+        align = c2.checkbox("Global alignment", value=False,
+                            help="Pair cues over the whole file (overlap + text length) instead of nearest start. "
+                                 "Handles tracks that split sentences differently (1:2 and 2:1 merges)")
         kw_b = st.text_input("Track B Keyword (e.g. FR, TH, EN)", value="",
-                            help="Files containing this keyword will be assigned to Track B")
+                            help="Files containing this keyword will be assigned to Track B. "
+                                 "Several keywords (e.g. EN, FR) set the track order")
     
     m_files = st.file_uploader("Upload Subtitles", accept_multiple_files=True, key="m_up",
                                help="Upload subtitle pairs. Files will be auto-paired by episode code.")
@@ -88,78 +195,68 @@ with tabs[0]:
     # Show file preview
     if m_files:
         with st.expander("📂 Uploaded Files Preview", expanded=True):
-            groups = {}
-            for f in m_files:
-                code = extract_episode_code(f.name)
-                groups.setdefault(code, []).append(f.name)
+            index = index_uploads(m_files, parse_track_keywords(kw_b))
             
-            for code, files in groups.items():
-                if len(files) == 2:
-                    st.success(f"✅ **{code}**: {files[0]} + {files[1]}")
+            for _, code, items in index.episodes(min_tracks=1):
+                files = [m_files[i].name for i in items]
+                if len(files) >= 2:
+                    st.success(f"✅ **{code}**: {' + '.join(files)}")
                 else:
                     st.warning(f"⚠️ **{code}**: {len(files)} file(s) - {', '.join(files)}")
             
-            total_pairs = sum(1 for files in groups.values() if len(files) == 2)
-            st.info(f"**{total_pairs} valid pair(s)** ready to merge")
+            total_pairs = len(index.episodes(2))
+            st.info(f"**{total_pairs} valid pair(s)** ready to merge (episodes with 3+ tracks are stacked in track order)")
+    
+    clicked = st.button("🚀 Process Pairs", type="primary", disabled=not m_files)
     
-    if st.button("🚀 Process Pairs", type="primary", disabled=not m_files):
+    # Once merged, results follow the settings: only the stages after a changed setting re-run
+    settings_key = (thresh, s_a, s_b, s_g, col_t, hex_v, align, kw_b)
+    stale = bool(st.session_state.m_res) and st.session_state.get("merge_key") != settings_key
+    
+    if clicked or stale:
         if m_files:
             st.session_state.m_res = {}
+            st.session_state.m_keys = {}
             st.session_state.processing_log = []
-            groups = {}
-            
-            for f in m_files:
-                code = extract_episode_code(f.name)
-                groups.setdefault(code, []).append(f)
+            st.session_state.merge_key = settings_key
+            profiler = new_profiler()
+            index = index_uploads(m_files, parse_track_keywords(kw_b))
             
             progress_bar = st.progress(0)
             status_text = st.empty()
-            pairs = [pair for pair in groups.items() if len(pair[1]) == 2]
+            # Tracks come in name order (untagged files first, then by keyword); merge_session settles the roles
+            pairs = [(code, [m_files[i] for i in items]) for _, code, items in index.episodes(2)]
+            live = set()
             
             for idx, (code, pair) in enumerate(pairs):
                 status_text.text(f"Processing {code}... ({idx+1}/{len(pairs)})")
-                temp_files = []
                 
                 try:
-                    # Save uploaded files
-                    with open("r1.srt", "wb") as f: f.write(pair[0].getbuffer())
-                    with open("r2.srt", "wb") as f: f.write(pair[1].getbuffer())
-                    temp_files.extend(["r1.srt", "r2.srt"])
-                    
-                    # Normalize encoding
-                    normalize_subtitle("r1.srt", "c1.srt")
-                    normalize_subtitle("r2.srt", "c2.srt")
-                    temp_files.extend(["c1.srt", "c2.srt"])
-                    
-                    # Track logic
-                    if kw_b and kw_b.lower() in pair[0].name.lower(): 
-                        ta, tb = "c2.srt", "c1.srt"
-                        log_msg = f"{code}: {pair[1].name} (A) + {pair[0].name} (B)"
-                    else: 
-                        ta, tb = "c1.srt", "c2.srt"
-                        log_msg = f"{code}: {pair[0].name} (A) + {pair[1].name} (B)"
+                    key, session, names = merge_session(code, pair, profiler, parse_track_keywords(kw_b))
+                    live.add(key)
                     
-                    st.session_state.processing_log.append(log_msg)
+                    roles = " + ".join(f"{name} ({chr(ord('A') + k)})" for k, name in enumerate(names))
+                    st.session_state.processing_log.append(f"{code}: {roles}")
                     
-                    # Merge
+                    # Merge (2 tracks like merge_subtitles, 3+ like merge_tracks)
                     out = f"Merged_{code}.srt"
-                    merge_subtitles(ta, tb, out, thresh, hex_v, col_t, s_a, s_b, s_g)
+                    with profiler.file(code):
+                        merged = session.render(track_settings(len(pair), hex_v, col_t, s_a, s_b), thresh, s_g,
+                                                "align" if align else "greedy")
                     
-                    with open(out, "rb") as f: 
-                        st.session_state.m_res[out] = f.read()
-                    
-                    temp_files.append(out)
+                    st.session_state.m_res[out] = merged.to_string("srt").encode("utf-8")
+                    st.session_state.m_keys[out] = key
                     st.session_state.processing_log.append(f"✓ {code} merged successfully")
                     
                 except Exception as e:
                     st.session_state.processing_log.append(f"✗ {code} failed: {str(e)}")
                     st.error(f"Error processing {code}: {e}")
                 
-                finally:
-                    safe_cleanup(temp_files)
-                
                 progress_bar.progress((idx + 1) / len(pairs))
             
+            # Forget the tracks of episodes that are no longer uploaded
+            st.session_state.merge_sessions = {k: v for k, v in st.session_state.get("merge_sessions", {}).items()
+                                               if k in live}
             status_text.success(f"✅ Completed! Processed {len(st.session_state.m_res)} file(s)")
             st.rerun()
 
@@ -210,12 +307,32 @@ with tabs[0]:
             
             # Better preview with line numbers and more lines
             col_prev1, col_prev2 = st.columns([3, 1])
+            jump = col_prev1.text_input("Jump to (HH:MM:SS, empty for the start of the file)", "", key="m_jump",
+                                        help="Shows the cues of the merged file and of every track around that time")
             num_lines = col_prev2.slider("Preview lines", 10, 100, 40, step=10)
             
-            preview_snippet = "\n".join(lines[:num_lines])
-            
-            st.info(f"Showing first {num_lines} lines of: {preview_choice}")
-            st.code(preview_snippet, language="srt")
+            session_entry = st.session_state.get("merge_sessions", {}).get(
+                st.session_state.m_keys.get(preview_choice))
+            if jump.strip():
+                jump_ms = parse_timestamp(jump)
+                if jump_ms is None:
+                    st.error("⚠️ Format error. Use HH:MM:SS (e.g., 00:45:30.5)")
+                elif session_entry is None:
+                    st.warning("Process the pairs again to preview this file by time")
+                else:
+                    # Interval indexes are built once per result and track, so any time is one lookup
+                    session, names = session_entry
+                    window_ms = col_prev2.slider("Window (s)", 2, 60, 10) * 1000
+                    rows = cue_rows("Merged", session.index(), jump_ms, window_ms)
+                    for k, name in enumerate(names):
+                        rows += cue_rows(f"{chr(ord('A') + k)}: {name}", session.index(k), jump_ms, window_ms)
+                    st.info(f"Cues within {window_ms // 1000}s of {jump.strip()} (▶ active at that time)")
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+            else:
+                preview_snippet = "\n".join(lines[:num_lines])
+                
+                st.info(f"Showing first {num_lines} lines of: {preview_choice}")
+                st.code(preview_snippet, language="srt")
             
             # Show encoding verification
             has_thai = any('ก' <= c <= '๛' for line in lines[:20] for c in line)
@@ -239,7 +356,10 @@ with tabs[0]:
         # Clear results button
         if st.button("🗑️ Clear Results"):
             st.session_state.m_res = {}
+            st.session_state.m_keys = {}
+            st.session_state.merge_sessions = {}
             st.session_state.processing_log = []
+            st.session_state.profiler = StageProfiler()
             st.rerun()
 
 # --- TAB 2: AI TRANSLATOR ---
@@ -266,18 +386,21 @@ with tabs[1]:
         temp_files = ["raw_t.srt", "clean_t.srt"]
         try:
             with open("raw_t.srt", "wb") as f: f.write(file_t.getbuffer())
-            normalize_subtitle("raw_t.srt", "clean_t.srt")
+            profiler = new_profiler()
+            with profiler.file(file_t.name):
+                normalize_subtitle("raw_t.srt", "clean_t.srt")
             subs = pysubs2.load("clean_t.srt", encoding="utf-8")
             
             bar = st.progress(0)
             preview = st.empty()
             
-            for prog, orig, trans in translate_subs(subs, url, mod, sl, tl, ctx):
-                bar.progress(prog)
-                with preview.container():
-                    ca, cb = st.columns(2)
-                    ca.code("\n".join(orig), language="text")
-                    cb.code("\n".join(trans), language="text")
+            with profiler.file(file_t.name):
+                for prog, orig, trans in translate_subs(subs, url, mod, sl, tl, ctx):
+                    bar.progress(prog)
+                    with preview.container():
+                        ca, cb = st.columns(2)
+                        ca.code("\n".join(orig), language="text")
+                        cb.code("\n".join(trans), language="text")
             
             st.session_state.t_res = {
                 "n": f"Translated_{sl}_to_{tl}_{file_t.name}", 
@@ -350,11 +473,13 @@ with tabs[2]:
             normalize_subtitle("temp_sync.srt", "temp_clean.srt")
             
             subs = pysubs2.load("temp_clean.srt", encoding="utf-8")
+            original = CueIndex([line.copy() for line in subs])
             shift_subtitles(subs, sh, sp)
             
             st.session_state.s_res = {
                 "n": f"Synced_{file_s.name}", 
-                "d": subs.to_string(format_="srt")
+                "d": subs.to_string(format_="srt"),
+                "indexes": (original, CueIndex(subs.events))
             }
             st.success(f"✅ Applied: {sh}ms shift at {sp}x speed")
         except Exception as e:
@@ -369,6 +494,20 @@ with tabs[2]:
             file_name=st.session_state.s_res['n'],
             use_container_width=True
         )
+        
+        # Check the sync anywhere: cues before and after the change around a time
+        c_j, c_w = st.columns([3, 1])
+        jump = c_j.text_input("Compare at (HH:MM:SS)", "", key="s_jump")
+        window_s = c_w.slider("Window (s)", 2, 60, 10, key="s_window")
+        if jump.strip() and "indexes" in st.session_state.s_res:
+            jump_ms = parse_timestamp(jump)
+            if jump_ms is None:
+                st.error("⚠️ Format error. Use HH:MM:SS (e.g., 00:45:30.5)")
+            else:
+                original, synced = st.session_state.s_res["indexes"]
+                st.dataframe(cue_rows("Original", original, jump_ms, window_s * 1000) +
+                             cue_rows("Synced", synced, jump_ms, window_s * 1000),
+                             use_container_width=True, hide_index=True)
 
 # --- TAB 4: SANITIZER ---
 with tabs[3]:
@@ -381,6 +520,12 @@ with tabs[3]:
         rem_hi = col_c2.checkbox("Strip Hearing Impaired Tags (e.g., [Sighs], (Music))", value=False)
         rem_empty = col_c1.checkbox("Remove empty lines", value=True)
         fix_encoding = col_c2.checkbox("Fix encoding issues", value=True)
+        learn_bp = col_c2.checkbox("Learn boilerplate from the batch", value=False,
+                                   help="Drop lines repeated across the uploaded files (release signatures, "
+                                        "site adverts), found from their frequency rather than a fixed list")
+        overlap_policy = col_c1.selectbox("Overlapping cues", ["Keep", "trim", "shift", "stack"],
+                                          help="trim: end each cue where the next starts; shift: push the next "
+                                               "cue back; stack: show overlapping cues together")
         
         st.divider()
         st.subheader("Custom Find & Replace")
@@ -394,75 +539,74 @@ with tabs[3]:
         st.info(f"📂 {len(clean_files)} file(s) uploaded")
     
     if st.button("🧼 Run Sanitizer", type="primary", disabled=not clean_files):
+        if find_text:
+            try:
+                re.compile(find_text)
+            except re.error:
+                st.warning(f"Invalid regex in '{find_text}', skipping")
+                find_text = ""
+        
         if clean_files:
             results = {}
+            profiler = new_profiler()
             progress_bar = st.progress(0)
             status_text = st.empty()
             
+            # Pass 1: decode and parse every file (the boilerplate pass needs the whole batch)
+            parsed = []
             for idx, f in enumerate(clean_files):
-                status_text.text(f"Cleaning {f.name}... ({idx+1}/{len(clean_files)})")
+                status_text.text(f"Reading {f.name}... ({idx+1}/{len(clean_files)})")
                 temp_raw = f"raw_{f.name}"
                 temp_fixed = f"fixed_{f.name}"
                 
                 try:
                     with open(temp_raw, "wb") as tmp: tmp.write(f.getbuffer())
                     
-                    if fix_encoding:
-                        normalize_subtitle(temp_raw, temp_fixed)
-                    else:
-                        # Just copy if not fixing encoding
-                        with open(temp_raw, "rb") as src, open(temp_fixed, "wb") as dst:
-                            dst.write(src.read())
-                    
-                    subs = pysubs2.load(temp_fixed, encoding="utf-8")
-                    
-                    # Cleaning Logic
-                    new_lines = []
-                    ad_patterns = [
-                        r'subtitles? by', r'corrected by', r'www\.', r'\.com', 
-                        r'opensubtitles', r'addic7ed', r'subscene', r'yify'
-                    ]
-                    
-                    for line in subs:
-                        original_text = line.text
-                        
-                        # 1. Remove HI tags
-                        if rem_hi:
-                            line.text = re.sub(r'\[.*?\]|\(.*?\)', '', line.text)
-                        
-                        # 2. Custom Find/Replace
-                        if find_text:
-                            try:
-                                line.text = re.sub(find_text, replace_text, line.text)
-                            except re.error:
-                                st.warning(f"Invalid regex in '{find_text}', skipping")
-                        
-                        # 3. Strip whitespace
-                        line.text = line.text.strip()
-                        
-                        # 4. Ad Removal
-                        is_ad = False
-                        if rem_ads:
-                            is_ad = any(re.search(p, line.text, re.IGNORECASE) for p in ad_patterns)
-                        
-                        # 5. Empty line check
-                        is_empty = not line.text if rem_empty else False
+                    with profiler.file(f.name):
+                        if fix_encoding:
+                            _, enc, tier, _ = normalize_subtitle(temp_raw, temp_fixed)
+                            st.session_state.processing_log.append(f"{f.name}: {enc} ({tier})")
+                        else:
+                            # Just copy if not fixing encoding
+                            with open(temp_raw, "rb") as src, open(temp_fixed, "wb") as dst:
+                                dst.write(src.read())
                         
-                        if not is_ad and not is_empty:
-                            new_lines.append(line)
-                    
-                    subs.lines = new_lines
-                    subs.save(temp_fixed, encoding="utf-8")
-                    
-                    with open(temp_fixed, "rb") as res:
-                        results[f"Clean_{f.name}"] = res.read()
+                        parsed.append((f.name, pysubs2.load(temp_fixed, encoding="utf-8")))
                     
                 except Exception as e:
-                    st.error(f"Error cleaning {f.name}: {e}")
+                    st.error(f"Error reading {f.name}: {e}")
                 finally:
                     safe_cleanup([temp_raw, temp_fixed])
                 
-                progress_bar.progress((idx + 1) / len(clean_files))
+                progress_bar.progress((idx + 1) / (2 * len(clean_files)))
+            
+            boilerplate = ()
+            if learn_bp:
+                with profiler.file("batch"):
+                    findings = detect_boilerplate(subs for _, subs in parsed)
+                boilerplate = boilerplate_keys(findings)
+                for finding in findings:
+                    st.session_state.processing_log.append(
+                        f"Boilerplate ({finding['files']} files): {finding['text']}")
+            
+            # Pass 2: clean and serialize
+            for idx, (name, subs) in enumerate(parsed):
+                status_text.text(f"Cleaning {name}... ({idx+1}/{len(parsed)})")
+                try:
+                    with profiler.file(name):
+                        # Cleaning Logic
+                        removed = sanitize_subtitles(subs, rem_ads, rem_hi, rem_empty, find_text, replace_text,
+                                                     boilerplate)
+                        st.session_state.processing_log.append(f"{name}: {removed} line(s) removed")
+                        if overlap_policy != "Keep":
+                            changed = resolve_overlaps(subs, overlap_policy)
+                            st.session_state.processing_log.append(f"{name}: {changed} cues retimed ({overlap_policy})")
+                        results[f"Clean_{name}"] = subs.to_string(subs.format or "srt").encode("utf-8")
+                    
+                except Exception as e:
+                    st.error(f"Error cleaning {name}: {e}")
+                
+                progress_bar.progress((len(clean_files) + idx + 1) / (2 * len(clean_files)))
             
             st.session_state.clean_res = results
             status_text.success(f"✅ Cleaned {len(results)} file(s)")
@@ -544,6 +688,7 @@ with tabs[4]:
         
         analysis_results = {}
         repair_results = {}
+        profiler = new_profiler()
         
         progress_bar = st.progress(0)
         status_text = st.empty()
@@ -557,18 +702,24 @@ with tabs[4]:
                 with open(temp_file, "wb") as tmp:
                     tmp.write(f.getbuffer())
                 
-                # Analyze corruption
-                analysis = analyze_corruption(temp_file)
+                # Analyze corruption (one pass; the report is reused by the repair step)
+                do_repair = repair_mode == "🔧 Analyze & Repair"
+                with profiler.file(f.name):
+                    analysis = analyze_corruption(temp_file, target_script, keep_buffer=do_repair)
                 analysis_results[f.name] = analysis
                 
                 # If repair mode, attempt repair
-                if repair_mode == "🔧 Analyze & Repair":
+                if do_repair:
                     repair_output = f"repaired_{f.name}"
-                    success, corruption_type, applied_fix = repair_corrupted_encoding(
-                        temp_file, 
-                        repair_output, 
-                        target_script
-                    )
+                    with profiler.file(f.name):
+                        success, corruption_type, applied_fix, strategy_scores = repair_corrupted_encoding(
+                            temp_file, 
+                            repair_output, 
+                            target_script,
+                            report=analysis
+                        )
+                    analysis.pop("raw_data", None)
+                    analysis_results[f.name]["strategy_scores"] = strategy_scores
                     
                     if success:
                         with open(repair_output, "rb") as repaired:
@@ -611,6 +762,27 @@ with tabs[4]:
                     with col3:
                         st.metric("File Size", f"{analysis.get('file_size_bytes', 0) / 1024:.1f} KB")
                     
+                    if profiler.records:
+                        st.caption(f"⏱️ {profiler.breakdown(filename)}")
+                    
+                    if "utf8_valid" in analysis:
+                        st.caption(
+                            f"UTF-8 valid: {'yes' if analysis['utf8_valid'] else 'no'} · "
+                            f"Suspected codepage: {analysis.get('suspected_codepage') or 'unknown'} "
+                            f"({analysis.get('detection_tier')})"
+                        )
+                    
+                    if analysis.get("encoding_regions"):
+                        st.write("**Encoding Regions** (mixed-encoding file):")
+                        for region in analysis["encoding_regions"]:
+                            st.text(f"Cues {region['first_cue']}-{region['last_cue']}: {region['encoding']} "
+                                    f"(bytes {region['start']}-{region['end']})")
+                    
+                    if analysis.get("mojibake_hits"):
+                        st.write("**Mojibake Hits:**")
+                        for pattern_name, hit in analysis["mojibake_hits"].items():
+                            st.text(f"{pattern_name}: {hit['count']} (first at char {hit['positions'][0]})")
+                    
                     st.write("**Corruption Indicators:**")
                     for indicator in analysis.get("corruption_indicators", []):
                         if "None" in indicator:
@@ -629,6 +801,14 @@ with tabs[4]:
                             st.caption(f"Method: {analysis.get('repair_method', 'unknown')}")
                         else:
                             st.error(analysis["repair_status"])
+                    
+                    if analysis.get("strategy_scores"):
+                        st.write("**Strategy Scores** (plausibility on sampled windows, best first):")
+                        st.table([
+                            {"Strategy": s["strategy"], "Corruption": s["corruption_type"],
+                             "Score": "n/a" if s["score"] is None else f"{s['score']:.3f}"}
+                            for s in analysis["strategy_scores"]
+                        ])
         
         # Download repaired files
         if repair_results:
@@ -0,0 +1,123 @@
+"""
+Greedy vs global alignment matching on tracks that split sentences differently.
+
+    python -m benchmarks.bench_alignment                    # 500 and 2000 cues
+    python -m benchmarks.bench_alignment --sizes 10000 --split 0.3 --join 0.1
+
+Track B is derived from Track A with a known ground truth: a share of the
+cues of A is split in two in B (--split), a share of pairs of consecutive
+cues is joined into one (--join) and every time is jittered. Both match
+modes of sub_engine.match_cues are timed on the same tracks and scored:
+
+    pairing accuracy   share of the cues of B attached to exactly the right cues of A
+    exact groups       share of the true groups (1:1, 1:2, 2:1) found as such
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysubs2  # noqa: E402
+
+import sub_engine  # noqa: E402
+from benchmarks.corpus import generate_track  # noqa: E402
+
+
+def make_split_pair(n_cues: int, split: float, join: float, jitter_ms: int,
+                    seed: int) -> Tuple[pysubs2.SSAFile, pysubs2.SSAFile, List[Tuple[List[int], List[int]]]]:
+    """
+    Build Track A, a re-segmented Track B and the true groups
+
+    Returns:
+        Tuple of (track A, track B, [(indices in A, indices in B)])
+    """
+    track_a = generate_track(n_cues, "latin", seed=seed)
+    track_b = generate_track(n_cues, "thai", seed=seed + 1)  # Only its texts are used
+    rng = random.Random(seed + 2)
+    texts = [line.text for line in track_b]
+
+    def jitter(ms):
+        return max(0, ms + rng.randint(-jitter_ms, jitter_ms))
+
+    events, truth = [], []
+    i = 0
+    while i < n_cues:
+        cue = track_a[i]
+        roll = rng.random()
+        if roll < join and i + 1 < n_cues:
+            nxt = track_a[i + 1]
+            start = jitter(cue.start)
+            events.append(pysubs2.SSAEvent(start=start, end=max(start + 1, jitter(nxt.end)), text=texts[i]))
+            truth.append(([i, i + 1], [len(events) - 1]))
+            i += 2
+            continue
+        if roll < join + split:
+            middle = (cue.start + cue.end) // 2
+            first = pysubs2.SSAEvent(start=jitter(cue.start), end=middle, text=texts[i][:len(texts[i]) // 2])
+            second = pysubs2.SSAEvent(start=middle + 40, end=max(middle + 41, jitter(cue.end)),
+                                      text=texts[i][len(texts[i]) // 2:])
+            events.extend([first, second])
+            truth.append(([i], [len(events) - 2, len(events) - 1]))
+        else:
+            start = jitter(cue.start)
+            events.append(pysubs2.SSAEvent(start=start, end=max(start + 1, jitter(cue.end)), text=texts[i]))
+            truth.append(([i], [len(events) - 1]))
+        i += 1
+
+    track_b.events = events
+    return track_a, track_b, truth
+
+
+def score(groups, truth) -> dict:
+    """Pairing accuracy and exact groups of a match_cues result against the truth"""
+    want = {j: tuple(a_idx) for a_idx, b_idx in truth for j in b_idx}
+    got = {j: tuple(sorted(a_idx)) for a_idx, b_idx in groups for j in b_idx}
+    found = {(tuple(sorted(a)), tuple(sorted(b))) for a, b in groups if a and b}
+    return {
+        "accuracy": round(sum(1 for j, a in want.items() if got.get(j) == a) / len(want), 4),
+        "exact_groups": round(sum(1 for a, b in truth if (tuple(a), tuple(b)) in found) / len(truth), 4),
+    }
+
+
+def run(sizes: List[int], split: float, join: float, jitter_ms: int, threshold_ms: int, seed: int) -> List[dict]:
+    rows = []
+    for size in sizes:
+        track_a, track_b, truth = make_split_pair(size, split, join, jitter_ms, seed)
+        row = {"cues": size, "results": {}}
+        for mode in sub_engine.MATCH_MODES:
+            started = time.perf_counter()
+            groups = sub_engine.match_cues(track_a.events, track_b.events, threshold_ms, mode)
+            elapsed = time.perf_counter() - started
+            row["results"][mode] = {"seconds": round(elapsed, 4), **score(groups, truth)}
+            result = row["results"][mode]
+            print(f"{size:>7d} cues  {mode:7s} {elapsed * 1000:10.1f} ms  "
+                  f"accuracy {result['accuracy'] * 100:5.1f}%  exact groups {result['exact_groups'] * 100:5.1f}%")
+        rows.append(row)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="500,2000", help="Comma-separated cue counts of Track A")
+    parser.add_argument("--split", type=float, default=0.2, help="Share of cues of A split in two in B")
+    parser.add_argument("--join", type=float, default=0.1, help="Share of cue pairs of A joined in B")
+    parser.add_argument("--jitter", type=int, default=250, help="Random +/- offset on every time of B (ms)")
+    parser.add_argument("--threshold", type=int, default=1000, help="threshold_ms given to match_cues")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    rows = run([int(s) for s in args.sizes.split(",")], args.split, args.join, args.jitter, args.threshold, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"split": args.split, "join": args.join, "jitter_ms": args.jitter, "rows": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
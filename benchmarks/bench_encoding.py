@@ -0,0 +1,176 @@
+"""
+Accuracy / throughput / memory matrix for the encoding detectors and repair paths.
+
+    python -m benchmarks.bench_encoding                 # full matrix, 500 cues per file
+    python -m benchmarks.bench_encoding --cues 5000 -o encoding.json
+
+For every (language, corruption, rate) case of encoding_corpus.stress_matrix()
+each path is run on the same file and scored against the ground truth:
+
+    normalize_subtitle / repair_corrupted_encoding
+        share of cues whose output text equals the clean text
+    analyze_corruption
+        1.0 when both the corrupted/clean verdict and the script are right,
+        0.5 when only one of them is
+    detect_encoding
+        1.0 when the detected encoding decodes the file like the true one
+        (only scored for clean and wrong_codepage files)
+
+Throughput is file size over wall time; peak memory comes from a second,
+tracemalloc-instrumented run so it does not distort the timing.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysubs2  # noqa: E402
+
+import sub_engine  # noqa: E402
+from benchmarks.corpus import SCRIPT_ENCODINGS  # noqa: E402
+from benchmarks.encoding_corpus import LANGUAGES, make_case, stress_matrix  # noqa: E402
+
+
+def _cue_accuracy(output_path: str, truth: List[str]) -> float:
+    texts = [line.text for line in pysubs2.load(output_path, encoding="utf-8")]
+    return sum(1 for got, want in zip(texts, truth) if got == want) / len(truth)
+
+
+def _path_normalize(raw_path, out_path, case):
+    sub_engine.normalize_subtitle(raw_path, out_path, case["language"])
+    return lambda: _cue_accuracy(out_path, case["truth"])
+
+
+def _path_repair(raw_path, out_path, case):
+    success = sub_engine.repair_corrupted_encoding(raw_path, out_path, case["language"])[0]
+    return lambda: _cue_accuracy(out_path, case["truth"]) if success else 0.0
+
+
+def _path_analyze(raw_path, out_path, case):
+    analysis = sub_engine.analyze_corruption(raw_path)
+
+    def score():
+        said_clean = any("None" in i for i in analysis.get("corruption_indicators", []))
+        verdict_ok = said_clean == (case["corruption"] == "clean")
+        script_ok = analysis.get("detected_script") == case["language"]
+        return (verdict_ok + script_ok) / 2
+    return score
+
+
+def _path_detect(raw_path, out_path, case):
+    with open(raw_path, "rb") as f:
+        data = f.read()
+    detected, _ = sub_engine.detect_encoding(data, case["language"])
+
+    def score():
+        if case["corruption"] == "clean":
+            expected = "utf-8"
+        elif case["corruption"] == "wrong_codepage":
+            expected = SCRIPT_ENCODINGS[LANGUAGES[case["language"]]]
+        else:
+            return None
+        try:
+            return float(data.decode(detected) == data.decode(expected))
+        except (UnicodeDecodeError, LookupError, TypeError):
+            return 0.0
+    return score
+
+
+# name -> run(raw_path, out_path, case) returning a zero-argument scorer
+PATHS: Dict[str, Callable] = {
+    "detect_encoding": _path_detect,
+    "normalize_subtitle": _path_normalize,
+    "analyze_corruption": _path_analyze,
+    "repair_corrupted_encoding": _path_repair,
+}
+
+
+def run_matrix(n_cues: int, rates, paths: List[str], seed: int,
+               log: Callable[[str], None] = print) -> List[dict]:
+    """
+    Run every path on every stress case
+
+    Returns:
+        One row per case: {language, corruption, rate, bytes, results: {path: {accuracy, mb_s, peak_kb}}}
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        raw_path = os.path.join(work_dir, "case.srt")
+        out_path = os.path.join(work_dir, "out.srt")
+
+        for language, corruption, rate in stress_matrix(rates):
+            data, truth = make_case(language, corruption, rate, n_cues, seed)
+            with open(raw_path, "wb") as f:
+                f.write(data)
+            case = {"language": language, "corruption": corruption, "rate": rate, "truth": truth}
+            row = {"language": language, "corruption": corruption, "rate": rate, "bytes": len(data), "results": {}}
+
+            for name in paths:
+                started = time.perf_counter()
+                try:
+                    scorer = PATHS[name](raw_path, out_path, case)
+                    elapsed = time.perf_counter() - started
+                    accuracy = scorer()
+                except Exception as e:
+                    row["results"][name] = {"error": str(e)}
+                    continue
+
+                tracemalloc.start()
+                PATHS[name](raw_path, out_path, case)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                row["results"][name] = {
+                    "accuracy": None if accuracy is None else round(accuracy, 4),
+                    "mb_s": round(len(data) / 1e6 / elapsed, 3) if elapsed else None,
+                    "peak_kb": round(peak / 1024, 1),
+                }
+            rows.append(row)
+            log(format_row(row, paths))
+    return rows
+
+
+def format_row(row: dict, paths: List[str]) -> str:
+    cells = []
+    for name in paths:
+        result = row["results"].get(name, {})
+        if "error" in result:
+            cells.append(f"{'error':>22s}")
+            continue
+        acc = "  n/a" if result["accuracy"] is None else f"{result['accuracy'] * 100:4.0f}%"
+        cells.append(f"{acc} {result['mb_s']:7.2f}MB/s {result['peak_kb']:6.0f}K")
+    label = f"{row['language']:8s} {row['corruption']:20s} {row['rate']:4.0%}"
+    return f"{label} | " + " | ".join(cells)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cues", type=int, default=500, help="Cues per generated file")
+    parser.add_argument("--rates", default="0.1,0.5,1.0", help="Corruption rates to test")
+    parser.add_argument("--only", default="", help="Comma-separated paths (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the matrix as JSON here")
+    args = parser.parse_args(argv)
+
+    paths = [p for p in args.only.split(",") if p] or list(PATHS)
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        parser.error(f"unknown path(s): {', '.join(unknown)}")
+
+    print(f"{'case':35s} | " + " | ".join(f"{p[:22]:>22s}" for p in paths))
+    rows = run_matrix(args.cues, [float(r) for r in args.rates.split(",")], paths, args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cues": args.cues, "seed": args.seed, "rows": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
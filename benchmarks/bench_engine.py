@@ -0,0 +1,308 @@
+"""
+Benchmark every public sub_engine function on synthetic tracks.
+
+    python -m benchmarks.bench_engine                          # 100 .. 100k cues
+    python -m benchmarks.bench_engine --sizes 100,1000 -o run.json
+    python -m benchmarks.bench_engine --baseline main.json --max-slowdown 1.25
+
+Results are saved as JSON ({function: {size: seconds}}) so runs can be
+compared. With --baseline, the exit code is 1 when any measurement is more
+than --max-slowdown times slower than the baseline. A function whose last
+size took longer than --budget seconds is not run at larger sizes (recorded
+as null), which keeps quadratic code paths from stalling the suite.
+translate_subs is not covered: it is bound by the LLM server.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysubs2  # noqa: E402
+
+import sub_engine  # noqa: E402
+from benchmarks.corpus import SCRIPT_ENCODINGS, generate_pair, generate_track, write_track  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+NOISE_FLOOR_S = 0.005  # Differences below this are timer noise, never a regression
+
+
+class Fixture:
+    """Synthetic inputs for one size, generated once and shared by all benchmarks"""
+
+    def __init__(self, size: int, work_dir: str, seed: int):
+        self.size = size
+        self.work_dir = work_dir
+        self.track_a, self.track_b = generate_pair(size, "thai", seed=seed)
+        self.overlapping = generate_track(size, "latin", overlap_density=0.3, jitter_ms=200, seed=seed)
+
+        self.srt_a = write_track(self.track_a, self.path("a.srt"))
+        self.srt_b = write_track(self.track_b, self.path("b.srt"))
+        self.srt_c = write_track(generate_pair(size, "cjk", seed=seed)[1], self.path("c.srt"))
+        self.srt_legacy = write_track(generate_track(size, "latin", seed=seed), self.path("legacy.srt"),
+                                      SCRIPT_ENCODINGS["latin"])
+        mojibake = self.track_b.to_string("srt").encode("utf-8").decode("latin-1")
+        with open(self.path("mojibake.srt"), "wb") as f:
+            f.write(mojibake.encode("utf-8"))
+        self.srt_mojibake = self.path("mojibake.srt")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.work_dir, f"{self.size}_{name}")
+
+    def fresh(self, subs: pysubs2.SSAFile) -> pysubs2.SSAFile:
+        """Independent copy for functions that modify the track in place"""
+        copy = pysubs2.SSAFile()
+        copy.events = [line.copy() for line in subs]
+        return copy
+
+
+# name -> setup(fixture) returning the zero-argument callable to time
+BENCHMARKS: Dict[str, Callable[[Fixture], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function under a benchmark name"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("normalize_subtitle[utf8]")
+def _normalize_utf8(fx):
+    return lambda: sub_engine.normalize_subtitle(fx.srt_a, fx.path("out.srt"))
+
+
+@benchmark("normalize_subtitle[legacy]")
+def _normalize_legacy(fx):
+    return lambda: sub_engine.normalize_subtitle(fx.srt_legacy, fx.path("out.srt"))
+
+
+@benchmark("detect_encoding")
+def _detect_encoding(fx):
+    with open(fx.srt_legacy, "rb") as f:
+        data = f.read()
+    return lambda: sub_engine.detect_encoding(data)
+
+
+@benchmark("validate_subtitle_file")
+def _validate(fx):
+    return lambda: sub_engine.validate_subtitle_file(fx.srt_a)
+
+
+@benchmark("analyze_corruption")
+def _analyze(fx):
+    return lambda: sub_engine.analyze_corruption(fx.srt_mojibake)
+
+
+@benchmark("repair_corrupted_encoding")
+def _repair(fx):
+    return lambda: sub_engine.repair_corrupted_encoding(fx.srt_mojibake, fx.path("out.srt"))
+
+
+@benchmark("merge_subtitles")
+def _merge(fx):
+    return lambda: sub_engine.merge_subtitles(fx.srt_a, fx.srt_b, fx.path("merged.srt"))
+
+
+@benchmark("merge_subtitles[align]")
+def _merge_align(fx):
+    return lambda: sub_engine.merge_subtitles(fx.srt_a, fx.srt_b, fx.path("merged.srt"), mode="align")
+
+
+@benchmark("merge_tracks[2]")
+def _merge_tracks_2(fx):
+    return lambda: sub_engine.merge_tracks([fx.srt_a, fx.srt_b], fx.path("merged.srt"))
+
+
+@benchmark("merge_tracks[3]")
+def _merge_tracks_3(fx):
+    return lambda: sub_engine.merge_tracks([fx.srt_a, fx.srt_b, fx.srt_c], fx.path("merged.srt"))
+
+
+@benchmark("MergeSession[recolor]")
+def _merge_session_recolor(fx):
+    session = sub_engine.MergeSession.from_files([fx.srt_a, fx.srt_b])
+    session.render(sub_engine.track_settings(2, "#ffff54"))
+    return lambda: session.render(sub_engine.track_settings(2, "#54ffff"))
+
+
+@benchmark("merge_streams")
+def _merge_streams(fx):
+    return lambda: sum(1 for _ in sub_engine.merge_streams(fx.track_a, fx.track_b))
+
+
+@benchmark("segment_webvtt")
+def _segment_webvtt(fx):
+    return lambda: sub_engine.segment_webvtt(fx.track_a, fx.path("hls"), segment_ms=6000)
+
+
+@benchmark("CueIndex[1000 queries]")
+def _cue_index(fx):
+    index = sub_engine.CueIndex(fx.overlapping)
+    span = max(line.end for line in fx.overlapping)
+    return lambda: [index.at(span * k // 1000) for k in range(1000)]
+
+
+@benchmark("remove_duplicates")
+def _remove_duplicates(fx):
+    subs = fx.fresh(fx.overlapping)
+    return lambda: sub_engine.remove_duplicates(subs)
+
+
+@benchmark("fix_common_issues")
+def _fix_common_issues(fx):
+    subs = fx.fresh(fx.overlapping)
+    return lambda: sub_engine.fix_common_issues(subs)
+
+
+@benchmark("analyze_timing")
+def _analyze_timing(fx):
+    return lambda: sub_engine.analyze_timing(fx.overlapping)
+
+
+@benchmark("identify_track")
+def _identify_track(fx):
+    return lambda: sub_engine.identify_track(fx.overlapping)
+
+
+@benchmark("resolve_overlaps")
+def _resolve_overlaps(fx):
+    subs = fx.fresh(fx.overlapping)
+    return lambda: sub_engine.resolve_overlaps(subs, "trim")
+
+
+@benchmark("shift_subtitles")
+def _shift(fx):
+    subs = fx.fresh(fx.track_a)
+    return lambda: sub_engine.shift_subtitles(subs, 250, 1.001)
+
+
+@benchmark("detect_boilerplate")
+def _detect_boilerplate(fx):
+    return lambda: sub_engine.detect_boilerplate([fx.track_a, fx.track_b, fx.overlapping])
+
+
+@benchmark("sanitize_subtitles")
+def _sanitize(fx):
+    subs = fx.fresh(fx.track_a)
+    return lambda: sub_engine.sanitize_subtitles(subs, remove_hi=True)
+
+
+@benchmark("extract_episode_code")
+def _extract_episode_code(fx):
+    names = [f"Show.S{i // 100 + 1:02d}E{i % 100:02d}.1080p.FR.srt" for i in range(fx.size)]
+    sub_engine.extract_episode_code.cache_clear()  # Time the patterns, not the cache
+    return lambda: [sub_engine.extract_episode_code(n) for n in names]
+
+
+@benchmark("EpisodeIndex")
+def _episode_index(fx):
+    names = [f"Show.S{i // 200 + 1:02d}E{i // 2 % 100:02d}.1080p.{('EN', 'FR')[i % 2]}.srt" for i in range(fx.size)]
+    sub_engine.extract_episode_code.cache_clear()
+    return lambda: sub_engine.EpisodeIndex(["EN", "FR"]).add_all(names).episodes()
+
+
+def run_benchmarks(sizes: List[int], names: List[str], repeat: int, budget_s: float,
+                   seed: int, log: Callable[[str], None] = print) -> dict:
+    """
+    Time each benchmark at each size (best of `repeat`)
+
+    Returns:
+        {"meta": {...}, "results": {name: {size: seconds or None}}}
+    """
+    results = {name: {} for name in names}
+    over_budget = set()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            fixture = Fixture(size, work_dir, seed)
+            for name in names:
+                if name in over_budget:
+                    results[name][str(size)] = None
+                    continue
+                best = None
+                for _ in range(repeat if size < 100000 else 1):
+                    fn = BENCHMARKS[name](fixture)
+                    started = time.perf_counter()
+                    fn()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                results[name][str(size)] = round(best, 6)
+                log(f"{name:32s} {size:>7d} cues  {best * 1000:10.2f} ms")
+                if best > budget_s:
+                    over_budget.add(name)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pysubs2": pysubs2.__version__,
+            "seed": seed,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_slowdown: float) -> List[str]:
+    """
+    List regressions of `current` against `baseline`
+
+    Returns:
+        Human-readable regression messages (empty if none)
+    """
+    regressions = []
+    for name, by_size in current["results"].items():
+        for size, seconds in by_size.items():
+            before = baseline.get("results", {}).get(name, {}).get(size)
+            if seconds is None or before is None:
+                continue
+            if seconds > before * max_slowdown and seconds - before > NOISE_FLOOR_S:
+                regressions.append(f"{name} @ {size} cues: {before * 1000:.2f} ms -> {seconds * 1000:.2f} ms "
+                                   f"(x{seconds / before:.2f})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated cue counts")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is kept)")
+    parser.add_argument("--budget", type=float, default=30.0, help="Seconds after which larger sizes are skipped")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.25, help="Allowed ratio against the baseline")
+    args = parser.parse_args(argv)
+
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    current = run_benchmarks([int(s) for s in args.sizes.split(",")], names, args.repeat, args.budget, args.seed)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(current, json.load(f), args.max_slowdown)
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        if regressions:
+            return 1
+        print(f"No regression beyond x{args.max_slowdown}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Matroska subtitle extraction cost against file size.
+
+    python -m benchmarks.bench_matroska                      # 2 KB and 64 KB video frames
+    python -m benchmarks.bench_matroska --frame-kb 4,128 --minutes 20
+
+Synthetic episodes with the same number of frames (video at 24 fps, audio
+every 32 ms, two subtitle tracks) but different video frame sizes are
+written with write_mkv, then extracted. Extraction walks element headers
+and skips payloads, so its time should follow the element count, not the
+file size. Every run checks the extracted cues against the source tracks.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysubs2  # noqa: E402
+
+import sub_engine  # noqa: E402
+from benchmarks.corpus import generate_track  # noqa: E402
+
+
+def _size(n: int) -> bytes:
+    length = 1
+    while n >= (1 << (7 * length)) - 1:
+        length += 1
+    return (n | (1 << (7 * length))).to_bytes(length, "big")
+
+
+def element(element_id: int, payload: bytes) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + _size(len(payload)) + payload
+
+
+def uint(element_id: int, value: int) -> bytes:
+    return element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+def _block(track: int, relative: int, payload: bytes, keyframe: bool = True) -> bytes:
+    return bytes([0x80 | track]) + relative.to_bytes(2, "big", signed=True) + bytes([0x80 if keyframe else 0]) + payload
+
+
+def _ass_parts(subs: pysubs2.SSAFile) -> Tuple[bytes, List[bytes]]:
+    """(CodecPrivate header, block payloads) of an ASS track as Matroska stores them"""
+    text = subs.to_string("ass")
+    header = text[:text.index("[Events]")] + "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    payloads = [f"{k},{line.layer},{line.style},{line.name},{line.marginl},{line.marginr},{line.marginv},"
+                f"{line.effect},{line.text}".encode("utf-8") for k, line in enumerate(subs)]
+    return header.encode("utf-8"), payloads
+
+
+def write_mkv(path: str, subtitles: Sequence[Tuple[str, str, pysubs2.SSAFile]], duration_ms: int,
+              frame_bytes: int = 2048, cluster_ms: int = 5000, compress: bool = False,
+              unknown_size_clusters: bool = False) -> int:
+    """
+    Write a synthetic Matroska file: one video track (24 fps), one audio track
+    and the given subtitle tracks as BlockGroups with durations
+
+    Args:
+        subtitles: (codec, language, track) tuples; codec is S_TEXT/UTF8 or S_TEXT/ASS
+        frame_bytes: Payload size of every video frame
+        compress: zlib-compress the subtitle tracks (ContentEncoding)
+        unknown_size_clusters: Write clusters with an unknown size (live-muxer style)
+
+    Returns:
+        File size in bytes
+    """
+    entries = [element(0xAE, uint(0xD7, 1) + uint(0x83, 1) + element(0x86, b"V_MPEG4/ISO/AVC")),
+               element(0xAE, uint(0xD7, 2) + uint(0x83, 2) + element(0x86, b"A_AAC"))]
+    cues = []
+    for k, (codec, language, subs) in enumerate(subtitles):
+        number = 3 + k
+        private = b""
+        if codec == "S_TEXT/ASS":
+            private, payloads = _ass_parts(subs)
+        else:
+            payloads = [line.text.replace("\\N", "\n").encode("utf-8") for line in subs]
+        encodings = element(0x6D80, element(0x6240, element(0x5034, uint(0x4254, 0)))) if compress else b""
+        entries.append(element(0xAE, uint(0xD7, number) + uint(0x83, 0x11) + element(0x86, codec.encode()) +
+                               element(0x22B59C, language.encode()) + (element(0x63A2, private) if private else b"") +
+                               encodings))
+        for line, payload in zip(subs, payloads):
+            cues.append((line.start, number, line.end - line.start, zlib.compress(payload) if compress else payload))
+    cues.sort()
+
+    video = bytes(frame_bytes)
+    audio = bytes(256)
+    with open(path, "wb") as f:
+        f.write(element(0x1A45DFA3, element(0x4282, b"matroska") + uint(0x4287, 4) + uint(0x4285, 2)))
+        f.write(bytes.fromhex("18538067") + bytes.fromhex("01FFFFFFFFFFFFFF"))  # Segment of unknown size
+        f.write(element(0x1549A966, uint(0x2AD7B1, 1_000_000) + element(0x4D80, b"bench_matroska")))
+        f.write(element(0x1654AE6B, b"".join(entries)))
+
+        next_cue = 0
+        for cluster_start in range(0, duration_ms, cluster_ms):
+            cluster_end = min(duration_ms, cluster_start + cluster_ms)
+            blocks = []
+            frame = -(-cluster_start * 24 // 1000)
+            while frame * 1000 // 24 < cluster_end:
+                blocks.append((frame * 1000 // 24, 1, element(0xA3, _block(1, frame * 1000 // 24 - cluster_start, video))))
+                frame += 1
+            for t in range(-(-cluster_start // 32) * 32, cluster_end, 32):
+                blocks.append((t, 2, element(0xA3, _block(2, t - cluster_start, audio))))
+            while next_cue < len(cues) and cues[next_cue][0] < cluster_end:
+                start, number, duration, payload = cues[next_cue]
+                group = element(0xA1, _block(number, start - cluster_start, payload, keyframe=False))
+                blocks.append((start, number, element(0xA0, group + uint(0x9B, duration))))
+                next_cue += 1
+            blocks.sort(key=lambda b: b[:2])
+            body = uint(0xE7, cluster_start) + b"".join(b for _, _, b in blocks)
+            if unknown_size_clusters:
+                f.write(bytes.fromhex("1F43B675") + bytes.fromhex("01FFFFFFFFFFFFFF") + body)
+            else:
+                f.write(element(0x1F43B675, body))
+        return f.tell()
+
+
+def _same(extracted: pysubs2.SSAFile, source: pysubs2.SSAFile) -> bool:
+    return [(l.start, l.end, l.plaintext) for l in extracted] == [(l.start, l.end, l.plaintext) for l in source]
+
+
+def run(frame_sizes: List[int], minutes: float, cues: int, work_dir: str) -> List[dict]:
+    duration_ms = int(minutes * 60_000)
+    track_a = generate_track(cues, "latin", seed=1)
+    track_b = generate_track(cues, "thai", seed=2)
+    for track in (track_a, track_b):
+        track.events = [line for line in track if line.end < duration_ms]
+        for line in track:
+            line.start, line.end = line.start // 10 * 10, line.end // 10 * 10  # ASS keeps centiseconds
+
+    rows = []
+    for frame_kb in frame_sizes:
+        path = os.path.join(work_dir, f"episode_{frame_kb}k.mkv")
+        size = write_mkv(path, [("S_TEXT/UTF8", "fre", track_a), ("S_TEXT/ASS", "tha", track_b)],
+                         duration_ms, frame_bytes=frame_kb * 1024)
+        started = time.perf_counter()
+        read = sub_engine.read_subtitle_tracks(path)
+        elapsed = time.perf_counter() - started
+
+        extracted = [pysubs2.SSAFile.from_string(t["data"].decode("utf-8")) for t in read["tracks"]]
+        ok = _same(extracted[0], track_a) and _same(extracted[1], track_b)
+        stats = read["stats"]
+        rows.append({"frame_kb": frame_kb, "file_mb": round(size / 2 ** 20, 1), "seconds": round(elapsed, 4),
+                     "ok": ok, **stats})
+        print(f"{size / 2 ** 20:9.1f} MB  {stats['elements']:>8d} elements  {elapsed * 1000:8.1f} ms  "
+              f"{stats['file_size'] / elapsed / 2 ** 30:7.2f} GB/s  cues {'match' if ok else 'DIFFER'}")
+        os.remove(path)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--frame-kb", default="2,64", help="Comma-separated video frame sizes in KB")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Episode duration")
+    parser.add_argument("--cues", type=int, default=400, help="Cues per subtitle track (before trimming)")
+    parser.add_argument("-o", "--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        rows = run([int(s) for s in args.frame_kb.split(",")], args.minutes, args.cues, work_dir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0 if all(row["ok"] for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
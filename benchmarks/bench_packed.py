@@ -0,0 +1,79 @@
+"""
+Handing parsed tracks to worker processes: pickled events vs shared memory.
+
+    python -m benchmarks.bench_packed                     # 10k cues, 8 calls, 2 workers
+    python -m benchmarks.bench_packed --sizes 10000,100000 --calls 16 -j 4
+
+Every call runs analyze_timing on Track A and a greedy match_cues of A and
+B in a worker and returns a few counters. "pickle" sends both
+pysubs2 tracks with every call, as pool.map would; "shared" publishes each
+track once with map_shared and sends segment names. Both must return the
+same results.
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sub_engine  # noqa: E402
+from benchmarks.corpus import generate_pair  # noqa: E402
+
+
+def timing_and_match(track_a, track_b, threshold_ms: int) -> dict:
+    """Worker call: a timing report and a greedy match, reduced to counters"""
+    report = sub_engine.analyze_timing(track_a, max_reported=0)
+    groups = sub_engine.match_cues(track_a, track_b, threshold_ms)
+    return {"overlaps": report["overlap_count"], "over_cps": report["cps"]["over_limit"],
+            "pairs": sum(1 for a, b in groups if a and b)}
+
+
+def run(sizes: List[int], calls: int, jobs: int) -> List[dict]:
+    rows = []
+    thresholds = [200 + 100 * k for k in range(calls)]
+    for size in sizes:
+        track_a, track_b = generate_pair(size, "thai", seed=size)
+        payload = len(pickle.dumps((track_a, track_b)))
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            pickled = list(pool.map(timing_and_match, [track_a] * calls, [track_b] * calls, thresholds))
+        pickle_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        shared = sub_engine.map_shared(timing_and_match, [track_a, track_b],
+                                       [((0, 1), (threshold,)) for threshold in thresholds], jobs)
+        shared_s = time.perf_counter() - started
+
+        packed = len(sub_engine.pack_track(track_a)) + len(sub_engine.pack_track(track_b))
+        rows.append({"cues": size, "calls": calls, "jobs": jobs, "pickle_s": round(pickle_s, 3),
+                     "shared_s": round(shared_s, 3), "pickled_bytes_per_call": payload,
+                     "packed_bytes_once": packed, "same": pickled == shared})
+        print(f"{size:>8d} cues  pickle {pickle_s:7.3f}s ({payload / 2 ** 20:6.1f} MB/call)  "
+              f"shared {shared_s:7.3f}s ({packed / 2 ** 20:6.1f} MB once)  "
+              f"{'same results' if pickled == shared else 'RESULTS DIFFER'}")
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10000", help="Comma-separated cue counts")
+    parser.add_argument("--calls", type=int, default=8, help="Worker calls per size (one threshold each)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Worker processes")
+    parser.add_argument("-o", "--output", help="Write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    rows = run([int(s) for s in args.sizes.split(",")], args.calls, args.jobs)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0 if all(row["same"] for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
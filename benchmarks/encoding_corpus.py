@@ -0,0 +1,103 @@
+"""
+Encoding-corruption stress corpus with ground truth.
+
+Starts from clean French, Thai and Chinese tracks (see corpus.py) and
+injects a known corruption into a controlled fraction of the cues:
+
+    clean                 valid UTF-8, nothing to do
+    wrong_codepage        the whole file saved in the language's legacy codepage
+    double_utf8           cues decoded through cp1252 and saved again as UTF-8 (mojibake)
+    truncated_multibyte   one byte cut out of a multibyte sequence in the cue
+    mixed                 the first cues in the legacy codepage, the rest in UTF-8
+
+The ground truth is the list of clean cue texts, in file order.
+"""
+import random
+from typing import List, Tuple
+
+from benchmarks.corpus import SCRIPT_ENCODINGS, generate_track
+
+# language -> corpus script
+LANGUAGES = {"french": "latin", "thai": "thai", "chinese": "cjk"}
+CORRUPTIONS = ("clean", "wrong_codepage", "double_utf8", "truncated_multibyte", "mixed")
+
+
+def _timestamp(ms: int) -> str:
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def _double_encode(text: str) -> bytes:
+    """UTF-8 bytes read as cp1252 (latin-1 for undefined bytes) and saved again as UTF-8"""
+    chars = []
+    for b in text.encode("utf-8"):
+        try:
+            chars.append(bytes([b]).decode("cp1252"))
+        except UnicodeDecodeError:
+            chars.append(chr(b))
+    return "".join(chars).encode("utf-8")
+
+
+def _truncate_multibyte(data: bytes, rng: random.Random) -> bytes:
+    """Drop one continuation byte from a random multibyte sequence"""
+    positions = [i for i, b in enumerate(data) if 0x80 <= b <= 0xBF]
+    if not positions:
+        return data
+    cut = rng.choice(positions)
+    return data[:cut] + data[cut + 1:]
+
+
+def make_case(language: str, corruption: str, rate: float = 1.0, n_cues: int = 500,
+              seed: int = 0) -> Tuple[bytes, List[str]]:
+    """
+    Build one corrupted subtitle file
+
+    Args:
+        language: "french", "thai" or "chinese"
+        corruption: One of CORRUPTIONS
+        rate: Fraction of cues affected (for "mixed": fraction in the legacy codepage)
+        n_cues: Number of cues
+        seed: Random seed
+
+    Returns:
+        Tuple of (raw SRT bytes, clean cue texts)
+    """
+    script = LANGUAGES[language]
+    legacy = SCRIPT_ENCODINGS[script]
+    track = generate_track(n_cues, script, seed=seed)
+    rng = random.Random(seed + 7)
+    legacy_cues = int(round(n_cues * rate)) if corruption == "mixed" else 0
+
+    blocks = []
+    truth = []
+    for i, line in enumerate(track):
+        truth.append(line.text)
+        affected = rng.random() < rate
+
+        if corruption == "wrong_codepage" or (corruption == "mixed" and i < legacy_cues):
+            body = line.text.encode(legacy)
+        elif corruption == "double_utf8" and affected:
+            body = _double_encode(line.text)
+        elif corruption == "truncated_multibyte" and affected:
+            body = _truncate_multibyte(line.text.encode("utf-8"), rng)
+        else:
+            body = line.text.encode("utf-8")
+
+        header = f"{i + 1}\n{_timestamp(line.start)} --> {_timestamp(line.end)}\n".encode("ascii")
+        blocks.append(header + body + b"\n\n")
+
+    return b"".join(blocks), truth
+
+
+def stress_matrix(rates=(0.1, 0.5, 1.0)) -> List[Tuple[str, str, float]]:
+    """Every (language, corruption, rate) combination worth measuring"""
+    cases = []
+    for language in LANGUAGES:
+        for corruption in CORRUPTIONS:
+            if corruption in ("clean", "wrong_codepage"):
+                cases.append((language, corruption, 1.0))
+            else:
+                cases.extend((language, corruption, rate) for rate in rates)
+    return cases
@@ -0,0 +1,83 @@
+"""
+Import-time budget for the engine core.
+
+    python -m benchmarks.import_budget                   # sub_engine, default budget
+    python -m benchmarks.import_budget --budget-ms 80 --repeat 9
+
+Imports the module in fresh interpreters with `python -X importtime` and
+exits with code 1 when the best cumulative import time is over the budget,
+or when a dependency that must stay lazy (requests, charset_normalizer,
+chardet, numpy, streamlit) is loaded at import time. The second check does
+not depend on machine speed, so it is the one to trust on noisy CI runners.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ("requests", "charset_normalizer", "chardet", "numpy", "streamlit")
+DEFAULT_BUDGET_MS = 120.0
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """
+    Import `module` in a fresh interpreter
+
+    Returns:
+        Tuple of (cumulative import time in ms, names of every module it loaded)
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    cumulative_us = None
+    loaded = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        loaded.append(name)
+        if name == module:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise RuntimeError(f"{module} does not appear in the -X importtime output (already imported by site?)")
+    return cumulative_us / 1000, loaded
+
+
+def check_budget(module: str, budget_ms: float, repeat: int) -> List[str]:
+    """
+    List budget violations (empty if none); the best of `repeat` runs is compared
+    """
+    runs = [measure_import(module) for _ in range(repeat)]
+    best_ms = min(ms for ms, _ in runs)
+    print(f"{module}: {best_ms:.1f} ms (best of {repeat}, budget {budget_ms:.0f} ms)")
+
+    problems = []
+    if best_ms > budget_ms:
+        problems.append(f"import takes {best_ms:.1f} ms, over the {budget_ms:.0f} ms budget")
+    eager = sorted({name.split(".")[0] for name in runs[0][1]} & set(LAZY_MODULES))
+    if eager:
+        problems.append(f"loaded at import time: {', '.join(eager)}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="sub_engine", help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Cumulative import time budget")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to run (best is kept)")
+    args = parser.parse_args(argv)
+
+    problems = check_budget(args.module, args.budget_ms, args.repeat)
+    for message in problems:
+        print(f"OVER BUDGET: {message}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,565 @@
-def main():
-    print("Hello from subtitles!")
+"""
+Headless command line for Subtitles Forge.
+
+Runs the sub_engine functions over files or directory trees, either one
+operation at a time or as a declarative pipeline spec (JSON or YAML):
+
+    {
+        "input": "incoming/",
+        "output": "processed/",
+        "jobs": 4,
+        "steps": [
+            {"op": "normalize"},
+            {"op": "sanitize", "remove_hi": true},
+            {"op": "shift", "shift_ms": -250},
+            {"op": "resolve", "policy": "trim", "min_gap_ms": 40},
+            {"op": "merge", "track_b": "FR", "threshold_ms": 1000, "overlaps": "stack"}
+        ]
+    }
+
+Per-file steps (normalize, repair, sanitize, shift, resolve, analyze) run in
+order on every subtitle file; "merge" must be last and groups the results by episode
+code. Episodes with more than two tracks are stacked with a k-way merge, in
+the order given by "track_b" keywords (e.g. "EN,FR,TH"); a file whose name
+carries no keyword is placed by the language "normalize" identified in it
+(keywords may be codes or names: "EN", "french"). Two-track merges
+take "mode": "align" to pair cues by global alignment instead of greedily.
+"resolve" trims, shifts or stacks overlapping cues ("policy"); the merge step
+applies the same to its output with "overlaps": "trim" / "shift" / "stack".
+"sanitize" also drops the lines of "boilerplate", a findings file written by
+`main.py boilerplate` (lines repeated across a library, such as signatures).
+Matroska files (.mkv/.mks) in the input contribute their text subtitle
+tracks, extracted to <output>/.extracted/ as <name>.<language>.srt/.ass.
+"hls_segment_ms" on the merge step also writes each merged result as WebVTT
+segments of that duration with an HLS playlist (Merged_<code>/Merged_<code>.m3u8).
+Outputs newer than their inputs (and the spec) are skipped.
+
+--profile/--trace record per-stage timings (detect, decode, parse, match,
+write...) for every file and write them as JSON or as a Chrome trace that
+ui.perfetto.dev opens directly; --trace-memory adds tracemalloc peaks.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sub_engine import CONTAINER_EXTENSIONS, find_subtitles  # Matroska files' text tracks are extracted first
+from workers import (analyze_file, boilerplate_counts, extract_container, group_tracks, hls_dir, run_file_steps,
+                     run_merge, segment_file)
+
+FILE_STEPS = ("normalize", "repair", "sanitize", "shift", "resolve", "analyze")
+OPERATIONS = FILE_STEPS + ("merge",)
+
+
+def load_spec(path: str) -> dict:
+    """
+    Load a pipeline spec from a JSON or YAML file
+
+    YAML needs PyYAML, which is optional.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if path.lower().endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("YAML specs need PyYAML (pip install pyyaml), or use a JSON spec")
+        spec = yaml.safe_load(text)
+    else:
+        spec = json.loads(text)
+
+    validate_spec(spec)
+    return spec
+
+
+def validate_spec(spec: dict) -> None:
+    """Raise ValueError if a pipeline spec is malformed"""
+    steps = spec.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("Spec needs a non-empty 'steps' list")
+
+    for idx, step in enumerate(steps):
+        op = step.get("op") if isinstance(step, dict) else None
+        if op not in OPERATIONS:
+            raise ValueError(f"Step {idx + 1}: unknown op {op!r} (expected one of {', '.join(OPERATIONS)})")
+        if op == "merge" and idx != len(steps) - 1:
+            raise ValueError("'merge' must be the last step")
+
+
+def is_up_to_date(output_path: str, *input_paths: str) -> bool:
+    """True if output exists and is newer than every input"""
+    if not os.path.exists(output_path):
+        return False
+    out_mtime = os.path.getmtime(output_path)
+    return all(os.path.getmtime(p) <= out_mtime for p in input_paths if p and os.path.exists(p))
+
+
+def find_boilerplate(input_path: str, jobs: int = 1, **thresholds) -> dict:
+    """
+    Lines repeated across the subtitle files of a tree (see sub_engine.BoilerplateDetector)
+
+    Returns:
+        {"input", "files", "findings": [...], "elapsed_s"}
+    """
+    from sub_engine import BoilerplateDetector
+
+    started = time.perf_counter()
+    detector = BoilerplateDetector()
+    for counts in _map_jobs(boilerplate_counts, [(path,) for path, _ in find_subtitles(input_path)], jobs):
+        detector.add_counts(counts)
+    return {"input": input_path, "files": detector.files, "findings": detector.findings(**thresholds),
+            "elapsed_s": round(time.perf_counter() - started, 4)}
+
+
+def _track_languages(results: List[dict], files: List[Tuple[str, str]], track_b: str) -> Dict[str, str]:
+    """
+    Identified language of the merge inputs, for the files whose name names no track
+
+    Languages come from the normalize step of this run; staged files it
+    skipped (already up to date) are identified from their UTF-8 output.
+    """
+    import pysubs2
+    from sub_engine import identify_track, parse_track_keywords, track_rank
+
+    keywords = parse_track_keywords(track_b)
+    languages = {r["output"]: step["language"] for r in results
+                 for step in r.get("steps", []) if step.get("language")}
+    for path, rel in files:
+        if path in languages or track_rank(os.path.basename(rel), keywords):
+            continue
+        try:
+            languages[path] = identify_track(pysubs2.load(path, encoding="utf-8"))["language"]
+        except Exception:
+            continue  # Unreadable files fail later, in the merge
+    return languages
+
+
+def _map_jobs(func, arg_lists: List[tuple], jobs: int) -> List[dict]:
+    """Run func over argument tuples, in a process pool when jobs > 1"""
+    if jobs <= 1 or len(arg_lists) <= 1:
+        return [func(*args) for args in arg_lists]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(func, *zip(*arg_lists)))
+
+
+def run_pipeline(spec: dict, input_path: str, output_dir: str, jobs: int = 1,
+                 force: bool = False, spec_path: Optional[str] = None,
+                 profile: bool = False, trace_memory: bool = False) -> dict:
+    """
+    Run a pipeline spec over a file or directory tree
+
+    Args:
+        spec: Pipeline spec (see module docstring)
+        input_path: File or directory to process
+        output_dir: Directory receiving the outputs (mirrors the input tree)
+        jobs: Number of worker processes
+        force: Reprocess even when outputs are up to date
+        spec_path: Spec file, whose mtime also invalidates outputs
+        profile: Collect per-stage timings from the workers (summary["stages"])
+        trace_memory: Also record tracemalloc peaks (slower)
+
+    Returns:
+        JSON-serialisable summary
+    """
+    started = time.perf_counter()
+    steps = spec["steps"]
+    merge_step = steps[-1] if steps[-1]["op"] == "merge" else None
+    file_steps = steps[:-1] if merge_step else steps
+
+    files = find_subtitles(input_path)
+    summary = {"input": input_path, "output": output_dir, "jobs": jobs,
+               "steps": [s["op"] for s in steps], "extracted": [], "files": [], "merged": [], "unpaired": []}
+
+    # Matroska sources: their text tracks join the inputs as <name>.<language>.srt/.ass
+    extract_root = os.path.join(output_dir, ".extracted")
+    containers = find_subtitles(input_path, CONTAINER_EXTENSIONS)
+    summary["extracted"] = _map_jobs(
+        extract_container, [(path, os.path.join(extract_root, os.path.dirname(rel))) for path, rel in containers], jobs)
+    for result in summary["extracted"]:
+        for track in result.get("tracks", []):
+            if track["path"]:
+                files.append((track["path"], os.path.relpath(track["path"], extract_root)))
+
+    # Per-file stage (merge inputs live in a staging directory when there is a merge step)
+    stage_dir = os.path.join(output_dir, ".stage") if merge_step else output_dir
+    staged = []
+    todo = []
+    for path, rel in files:
+        out = os.path.join(stage_dir, rel)
+        staged.append((out if file_steps else path, rel))
+        if not file_steps:
+            continue
+        if not force and is_up_to_date(out, path, spec_path):
+            summary["files"].append({"input": path, "output": out, "status": "skipped"})
+        else:
+            todo.append((path, out, file_steps, profile, trace_memory))
+    summary["files"].extend(_map_jobs(run_file_steps, todo, jobs))
+
+    # Merge stage
+    if merge_step:
+        failed = {r["output"] for r in summary["files"] if r["status"] == "failed"}
+        ready = [(p, rel) for p, rel in staged if p not in failed]
+        episodes, unpaired = group_tracks(ready, merge_step.get("track_b", ""),
+                                          _track_languages(summary["files"], ready, merge_step.get("track_b", "")))
+        summary["unpaired"] = unpaired
+
+        merge_todo = []
+        for rel_dir, code, paths in episodes:
+            out = os.path.join(output_dir, rel_dir, f"Merged_{code}.srt")
+            playlist = os.path.join(hls_dir(out), f"Merged_{code}.m3u8")
+            if not force and is_up_to_date(out, *paths, spec_path) and (
+                    not merge_step.get("hls_segment_ms") or os.path.exists(playlist)):
+                summary["merged"].append({"inputs": paths, "output": out, "status": "skipped"})
+            else:
+                merge_todo.append((paths, out, merge_step, profile, trace_memory))
+        summary["merged"].extend(_map_jobs(run_merge, merge_todo, jobs))
+
+    results = summary["extracted"] + summary["files"] + summary["merged"]
+    summary["counts"] = {status: sum(1 for r in results if r["status"] == status)
+                         for status in ("ok", "skipped", "failed")}
+    summary["elapsed_s"] = round(time.perf_counter() - started, 4)
+    if profile:
+        summary["stages"] = [record for r in results for record in r.pop("stages", [])]
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="subtitlesforge", description="Subtitles Forge batch toolkit")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p, needs_output=True):
+        p.add_argument("input", help="Subtitle file or directory (searched recursively)")
+        if needs_output:
+            p.add_argument("-o", "--output", required=True, help="Output directory")
+        p.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default: 1)")
+        p.add_argument("--json", action="store_true", help="Print a machine-readable JSON summary")
+        if needs_output:
+            # Without outputs there is nothing to be up to date
+            p.add_argument("--force", action="store_true", help="Reprocess up-to-date outputs")
+            profiling(p)
+
+    def profiling(p):
+        p.add_argument("--profile", metavar="PATH", help="Write per-stage timings as JSON")
+        p.add_argument("--trace", metavar="PATH", help="Write per-stage timings as a Chrome/Perfetto trace")
+        p.add_argument("--trace-memory", action="store_true", help="Also record tracemalloc peaks (slower)")
+
+    p = sub.add_parser("run", help="Run a JSON/YAML pipeline spec")
+    p.add_argument("spec", help="Pipeline spec file")
+    p.add_argument("input", nargs="?", help="Overrides the spec's 'input'")
+    p.add_argument("-o", "--output", help="Overrides the spec's 'output'")
+    p.add_argument("-j", "--jobs", type=int, help="Overrides the spec's 'jobs'")
+    p.add_argument("--force", action="store_true", help="Reprocess up-to-date outputs")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable JSON summary")
+    profiling(p)
+
+    for op in ("normalize", "repair"):
+        p = sub.add_parser(op, help=f"{op.title()} subtitle encodings to UTF-8")
+        common(p)
+        p.add_argument("--script", default="auto", choices=["auto", "thai", "french", "chinese"],
+                       help="Target script/language")
+
+    p = sub.add_parser("analyze", help="Analyze encoding corruption (JSON report)")
+    common(p, needs_output=False)
+    p.add_argument("--script", default="auto", choices=["auto", "thai", "french", "chinese"])
+
+    p = sub.add_parser("sanitize", help="Remove ads, HI tags and empty lines")
+    common(p)
+    p.add_argument("--keep-ads", action="store_true", help="Do not remove advertising lines")
+    p.add_argument("--remove-hi", action="store_true", help="Strip [Sighs], (Music)... tags")
+    p.add_argument("--keep-empty", action="store_true", help="Keep empty lines")
+    p.add_argument("--find", default="", help="Regex to replace")
+    p.add_argument("--replace", default="", help="Replacement text")
+    p.add_argument("--boilerplate", metavar="PATH",
+                   help="Also drop the lines of a findings file written by the boilerplate command")
+
+    p = sub.add_parser("boilerplate", help="Find lines repeated across files (signatures, adverts)")
+    p.add_argument("input", help="Subtitle file or directory (searched recursively)")
+    p.add_argument("-o", "--output", help="Write the findings as JSON here (for sanitize --boilerplate)")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default: 1)")
+    p.add_argument("--min-files", type=int, default=3, help="Fewest files a line must appear in")
+    p.add_argument("--min-share", type=float, default=0.6, help="Share of files for a line anywhere")
+    p.add_argument("--edge-share", type=float, default=0.2,
+                   help="Share of files for a line among the first/last cues")
+
+    p = sub.add_parser("extract", help="Extract text subtitle tracks from Matroska (.mkv/.mks) files")
+    p.add_argument("input", help="Matroska file or directory (searched recursively)")
+    p.add_argument("-o", "--output", help="Output directory (required unless --list)")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default: 1)")
+    p.add_argument("--list", action="store_true", help="Only list the subtitle tracks")
+    p.add_argument("--tracks", default="", help="Comma-separated track numbers to extract (default: all text tracks)")
+
+    p = sub.add_parser("hls", help="Write subtitle files as segmented WebVTT with an HLS playlist")
+    p.add_argument("input", help="Subtitle file or directory (searched recursively)")
+    p.add_argument("-o", "--output", required=True, help="Output directory (one <name>/ folder per file)")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default: 1)")
+    p.add_argument("--segment", type=float, default=6.0, help="Segment duration in seconds, as the video's")
+    p.add_argument("--mpegts", type=int, default=900000, help="MPEG-TS timestamp of media time 0 (90 kHz)")
+
+    p = sub.add_parser("sync", help="Shift timing and/or fix drift")
+    common(p)
+    p.add_argument("--shift", type=int, default=0, help="Shift in ms (positive = later)")
+    p.add_argument("--speed", type=float, default=1.0, help="Speed factor / FPS ratio")
+
+    p = sub.add_parser("resolve", help="Trim, shift or stack overlapping cues")
+    common(p)
+    p.add_argument("--policy", default="trim", choices=["trim", "shift", "stack"])
+    p.add_argument("--min-gap", type=int, default=0, help="Gap left between cues in ms")
+
+    p = sub.add_parser("merge", help="Merge episode pairs (or 3+ tracks) into multi-language subtitles")
+    common(p)
+    p.add_argument("--track-b", default="",
+                   help="Keyword identifying Track B files (e.g. FR), or the track order (e.g. EN,FR,TH)")
+    p.add_argument("--threshold", type=int, default=1000, help="Match threshold in ms")
+    p.add_argument("--color", default="#ffff54", help="Highlight color")
+    p.add_argument("--color-track", default="Track B", choices=["None", "Track A", "Track B"])
+    p.add_argument("--mode", default="greedy", choices=["greedy", "align"],
+                   help="Cue matching: nearest start (greedy) or global alignment with 1:2/2:1 merges (align)")
+    p.add_argument("--overlaps", choices=["trim", "shift", "stack"],
+                   help="Resolve overlapping cues in the merged output")
+    p.add_argument("--hls", type=float, metavar="SECONDS",
+                   help="Also write the merged tracks as HLS WebVTT segments of this duration, with a playlist")
+    p.add_argument("--shift-a", type=int, default=0)
+    p.add_argument("--shift-b", type=int, default=0)
+    p.add_argument("--shift-global", type=int, default=0)
+
+    p = sub.add_parser("scan", help="QC a library into a SQLite manifest (rescans only touch changed files)")
+    p.add_argument("input", help="Library directory")
+    p.add_argument("--db", required=True, help="Manifest database (SQLite)")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default: 1)")
+    p.add_argument("--force", action="store_true", help="Re-inspect every file")
+    p.add_argument("--json", action="store_true", help="Print a machine-readable JSON summary")
+
+    p = sub.add_parser("query", help="List files of a QC manifest (e.g. thai-mojibake, overlaps)")
+    p.add_argument("name", nargs="?", help="Named query (omit with --where, or to get the counts)")
+    p.add_argument("--db", required=True, help="Manifest database (SQLite)")
+    p.add_argument("--where", help="Raw SQL condition on the files table")
+    p.add_argument("--json", action="store_true", help="Print the rows as JSON")
+
+    p = sub.add_parser("serve", help="Local HTTP API with a bounded job queue (see server.py)")
+    p.add_argument("--host", default="127.0.0.1", help="Address to bind (default: localhost only)")
+    p.add_argument("--port", type=int, default=8750)
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default: 1)")
+    p.add_argument("--queue", type=int, default=16, help="Jobs that may wait for a worker before 429s")
+    p.add_argument("--max-upload", type=int, default=50, help="Largest request body in MB")
+
+    p = sub.add_parser("watch", help="Daemon: merge episode pairs as they land in a folder")
+    p.add_argument("input", help="Directory to watch")
+    p.add_argument("-o", "--output", required=True, help="Output directory")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Maximum concurrent merges")
+    p.add_argument("--track-b", default="", help="Keyword identifying Track B files (e.g. FR)")
+    p.add_argument("--threshold", type=int, default=1000, help="Match threshold in ms")
+    p.add_argument("--color", default="#ffff54", help="Highlight color")
+    p.add_argument("--color-track", default="Track B", choices=["None", "Track A", "Track B"])
+    p.add_argument("--mode", default="greedy", choices=["greedy", "align"],
+                   help="Cue matching: nearest start (greedy) or global alignment with 1:2/2:1 merges (align)")
+    p.add_argument("--overlaps", choices=["trim", "shift", "stack"],
+                   help="Resolve overlapping cues in the merged output")
+    p.add_argument("--interval", type=float, default=5.0, help="Seconds between scans")
+    p.add_argument("--settle", type=float, default=10.0, help="Seconds a file must stay unchanged")
+    p.add_argument("--state", help="State file (default: <output>/.watch_state.json)")
+    p.add_argument("--once", action="store_true", help="Process what is ready and exit")
+
+    return parser
+
+
+def spec_from_args(args) -> dict:
+    """Translate a single-operation command into a one- or two-step spec"""
+    if args.command in ("normalize", "repair"):
+        return {"steps": [{"op": args.command, "target_script": args.script}]}
+    if args.command == "analyze":
+        return {"steps": [{"op": "analyze", "target_script": args.script}]}
+    if args.command == "sanitize":
+        return {"steps": [{"op": "sanitize", "remove_ads": not args.keep_ads, "remove_hi": args.remove_hi,
+                           "remove_empty": not args.keep_empty, "find": args.find, "replace": args.replace,
+                           "boilerplate": args.boilerplate}]}
+    if args.command == "sync":
+        return {"steps": [{"op": "shift", "shift_ms": args.shift, "speed_factor": args.speed}]}
+    if args.command == "resolve":
+        return {"steps": [{"op": "resolve", "policy": args.policy, "min_gap_ms": args.min_gap}]}
+    return {"steps": [
+        {"op": "normalize"},
+        {"op": "merge", "track_b": args.track_b, "threshold_ms": args.threshold, "color_hex": args.color,
+         "color_track": args.color_track, "shift_a": args.shift_a, "shift_b": args.shift_b,
+         "shift_global": args.shift_global, "mode": args.mode, "overlaps": args.overlaps,
+         "hls_segment_ms": int(args.hls * 1000) if args.hls else None},
+    ]}
+
+
+def print_summary(summary: dict) -> None:
+    """Human-readable summary"""
+    for r in summary.get("extracted", []) + summary["files"] + summary["merged"]:
+        mark = {"ok": "✓", "skipped": "=", "failed": "✗"}[r["status"]]
+        name = r.get("input") or " + ".join(r["inputs"])
+        line = f"{mark} {name} -> {r['output']}"
+        if r["status"] == "failed":
+            line += f" ({r['error']})"
+        elif "tracks" in r:
+            names = [f"{t['language']} {t['codec']}" for t in r["tracks"] if t["path"]]
+            line += f" [{', '.join(names) or 'no text track'}]"
+        elif r.get("steps"):
+            details = [f"{s['encoding']} ({s['tier']})" for s in r["steps"] if "encoding" in s]
+            details += [s["applied_fix"] for s in r["steps"] if "applied_fix" in s]
+            details += [f"{s['changed']} cues retimed" for s in r["steps"] if "changed" in s]
+            details += [f"{s['written']}/{s['segments']} segments written" for s in r["steps"] if "segments" in s]
+            if details:
+                line += f" [{', '.join(details)}]"
+        print(line)
+    for path in summary["unpaired"]:
+        print(f"⚠ unpaired: {path}")
+    if summary.get("stages"):
+        from sub_engine import StageProfiler
+        profiler = StageProfiler(records=summary["stages"])
+        for name in profiler.summary():
+            print(f"⏱ {name}: {profiler.breakdown(name)}")
+    counts = summary["counts"]
+    print(f"{counts['ok']} ok, {counts['skipped']} skipped, {counts['failed']} failed in {summary['elapsed_s']}s")
+
+
+def write_profile(records: List[dict], json_path: Optional[str], trace_path: Optional[str]) -> None:
+    """Export stage records collected by run_pipeline"""
+    from sub_engine import StageProfiler
+    profiler = StageProfiler(records=records)
+    for path, payload in ((json_path, profiler.to_json), (trace_path, profiler.to_chrome_trace)):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(payload(), f, indent=2 if path == json_path else None, ensure_ascii=False)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "analyze":
+        paths = [path for path, _ in find_subtitles(args.input)]
+        reports = dict(zip(paths, _map_jobs(analyze_file, [(path, args.script) for path in paths], args.jobs)))
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+        return 0
+
+    if args.command == "boilerplate":
+        report = find_boilerplate(args.input, args.jobs, min_files=args.min_files, min_share=args.min_share,
+                                  min_edge_share=args.edge_share)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        for finding in report["findings"]:
+            print(f"{finding['files']:>5d} file(s) {finding['edge_files']:>5d} at edges  {finding['text']}")
+        print(f"{len(report['findings'])} boilerplate line(s) in {report['files']} file(s) in {report['elapsed_s']}s")
+        return 0
+
+    if args.command == "extract":
+        containers = find_subtitles(args.input, CONTAINER_EXTENSIONS)
+        if args.list:
+            from sub_engine import list_subtitle_tracks
+            failed = 0
+            for path, _ in containers:
+                try:
+                    tracks = list_subtitle_tracks(path)
+                except (OSError, ValueError) as e:
+                    print(f"✗ {path} ({e})")
+                    failed += 1
+                    continue
+                print(path)
+                for t in tracks:
+                    flags = "".join(f" {f}" for f in ("default", "forced") if t[f])
+                    support = f" -> {t['format']}" if t["format"] else " (not extractable)"
+                    print(f"  #{t['number']} {t['language']} {t['codec']} {t['name']}{flags}{support}")
+            return 1 if failed else 0
+        if not args.output:
+            raise SystemExit("--output is required unless --list is given")
+        numbers = [int(n) for n in args.tracks.split(",") if n.strip()] or None
+        started = time.perf_counter()
+        extracted = _map_jobs(extract_container, [
+            (path, os.path.join(args.output, os.path.dirname(rel)), numbers) for path, rel in containers], args.jobs)
+        counts = {"ok": 0, "skipped": 0, "failed": 0}
+        for result in extracted:
+            counts[result["status"]] += 1
+        print_summary({"extracted": extracted, "files": [], "merged": [], "unpaired": [], "counts": counts,
+                       "elapsed_s": round(time.perf_counter() - started, 3)})
+        return 1 if counts["failed"] else 0
+
+    if args.command == "hls":
+        started = time.perf_counter()
+        segmented = _map_jobs(segment_file, [
+            (path, os.path.join(args.output, rel), int(args.segment * 1000), args.mpegts)
+            for path, rel in find_subtitles(args.input)], args.jobs)
+        counts = {status: sum(1 for r in segmented if r["status"] == status) for status in ("ok", "skipped", "failed")}
+        print_summary({"files": segmented, "merged": [], "unpaired": [], "counts": counts,
+                       "elapsed_s": round(time.perf_counter() - started, 3)})
+        return 1 if counts["failed"] else 0
+
+    if args.command == "scan":
+        from qc import scan_library
+        stats = scan_library(args.input, args.db, args.jobs, args.force, log=print if not args.json else lambda _: None)
+        if args.json:
+            print(json.dumps(stats, indent=2))
+        else:
+            print(f"{stats['scanned']} inspected ({stats['failed']} failed), {stats['unchanged']} touched but "
+                  f"unchanged, {stats['skipped']} skipped, {stats['removed']} removed in {stats['elapsed_s']}s")
+        return 0
+
+    if args.command == "query":
+        from qc import QCManifest
+        with QCManifest(args.db) as manifest:
+            if not args.name and not args.where:
+                print(json.dumps(manifest.summary(), indent=2))
+                return 0
+            try:
+                rows = manifest.query(args.name, args.where)
+            except ValueError as e:
+                raise SystemExit(str(e))
+        if args.json:
+            print(json.dumps(rows, indent=2, ensure_ascii=False))
+        else:
+            for row in rows:
+                if row["status"] == "failed":
+                    print(f"{row['path']}\tfailed: {row['error']}")
+                else:
+                    print(f"{row['path']}\t{row['script']}\t{row['encoding']}\t{row['overlaps']} overlap(s)\t"
+                          f"{row['corruption']}")
+            print(f"{len(rows)} file(s)")
+        return 0
+
+    if args.command == "serve":
+        from server import serve
+        serve(args.host, args.port, args.jobs, args.queue, args.max_upload * 1024 * 1024)
+        return 0
+
+    if args.command == "watch":
+        from watcher import WatchFolder
+        merge_step = {"track_b": args.track_b, "threshold_ms": args.threshold,
+                      "color_hex": args.color, "color_track": args.color_track, "mode": args.mode,
+                      "overlaps": args.overlaps}
+        WatchFolder(args.input, args.output, merge_step, state_path=args.state, interval=args.interval,
+                    settle=args.settle, jobs=args.jobs).run(once=args.once)
+        return 0
+
+    if args.command == "run":
+        spec = load_spec(args.spec)
+        input_path = args.input or spec.get("input")
+        output_dir = args.output or spec.get("output")
+        jobs = args.jobs or int(spec.get("jobs", 1))
+        spec_path = args.spec
+    else:
+        spec = spec_from_args(args)
+        input_path, output_dir, jobs, spec_path = args.input, args.output, args.jobs, None
+
+    if not input_path or not output_dir:
+        raise SystemExit("Both an input and an output directory are required")
+
+    profile = bool(args.profile or args.trace)
+    summary = run_pipeline(spec, input_path, output_dir, jobs=jobs, force=args.force, spec_path=spec_path,
+                           profile=profile, trace_memory=args.trace_memory)
+    if profile:
+        write_profile(summary["stages"], args.profile, args.trace)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print_summary(summary)
+    return 1 if summary["counts"]["failed"] else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
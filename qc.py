@@ -0,0 +1,296 @@
+"""
+Library QC scanner: a SQLite manifest of every subtitle file under a tree.
+
+Each file is inspected once (encoding analysis, validation, script and
+timing statistics) and recorded under its path with its size, mtime and
+content hash. A rescan only reads files whose size or mtime changed, and
+only re-inspects those whose content hash changed too, so keeping the
+manifest of a large library current is cheap. Questions such as "which
+files have Thai mojibake" or "which files have overlaps" are then indexed
+SQL queries (see QUERIES):
+
+    python main.py scan library/ --db qc.sqlite --jobs 8
+    python main.py query thai-mojibake --db qc.sqlite
+    python main.py query --where "cps_max > 25 AND script = 'french'" --db qc.sqlite
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sub_engine import find_subtitles
+
+SCHEMA_VERSION = 1
+COMMIT_EVERY = 500  # Rows written per transaction during a scan
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    content_hash TEXT,
+    scanned_at REAL,
+    status TEXT,
+    error TEXT,
+    encoding TEXT,
+    detection_tier TEXT,
+    utf8_valid INTEGER,
+    script TEXT,
+    confidence INTEGER,
+    corruption TEXT,
+    valid INTEGER,
+    message TEXT,
+    entries INTEGER,
+    overlaps INTEGER,
+    max_concurrency INTEGER,
+    invalid_durations INTEGER,
+    gaps INTEGER,
+    cps_mean REAL,
+    cps_max REAL,
+    cps_over_limit INTEGER,
+    report TEXT
+);
+CREATE TABLE IF NOT EXISTS mojibake (
+    path TEXT REFERENCES files(path) ON DELETE CASCADE,
+    kind TEXT,
+    count INTEGER,
+    PRIMARY KEY (path, kind)
+);
+CREATE INDEX IF NOT EXISTS files_script ON files(script);
+CREATE INDEX IF NOT EXISTS files_overlaps ON files(overlaps);
+CREATE INDEX IF NOT EXISTS files_status ON files(status);
+CREATE INDEX IF NOT EXISTS mojibake_kind ON mojibake(kind);
+"""
+
+_COLUMNS = ("path", "size", "mtime_ns", "content_hash", "scanned_at", "status", "error", "encoding",
+            "detection_tier", "utf8_valid", "script", "confidence", "corruption", "valid", "message",
+            "entries", "overlaps", "max_concurrency", "invalid_durations", "gaps", "cps_mean", "cps_max",
+            "cps_over_limit", "report")
+
+# Named queries: WHERE clauses over the files table
+QUERIES = {
+    "mojibake": "path IN (SELECT path FROM mojibake)",
+    "thai-mojibake": "path IN (SELECT path FROM mojibake WHERE kind IN ('thai_latin1', 'thai_cp874'))",
+    "french-mojibake": "path IN (SELECT path FROM mojibake WHERE kind IN ('french_latin1', 'french_quotes'))",
+    "not-utf8": "utf8_valid = 0",
+    "overlaps": "overlaps > 0",
+    "invalid-durations": "invalid_durations > 0",
+    "fast-cps": "cps_over_limit > 0",
+    "invalid": "valid = 0",
+    "failed": "status = 'failed'",
+}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def inspect_file(path: str, known_hash: Optional[str] = None) -> dict:
+    """
+    QC one subtitle file (worker entry point)
+
+    Args:
+        path: Subtitle file
+        known_hash: Content hash already in the manifest; when the file still
+            hashes to it, only its size and mtime are returned ("unchanged")
+
+    Returns:
+        Row dict with the manifest columns (plus "mojibake": {kind: count}),
+        {"path", "size", "mtime_ns", "content_hash", "unchanged": True}, or
+        {"path", "removed": True} when the file no longer exists
+    """
+    import pysubs2
+    from sub_engine import (analyze_timing, build_corruption_report, decode_with_report, diagnose_corruption,
+                            validate_subtitle_file)
+
+    row = {"path": path, "scanned_at": time.time()}
+    try:
+        stat = os.stat(path)
+        row.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        with open(path, "rb") as f:
+            data = f.read()
+        row["content_hash"] = content_hash(data)
+        if row["content_hash"] == known_hash:
+            # Touched but not changed: nothing to analyze
+            return {k: row[k] for k in ("path", "size", "mtime_ns", "content_hash")} | {"unchanged": True}
+        analysis = diagnose_corruption(build_corruption_report(data, score_strategies=False))
+
+        # Decode in memory with what the analysis found, then parse once for validation and timing
+        text, encoding = decode_with_report(data, analysis)
+        subs = pysubs2.SSAFile.from_string(text.replace("\r\n", "\n").replace("\r", "\n"))
+        valid, message = validate_subtitle_file(path, subs)
+        timing = analyze_timing(subs)
+
+        row.update(
+            status="ok", error=None, encoding=encoding, detection_tier=analysis["detection_tier"],
+            utf8_valid=int(analysis["utf8_valid"]), script=analysis["detected_script"],
+            confidence=analysis["confidence"], corruption="; ".join(analysis["corruption_indicators"]),
+            valid=int(valid), message=message, entries=timing["entries"], overlaps=timing["overlap_count"],
+            max_concurrency=timing["max_concurrency"], invalid_durations=timing["invalid_durations"],
+            gaps=timing["gaps"]["count"], cps_mean=timing["cps"]["mean"], cps_max=timing["cps"]["max"],
+            cps_over_limit=timing["cps"]["over_limit"],
+        )
+        row["mojibake"] = {kind: hit["count"] for kind, hit in analysis["mojibake_hits"].items()}
+        del analysis["strategy_scores"]
+        analysis["mojibake_hits"] = row["mojibake"]
+        row["report"] = json.dumps({"analysis": analysis, "timing": timing}, ensure_ascii=False)
+    except FileNotFoundError:
+        return {"path": path, "removed": True}  # Deleted since the tree was listed
+    except Exception as e:
+        row.update(status="failed", error=str(e), mojibake={})
+    return row
+
+
+class QCManifest:
+    """
+    SQLite manifest of QC results, keyed by absolute path
+
+    Args:
+        db_path: Database file (created on first use)
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "QCManifest":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def known(self, root: str) -> Dict[str, Tuple[int, int, str]]:
+        """path -> (size, mtime_ns, content_hash) of the recorded files under root"""
+        prefix = os.path.join(os.path.abspath(root), "")
+        rows = self.conn.execute("SELECT path, size, mtime_ns, content_hash FROM files "
+                                 "WHERE path = ? OR substr(path, 1, ?) = ?",
+                                 (os.path.abspath(root), len(prefix), prefix))
+        return {r["path"]: (r["size"], r["mtime_ns"], r["content_hash"]) for r in rows}
+
+    def record(self, row: dict) -> None:
+        """Insert, update or drop one inspect_file result (no commit)"""
+        if row.get("removed"):
+            self.forget([row["path"]])
+            return
+        if row.get("unchanged"):
+            self.conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                              (row["size"], row["mtime_ns"], row["path"]))
+            return
+        values = [row.get(column) for column in _COLUMNS]
+        self.conn.execute(f"INSERT OR REPLACE INTO files ({', '.join(_COLUMNS)}) "
+                          f"VALUES ({', '.join('?' * len(_COLUMNS))})", values)
+        self.conn.execute("DELETE FROM mojibake WHERE path = ?", (row["path"],))
+        self.conn.executemany("INSERT INTO mojibake VALUES (?, ?, ?)",
+                              [(row["path"], kind, count) for kind, count in row.get("mojibake", {}).items()])
+
+    def forget(self, paths: Iterable[str]) -> None:
+        self.conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def query(self, name: Optional[str] = None, where: Optional[str] = None,
+              params: tuple = (), columns: str = "path, status, error, script, encoding, corruption, overlaps, message") -> List[dict]:
+        """
+        Files matching a named query (see QUERIES) or a raw WHERE clause
+
+        Raises:
+            ValueError: If the name is unknown
+        """
+        if name is not None:
+            if name not in QUERIES:
+                raise ValueError(f"Unknown query {name!r} (expected one of {', '.join(QUERIES)})")
+            where = QUERIES[name]
+        sql = f"SELECT {columns} FROM files" + (f" WHERE {where}" if where else "") + " ORDER BY path"
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def summary(self) -> dict:
+        """File count per status and the number of files matching every named query"""
+        counts = {r["status"]: r["n"] for r in self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM files GROUP BY status")}
+        matches = {name: self.conn.execute(f"SELECT COUNT(*) FROM files WHERE {where}").fetchone()[0]
+                   for name, where in QUERIES.items()}
+        return {"files": sum(counts.values()), "status": counts, "queries": matches}
+
+
+def scan_library(root: str, db_path: str, jobs: int = 1, force: bool = False,
+                 log: Callable[[str], None] = print) -> dict:
+    """
+    Bring the manifest of a tree up to date
+
+    Files whose size and mtime match the manifest are not opened; changed
+    files are hashed and only re-inspected when their content changed.
+    Rows of files that disappeared from the tree are removed.
+
+    Args:
+        root: Library directory (or a single file)
+        db_path: Manifest database
+        jobs: Worker processes
+        force: Re-inspect every file
+
+    Returns:
+        {"scanned", "unchanged", "skipped", "removed", "failed", "elapsed_s"}
+    """
+    started = time.perf_counter()
+    stats = {"scanned": 0, "unchanged": 0, "skipped": 0, "removed": 0, "failed": 0}
+
+    with QCManifest(db_path) as manifest:
+        known = manifest.known(root)
+        todo = []
+        present = set()
+        for path, _ in find_subtitles(root):
+            present.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            previous = known.get(path)
+            if not force and previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                stats["skipped"] += 1
+                continue
+            todo.append((path, None if force or not previous else previous[2]))
+
+        removed = [path for path in known if path not in present]
+        manifest.forget(removed)
+        stats["removed"] = len(removed)
+        log(f"{len(present)} file(s): {len(todo)} to check, {stats['skipped']} unchanged since last scan")
+
+        if jobs <= 1 or len(todo) <= 1:
+            results = (inspect_file(path, known_hash) for path, known_hash in todo)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=jobs)
+            results = pool.map(inspect_file, *zip(*todo), chunksize=16)
+        try:
+            for done, row in enumerate(results, 1):
+                manifest.record(row)
+                if row.get("removed"):
+                    stats["removed"] += 1
+                elif row.get("unchanged"):
+                    stats["unchanged"] += 1
+                else:
+                    stats["scanned"] += 1
+                    stats["failed"] += row["status"] == "failed"
+                if done % COMMIT_EVERY == 0:
+                    manifest.commit()
+                    log(f"  {done}/{len(todo)}")
+        finally:
+            if pool:
+                pool.shutdown()
+            manifest.commit()
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return stats
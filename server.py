@@ -0,0 +1,531 @@
+"""
+HTTP service mode: the engine as a local JSON API for other services.
+
+    python main.py serve --port 8750 --jobs 4 --queue 16
+
+Every operation is a POST that stores its input files in a job directory,
+queues a job and answers 202 with the job id. A process pool runs the jobs
+with the same worker entry points as the CLI (run_file_steps, run_merge...).
+At most jobs + queue jobs are pending at a time; past that the answer is 429
+with a Retry-After estimate, so callers back off instead of piling up. A
+worker crash breaks the pool: it is replaced on the next request, and a
+request that still finds no pool gets 503.
+
+    POST   /normalize /repair /sanitize /sync /resolve /analyze /translate   one file
+    POST   /merge                      two or more files (one episode)
+    GET    /jobs/<id>                  status (?wait=S blocks up to S seconds for the end)
+    GET    /jobs/<id>/events           NDJSON stream of status changes until the job ends
+    GET    /jobs/<id>/result           output file (the JSON report for analyze)
+    DELETE /jobs/<id>                  cancel a queued job or forget a finished one
+    GET    /health                     workers, queue depth and job counts
+
+Inputs are multipart/form-data (file fields; every other field is an option)
+or a raw body holding one file, with the options in the query string:
+
+    curl -F file=@ep01.en.srt -F file=@ep01.fr.srt -F track_b=FR localhost:8750/merge
+    curl --data-binary @ep01.srt 'localhost:8750/sync?shift_ms=-250&name=ep01.srt'
+
+Options use the pipeline spec names (see OPTIONS). The server binds to
+127.0.0.1 by default and needs nothing beyond the engine itself.
+"""
+import json
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from sub_engine import SUBTITLE_EXTENSIONS
+from workers import merge_episode, run_file_steps
+
+# Options accepted by every operation, with their types (values arrive as strings)
+OPTIONS = {
+    "normalize": {"target_script": str},
+    "repair": {"target_script": str},
+    "analyze": {"target_script": str},
+    "sanitize": {"remove_ads": bool, "remove_hi": bool, "remove_empty": bool, "find": str, "replace": str},
+    "sync": {"shift_ms": int, "speed_factor": float},
+    "resolve": {"policy": str, "min_gap_ms": int},
+    "merge": {"track_b": str, "threshold_ms": int, "color_hex": str, "color_track": str, "shift_a": int,
+              "shift_b": int, "shift_global": int, "mode": str, "overlaps": str},
+    "translate": {"base_url": str, "model": str, "source_lang": str, "target_lang": str, "context": str,
+                  "batch_size": int},
+}
+STEP_OPS = {"sync": "shift"}  # HTTP operation -> pipeline step op, where they differ
+
+DEFAULT_PORT = 8750
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+KEEP_FINISHED = 256  # Finished jobs kept for polling before the oldest are forgotten
+RESULT_TYPES = {".srt": "application/x-subrip", ".ass": "text/x-ssa", ".ssa": "text/x-ssa", ".vtt": "text/vtt"}
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when no more jobs can be pending"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Unavailable(Exception):
+    """Raised by JobQueue.submit when the worker pool cannot take jobs (broken or shut down)"""
+
+
+def _coerce(op: str, raw: Dict[str, str]) -> dict:
+    """
+    Typed options of an operation from form or query string values
+
+    Raises:
+        ValueError: If an option is unknown or does not parse
+    """
+    types = OPTIONS[op]
+    options = {}
+    for name, value in raw.items():
+        if name not in types:
+            raise ValueError(f"Unknown option {name!r} for {op} (expected one of {', '.join(types)})")
+        kind = types[name]
+        try:
+            options[name] = value.lower() in ("1", "true", "yes", "on") if kind is bool else kind(value)
+        except ValueError:
+            raise ValueError(f"Option {name!r} expects {kind.__name__}, got {value!r}")
+    return options
+
+
+def translate_file(input_path: str, output_path: str, options: dict) -> dict:
+    """Normalize one file and translate it through the local LLM API (worker entry point)"""
+    import pysubs2
+    from sub_engine import translate_subs
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        clean = os.path.join(work_dir, "clean" + os.path.splitext(output_path)[1])
+        result = run_file_steps(input_path, clean, [{"op": "normalize"}])
+        if result["status"] != "ok":
+            return result
+        started = time.perf_counter()
+        subs = pysubs2.load(clean, encoding="utf-8")
+        for _ in translate_subs(subs, options.get("base_url", "http://localhost:1234/v1"),
+                                options.get("model", ""), options.get("source_lang", "English"),
+                                options.get("target_lang", "French"), options.get("context", ""),
+                                options.get("batch_size", 10)):
+            pass
+        subs.save(output_path, encoding="utf-8")
+    result.update(output=output_path, entries=len(subs),
+                  elapsed_s=round(result["elapsed_s"] + time.perf_counter() - started, 4))
+    return result
+
+
+def _worker_init() -> None:
+    """Workers leave SIGINT/SIGTERM to the server, which shuts the pool down"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def run_job(op: str, inputs: List[str], output_path: str, options: dict) -> dict:
+    """Run one queued operation on files already stored in its job directory (worker entry point)"""
+    if op == "merge":
+        return merge_episode(inputs, output_path, options)
+    if op == "translate":
+        return translate_file(inputs[0], output_path, options)
+    return run_file_steps(inputs[0], output_path, [{"op": STEP_OPS.get(op, op), **options}])
+
+
+class Job:
+    """One queued operation and its files"""
+
+    def __init__(self, op: str, work_dir: str, inputs: List[str], output: str):
+        self.id = uuid.uuid4().hex
+        self.op = op
+        self.work_dir = work_dir
+        self.inputs = inputs
+        self.output = output
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.future = None
+        self.result: Optional[dict] = None
+
+    @property
+    def status(self) -> str:
+        if self.result is not None:
+            return self.result["status"]
+        if self.future is not None and self.future.cancelled():
+            return "cancelled"
+        return "running" if self.future is not None and self.future.running() else "queued"
+
+    def to_dict(self) -> dict:
+        info = {"id": self.id, "op": self.op, "status": self.status, "created": self.created,
+                "finished": self.finished, "inputs": [os.path.basename(p) for p in self.inputs]}
+        if self.result is not None:
+            # Worker paths are internal to the server
+            info["result"] = {k: v for k, v in self.result.items() if k not in ("input", "inputs", "output")}
+            if self.status == "ok":
+                info["output"] = os.path.basename(self.output)
+        return info
+
+
+class JobQueue:
+    """
+    Bounded job queue feeding a process pool
+
+    Args:
+        jobs: Worker processes
+        queue_size: Jobs that may wait for a worker; submit() raises QueueFull
+            once jobs + queue_size are pending
+        root: Directory holding the job directories (default: a fresh temp dir)
+        keep_finished: Finished jobs kept for polling (the oldest are dropped
+            with their files)
+    """
+
+    def __init__(self, jobs: int = 1, queue_size: int = 16, root: Optional[str] = None,
+                 keep_finished: int = KEEP_FINISHED):
+        self.jobs = max(1, jobs)
+        self.capacity = self.jobs + max(0, queue_size)
+        self.root = root or tempfile.mkdtemp(prefix="subtitlesforge-")
+        self.keep_finished = keep_finished
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=_worker_init)
+        self._closed = False
+        self.changed = threading.Condition()
+        self._jobs: Dict[str, Job] = {}
+        self._pending = 0
+        self._durations: List[float] = []  # Recent job durations, for Retry-After
+
+    def create(self, op: str, files: List[Tuple[str, bytes]]) -> Job:
+        """Store the input files of a new job (not queued yet)"""
+        work_dir = tempfile.mkdtemp(dir=self.root)
+        inputs = []
+        for k, (name, data) in enumerate(files):
+            name = os.path.basename(name or "")
+            if not name.lower().endswith(SUBTITLE_EXTENSIONS):
+                name = f"{name or f'input{k + 1}'}.srt"
+            path = os.path.join(work_dir, name)
+            if path in inputs:
+                path = os.path.join(work_dir, f"{k + 1}_{name}")
+            with open(path, "wb") as f:
+                f.write(data)
+            inputs.append(path)
+        return Job(op, work_dir, inputs, os.path.join(work_dir, "out", _output_name(op, inputs)))
+
+    def submit(self, job: Job, options: dict) -> Job:
+        """
+        Queue a created job
+
+        Raises:
+            QueueFull: If jobs + queue_size jobs are already pending
+            Unavailable: If the pool is shut down, or broken and cannot be replaced
+            (the job's files are removed in both cases)
+        """
+        with self.changed:
+            if self._pending >= self.capacity:
+                shutil.rmtree(job.work_dir, ignore_errors=True)
+                raise QueueFull(self.retry_after())
+            os.makedirs(os.path.dirname(job.output), exist_ok=True)
+            try:
+                job.future = self._submit(run_job, job.op, job.inputs, job.output, options)
+            except RuntimeError as e:  # BrokenProcessPool, or submit after shutdown
+                shutil.rmtree(job.work_dir, ignore_errors=True)
+                raise Unavailable(f"Worker pool unavailable: {e}") from e
+            self._pending += 1
+            self._jobs[job.id] = job
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def _submit(self, *args):
+        """pool.submit, replacing a pool broken by a worker crash once (its jobs already failed)"""
+        try:
+            return self.pool.submit(*args)
+        except BrokenProcessPool:
+            if self._closed:
+                raise
+            self.pool.shutdown(wait=False)
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=_worker_init)
+            return self.pool.submit(*args)
+
+    def _finish(self, job: Job, future) -> None:
+        try:
+            result = future.result()
+        except CancelledError:
+            result = {"status": "cancelled"}
+        except Exception as e:  # Worker crash (e.g. BrokenProcessPool)
+            result = {"status": "failed", "error": str(e)}
+        with self.changed:
+            job.result = result
+            job.finished = time.time()
+            self._pending -= 1
+            self._durations = (self._durations + [job.finished - job.created])[-50:]
+            self._evict()
+            self.changed.notify_all()
+
+    def _evict(self) -> None:
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            self._drop(job)
+
+    def _drop(self, job: Job) -> None:
+        self._jobs.pop(job.id, None)
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent job durations"""
+        if not self._durations:
+            return 1
+        mean = sum(self._durations) / len(self._durations)
+        return max(1, round(mean * (self._pending - self.jobs + 1) / self.jobs))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.changed:
+            return self._jobs.get(job_id)
+
+    def wait(self, job: Job, timeout: float, last_status: Optional[str] = None) -> str:
+        """Block until the job's status differs from last_status (or it ends), at most timeout seconds"""
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while job.status == last_status or (last_status is None and job.result is None):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Queued -> running is not notified by the pool: re-check every second
+                self.changed.wait(min(remaining, 1.0))
+            return job.status
+
+    def remove(self, job: Job) -> bool:
+        """Cancel a queued job or forget a finished one; False while it runs"""
+        if job.result is None and not job.future.cancel():
+            return False
+        with self.changed:
+            if job.result is not None:
+                self._drop(job)
+        return True
+
+    def health(self) -> dict:
+        with self.changed:
+            statuses = [job.status for job in self._jobs.values()]
+            return {"workers": self.jobs, "capacity": self.capacity, "pending": self._pending,
+                    "jobs": {status: statuses.count(status) for status in sorted(set(statuses))}}
+
+    def shutdown(self) -> None:
+        with self.changed:
+            self._closed = True
+        self.pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _output_name(op: str, inputs: List[str]) -> str:
+    name = os.path.basename(inputs[0])
+    if op == "merge":
+        from sub_engine import extract_episode_code
+        return f"Merged_{extract_episode_code(name)}.srt"
+    return name
+
+
+def parse_multipart(content_type: str, body: bytes) -> Tuple[List[Tuple[str, bytes]], Dict[str, str]]:
+    """
+    Split a multipart/form-data body
+
+    Returns:
+        Tuple of ([(filename, data)] for file fields, {name: value} for the others)
+    """
+    from email.parser import BytesParser
+    from email.policy import HTTP
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        raise ValueError("Malformed multipart body")
+    files, fields = [], {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        data = part.get_payload(decode=True) or b""
+        if part.get_filename() is not None:
+            files.append((part.get_filename(), data))
+        elif name:
+            fields[name] = data.decode("utf-8", errors="replace")
+    return files, fields
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the JobQueue of its server (self.server.queue)"""
+
+    server_version = "SubtitlesForge"
+
+    def log_message(self, format, *args) -> None:
+        self.server.log(f"{self.address_string()} {format % args}")
+
+    def _json(self, code: int, payload: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code: int, message: str, headers: Optional[dict] = None) -> None:
+        self._json(code, {"error": message}, headers)
+
+    def _route(self) -> Tuple[List[str], Dict[str, str]]:
+        url = urlsplit(self.path)
+        return [part for part in url.path.split("/") if part], dict(parse_qsl(url.query))
+
+    def _job(self, job_id: str) -> Optional[Job]:
+        job = self.server.queue.get(job_id)
+        if job is None:
+            self._error(404, f"Unknown job {job_id!r}")
+        return job
+
+    def do_POST(self) -> None:
+        parts, query = self._route()
+        op = parts[0] if len(parts) == 1 else None
+        if op not in OPTIONS:
+            return self._error(404, f"Unknown operation (expected one of {', '.join(OPTIONS)})")
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._error(400, "Invalid Content-Length")
+        if length > self.server.max_upload:
+            return self._error(413, f"Body larger than {self.server.max_upload} bytes")
+        body = self.rfile.read(length)
+
+        try:
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("multipart/form-data"):
+                files, fields = parse_multipart(content_type, body)
+                fields = {**query, **fields}
+            else:
+                fields = dict(query)
+                files = [(fields.pop("name", "input.srt"), body)] if body else []
+            options = _coerce(op, fields)
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        wanted = "two or more files" if op == "merge" else "one file"
+        if not files or (op == "merge") != (len(files) >= 2):
+            return self._error(400, f"{op} takes {wanted}, got {len(files)}")
+
+        queue = self.server.queue
+        job = queue.create(op, files)
+        try:
+            queue.submit(job, options)
+        except QueueFull as e:
+            return self._error(429, str(e), {"Retry-After": str(e.retry_after)})
+        except Unavailable as e:
+            return self._error(503, str(e), {"Retry-After": "1"})
+        self._json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self) -> None:
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._json(200, self.server.queue.health())
+        if len(parts) not in (2, 3) or parts[0] != "jobs":
+            return self._error(404, "Not found")
+        job = self._job(parts[1])
+        if job is None:
+            return
+
+        action = parts[2] if len(parts) == 3 else None
+        if action is None:
+            try:
+                wait = min(float(query.get("wait", 0) or 0), 300.0)
+            except ValueError:
+                return self._error(400, f"Invalid wait {query['wait']!r}")
+            if wait > 0:
+                self.server.queue.wait(job, wait)
+            return self._json(200, job.to_dict())
+        if action == "events":
+            return self._stream(job)
+        if action == "result":
+            return self._result(job)
+        self._error(404, "Not found")
+
+    def _stream(self, job: Job) -> None:
+        """One JSON line per status change, until the job ends (HTTP/1.0: the connection closes)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        status = None
+        try:
+            while True:
+                info = job.to_dict()
+                if info["status"] != status:
+                    self.wfile.write(json.dumps(info, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                    status = info["status"]
+                if job.result is not None:
+                    return
+                self.server.queue.wait(job, 15.0, status)
+        except (BrokenPipeError, ConnectionResetError):
+            return  # The client stopped listening
+
+    def _result(self, job: Job) -> None:
+        if job.result is None:
+            return self._error(409, f"Job is {job.status}", {"Retry-After": "1"})
+        if job.status != "ok":
+            return self._error(422, job.result.get("error") or f"Job {job.status}")
+        if job.op == "analyze":
+            return self._json(200, job.result["steps"][0])
+        with open(job.output, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        content_type = RESULT_TYPES.get(os.path.splitext(job.output)[1].lower(), "text/plain")
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(job.output)}"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_DELETE(self) -> None:
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._error(404, "Not found")
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if not self.server.queue.remove(job):
+            return self._error(409, "Job is running")
+        self._json(200, {"id": job.id, "status": job.status})
+
+
+class ServiceServer(ThreadingHTTPServer):
+    """HTTP server owning the job queue its handlers submit to"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], queue: JobQueue, max_upload: int = MAX_UPLOAD_BYTES,
+                 log: Callable[[str], None] = print):
+        super().__init__(address, ServiceHandler)
+        self.queue = queue
+        self.max_upload = max_upload
+        self.log = log
+
+
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, jobs: int = 1, queue_size: int = 16,
+          max_upload: int = MAX_UPLOAD_BYTES, log: Callable[[str], None] = print) -> None:
+    """Run the service until SIGINT/SIGTERM"""
+    queue = JobQueue(jobs, queue_size)
+    server = ServiceServer((host, port), queue, max_upload, log)
+
+    def stop(*_):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    log(f"Serving on http://{host}:{server.server_address[1]} ({queue.jobs} worker(s), "
+        f"{queue.capacity - queue.jobs} queued job(s) max)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.shutdown()
+        log("Stopped")
@@ -0,0 +1,30 @@
+"""
+Subtitles Forge engine.
+
+Importing the package only loads pysubs2 and the standard library, so
+headless runs and worker processes start fast. Heavier dependencies are
+imported on first use: charset_normalizer/chardet when a file is neither
+BOM-marked nor valid UTF-8, requests when translating. Check the startup
+cost with `python -m benchmarks.import_budget`.
+"""
+from .boilerplate import BoilerplateDetector, boilerplate_key, boilerplate_keys, detect_boilerplate, file_counts
+from .encoding import (DETECTION_WINDOW_COUNT, DETECTION_WINDOW_SIZE, MMAP_THRESHOLD, SCRIPT_CANDIDATES,
+                       decode_regions, detect_encoding, detect_encoding_regions, normalize_subtitle)
+from .hls import DEFAULT_MPEGTS, DEFAULT_SEGMENT_MS, segment_webvtt
+from .intervals import CueIndex
+from .langid import LANGUAGE_ALIASES, identify_language, identify_track, language_order, language_rank
+from .live import DEFAULT_SLACK_MS, OnlineMerger, amerge_streams, merge_streams
+from .matroska import CONTAINER_EXTENSIONS, extract_subtitles, list_subtitle_tracks, read_subtitle_tracks
+from .packed import PackedTrack, SharedTrack, map_shared, pack_track, write_packed
+from .pairing import (SUBTITLE_EXTENSIONS, EpisodeIndex, extract_episode_code, find_subtitles, parse_track_keywords,
+                      track_order, track_rank)
+from .profiling import StageProfiler, stage
+from .repair import (MOJIBAKE_SPAN_PATTERNS, analyze_corruption, build_corruption_report, decode_with_report,
+                     diagnose_corruption, repair_corrupted_encoding, repair_mojibake_spans, score_repair_strategies)
+from .scoring import (EASTERN_CODEPAGE_CHARS, FRENCH_CHARS, MOJIBAKE_PATTERN, REPAIR_STRATEGIES,
+                      score_plausibility)
+from .session import MergeSession
+from .timing import DEFAULT_MAX_CPS, OVERLAP_POLICIES, analyze_timing, resolve_overlaps
+from .tracks import (AD_PATTERNS, MATCH_MODES, TRACK_COLORS, fix_common_issues, match_cues, merge_subtitles, merge_tracks,
+                     remove_duplicates, sanitize_subtitles, shift_subtitles, track_settings, validate_subtitle_file)
+from .translate import translate_subs
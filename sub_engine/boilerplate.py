@@ -0,0 +1,123 @@
+"""
+Cross-file boilerplate detection: lines repeated across a batch or a library
+(release-group signatures, site adverts, "synced by" credits) found from
+their frequency instead of a fixed pattern list.
+
+Each cue text is normalized (tags, case, digits and punctuation folded) and
+hashed; per-hash counters record in how many files the line appears, how
+often per file and whether it sits among the first or last cues. One pass,
+linear in the total number of cues, and the counters of separate batches or
+worker processes add up.
+"""
+import hashlib
+import re
+from typing import Collection, Dict, Iterable, List, Optional
+
+from .profiling import stage
+
+EDGE_CUES = 3  # Cues at each end of a file where signatures usually sit
+
+_TAG_RE = re.compile(r'<[^>]+>|\{[^}]*\}|\\[Nn]')
+_FOLD_RE = re.compile(r'[^\w#]+')
+
+
+def boilerplate_key(text: str) -> str:
+    """Stable hash of a cue text once tags, case, digits and punctuation are folded ("" for empty lines)"""
+    folded = _FOLD_RE.sub(" ", re.sub(r'\d', '#', _TAG_RE.sub(" ", text).lower())).strip()
+    if not folded:
+        return ""
+    return hashlib.blake2b(folded.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def file_counts(subs, edge_cues: int = EDGE_CUES) -> Dict[str, list]:
+    """
+    Per-line counters of one file (worker entry point for library scans)
+
+    Returns:
+        {key: [occurrences, at_edge (0/1), example text]}
+    """
+    events = list(subs)
+    last_edge = len(events) - edge_cues
+    counts: Dict[str, list] = {}
+    for idx, line in enumerate(events):
+        key = boilerplate_key(line.text)
+        if not key:
+            continue
+        entry = counts.get(key)
+        if entry is None:
+            entry = counts[key] = [0, 0, line.text.strip()]
+        entry[0] += 1
+        if idx < edge_cues or idx >= last_edge:
+            entry[1] = 1
+    return counts
+
+
+class BoilerplateDetector:
+    """
+    Rolling line counters over a batch of files
+
+    Feed parsed tracks with add() (or per-file counters from workers with
+    add_counts()), then read findings(). Only lines seen in two files or more
+    keep an example text, so memory follows the number of distinct lines.
+    """
+
+    def __init__(self, edge_cues: int = EDGE_CUES):
+        self.edge_cues = edge_cues
+        self.files = 0
+        self._counts: Dict[str, list] = {}  # key -> [files, edge_files, occurrences]
+        self._examples: Dict[str, str] = {}
+
+    def add(self, subs) -> None:
+        """Count the lines of one parsed track"""
+        with stage("boilerplate"):
+            self.add_counts(file_counts(subs, self.edge_cues))
+
+    def add_counts(self, counts: Dict[str, list]) -> None:
+        """Merge the counters of one file (see file_counts)"""
+        self.files += 1
+        for key, (occurrences, at_edge, example) in counts.items():
+            entry = self._counts.get(key)
+            if entry is None:
+                self._counts[key] = [1, at_edge, occurrences]
+                continue
+            entry[0] += 1
+            entry[1] += at_edge
+            entry[2] += occurrences
+            self._examples.setdefault(key, example)
+
+    def findings(self, min_files: int = 3, min_share: float = 0.6, min_edge_share: float = 0.2,
+                 max_repeats: float = 2.0) -> List[dict]:
+        """
+        Lines that look like boilerplate, most widespread first
+
+        A line qualifies when it appears in at least min_files files, at most
+        max_repeats times per file on average (dialogue such as "What?"
+        repeats within files, signatures do not), and either in min_share of
+        all files or, at the first/last cues, in min_edge_share of them.
+
+        Returns:
+            List of {"key", "text", "files", "edge_files", "share"}
+        """
+        found = []
+        for key, (files, edge_files, occurrences) in self._counts.items():
+            if files < min_files or occurrences / files > max_repeats:
+                continue
+            share = files / self.files
+            if share >= min_share or (edge_files >= min_files and edge_files / self.files >= min_edge_share):
+                found.append({"key": key, "text": self._examples.get(key, ""), "files": files,
+                              "edge_files": edge_files, "share": round(share, 3)})
+        found.sort(key=lambda f: (-f["files"], -f["edge_files"], f["text"]))
+        return found
+
+
+def detect_boilerplate(tracks: Iterable, **thresholds) -> List[dict]:
+    """BoilerplateDetector.findings() over parsed tracks, in one pass"""
+    detector = BoilerplateDetector()
+    for subs in tracks:
+        detector.add(subs)
+    return detector.findings(**thresholds)
+
+
+def boilerplate_keys(findings: Optional[Iterable[dict]]) -> Collection[str]:
+    """Keys of findings, as sanitize_subtitles(boilerplate=...) takes them"""
+    return frozenset(f["key"] for f in findings or ())
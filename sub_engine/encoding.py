@@ -0,0 +1,422 @@
+"""
+Encoding detection and UTF-8 normalization.
+
+charset_normalizer (or chardet) is only imported for files that are neither
+BOM-marked nor valid UTF-8.
+"""
+import codecs
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import pysubs2
+
+from .langid import identify_track
+from .profiling import stage
+from .scoring import REPAIR_STRATEGIES, _script_profile, score_plausibility
+
+# Byte Order Marks, longest first so UTF-32 LE is not mistaken for UTF-16 LE
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Legacy codepages worth considering for each target script (charset_normalizer names)
+SCRIPT_CANDIDATES = {
+    "thai": ['tis_620', 'cp874', 'iso8859_11'],
+    "chinese": ['gb2312', 'gbk', 'gb18030', 'big5'],
+    "french": ['cp1252', 'latin_1', 'iso8859_15'],
+}
+
+DETECTION_WINDOW_SIZE = 64 * 1024   # Bytes per sampled window
+DETECTION_WINDOW_COUNT = 3          # Head, middle and tail
+MMAP_THRESHOLD = 1024 * 1024        # Files larger than this are memory-mapped
+_UTF8_CHUNK_SIZE = 1024 * 1024
+
+
+@contextmanager
+def _open_buffer(path: str):
+    """
+    Yield the content of a file as a bytes-like object.
+    Large files are memory-mapped so sampling never reads the whole file.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size < MMAP_THRESHOLD:
+            yield f.read()
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+
+def _sniff_bom(data) -> Optional[str]:
+    """Return the encoding announced by a Byte Order Mark, if any"""
+    head = bytes(data[:4])
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def _is_strict_utf8(data) -> bool:
+    """Validate the whole buffer as UTF-8 in fixed-size chunks (no full copy)"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='strict')
+    view = memoryview(data)
+    try:
+        for pos in range(0, len(view), _UTF8_CHUNK_SIZE):
+            decoder.decode(view[pos:pos + _UTF8_CHUNK_SIZE])
+        decoder.decode(b'', final=True)
+        return True
+    except UnicodeDecodeError:
+        return False
+    finally:
+        view.release()
+
+
+def _sample_windows(data, window: int = DETECTION_WINDOW_SIZE,
+                    count: int = DETECTION_WINDOW_COUNT) -> bytes:
+    """
+    Take `count` evenly spaced windows (head, middle, tail) of the buffer.
+    Windows start and end on line breaks so multibyte sequences are not cut.
+    """
+    size = len(data)
+    if size <= window * count:
+        return bytes(data)
+    
+    samples = []
+    for i in range(count):
+        start = (size - window) * i // (count - 1) if count > 1 else 0
+        chunk = bytes(data[start:start + window])
+        if i > 0:
+            first_nl = chunk.find(b'\n')
+            chunk = chunk[first_nl + 1:] if first_nl != -1 else chunk
+        if i < count - 1:
+            last_nl = chunk.rfind(b'\n')
+            chunk = chunk[:last_nl + 1] if last_nl != -1 else chunk
+        samples.append(chunk)
+    return b''.join(samples)
+
+
+def detect_encoding(data, target_script: str = "auto") -> Tuple[Optional[str], str]:
+    """
+    Tiered encoding detection, cheapest checks first:
+    
+    1. "bom": Byte Order Mark sniffing
+    2. "utf8": strict UTF-8 validation of the whole buffer
+    3. "sampled": charset_normalizer (then chardet) on sampled windows,
+       restricted to the codepages of `target_script` when one is given
+    
+    Args:
+        data: bytes or any bytes-like buffer (e.g. mmap)
+        target_script: "thai", "french", "chinese", or "auto"
+    
+    Returns:
+        Tuple of (detected_encoding or None, deciding_tier)
+    """
+    bom_encoding = _sniff_bom(data)
+    if bom_encoding:
+        return bom_encoding, "bom"
+    
+    if _is_strict_utf8(data):
+        return 'utf-8', "utf8"
+    
+    sample = _sample_windows(data)
+    candidates = SCRIPT_CANDIDATES.get(target_script)
+    
+    detected_enc = None
+    try:
+        from charset_normalizer import from_bytes
+        result = from_bytes(sample, cp_isolation=candidates).best()
+        if result:
+            detected_enc = str(result.encoding)
+    except Exception:
+        pass
+    
+    # Fallback to chardet if available
+    if not detected_enc:
+        try:
+            import chardet
+            detection = chardet.detect(sample)
+            detected_enc = detection.get('encoding')
+        except Exception:
+            pass
+    
+    return detected_enc, "sampled"
+
+
+# Cue boundaries: blank lines (SRT/VTT) or the start of an ASS "Dialogue:" line
+_CUE_BOUNDARY = re.compile(rb'(?:\r?\n){2,}|\r?\n(?=Dialogue:)')
+# A well-formed UTF-8 multibyte sequence (used to spot files mixing UTF-8 and legacy parts)
+_UTF8_MULTIBYTE = re.compile(rb'[\xc2-\xdf][\x80-\xbf]|[\xe0-\xef][\x80-\xbf]{2}|[\xf0-\xf4][\x80-\xbf]{3}')
+
+
+def detect_encoding_regions(data, target_script: str = "auto") -> List[dict]:
+    """
+    Split a buffer at cue boundaries and find where its encoding changes.
+    
+    Each cue is classified as ASCII, valid UTF-8 or legacy, and every legacy
+    cue gets the codepages that decode it best with score_plausibility.
+    Adjacent cues that agree are merged (ASCII cues join their neighbour,
+    legacy cues join while they share a best codepage), so two legacy
+    codepages side by side stay two regions. Each legacy region then takes the
+    codepage among its shared ones that scores best on the whole region.
+    Linear in file size.
+    
+    Args:
+        data: bytes or any bytes-like buffer (e.g. mmap)
+        target_script: "thai", "french", "chinese", or "auto"
+    
+    Returns:
+        List of {"start", "end", "first_cue", "last_cue", "encoding"} dicts
+        (byte offsets, 1-based cue numbers) covering the whole buffer in order
+    """
+    regions = []
+    codepages = []  # Codepages every cue of the matching region agrees on (legacy regions only)
+    pos = 0
+    cue = 0
+    size = len(data)
+    
+    while pos < size:
+        match = _CUE_BOUNDARY.search(data, pos)
+        end = match.end() if match else size
+        chunk = bytes(data[pos:end])
+        cue += 1
+        
+        candidates = None
+        if chunk.isascii():
+            kind = None
+        else:
+            try:
+                chunk.decode('utf-8')
+                kind = 'utf-8'
+            except UnicodeDecodeError:
+                kind = 'legacy'
+                # Number and timing lines are ASCII and do not change the score
+                evidence = b"\n".join(line for line in chunk.split(b"\n") if not line.isascii())
+                candidates = _best_codepages(evidence, target_script)
+        
+        previous = regions[-1]["encoding"] if regions else 'none'
+        shared = candidates
+        if kind == 'legacy' and previous == 'legacy':
+            shared = [cp for cp in codepages[-1] if cp in candidates]
+            joins = bool(shared)
+        else:
+            joins = bool(regions) and (kind is None or previous in (None, kind))
+        
+        if joins:
+            # Same encoding as the previous region (or no evidence either way)
+            regions[-1]["end"] = end
+            regions[-1]["last_cue"] = cue
+            if previous is None:
+                regions[-1]["encoding"] = kind
+            if kind == 'legacy':
+                codepages[-1] = shared
+        else:
+            regions.append({"start": pos, "end": end, "first_cue": cue, "last_cue": cue, "encoding": kind})
+            codepages.append(candidates)
+        pos = end
+    
+    for region, shared in zip(regions, codepages):
+        if region["encoding"] is None:
+            region["encoding"] = 'utf-8'
+        elif region["encoding"] == 'legacy':
+            sample = _sample_windows(data[region["start"]:region["end"]])
+            region["encoding"] = _best_codepages(sample, target_script, shared)[0]
+    
+    # Neighbouring regions may have resolved to the same encoding
+    merged = []
+    for region in regions:
+        if merged and merged[-1]["encoding"] == region["encoding"]:
+            merged[-1]["end"] = region["end"]
+            merged[-1]["last_cue"] = region["last_cue"]
+        else:
+            merged.append(region)
+    return merged
+
+
+def _best_codepages(sample: bytes, target_script: str, candidates: Optional[List[str]] = None) -> List[str]:
+    """
+    Legacy codepages that decode a sample most plausibly, in table order
+    (several when they tie, ['latin-1'] when none decodes)
+    """
+    best, best_score = ['latin-1'], None
+    scores = {}  # Codepages of a family often decode to the same text
+    for kind, codepage, scripts in REPAIR_STRATEGIES:
+        if kind != "codepage" or (target_script != "auto" and target_script not in scripts):
+            continue
+        if candidates is not None and codepage not in candidates:
+            continue
+        try:
+            text = codecs.decode(sample, codepage)
+        except UnicodeDecodeError:
+            continue
+        if text not in scores:
+            scores[text] = score_plausibility(text, target_script)
+        score = scores[text]
+        if best_score is None or score > best_score:
+            best, best_score = [codepage], score
+        elif score == best_score:
+            best.append(codepage)
+    return best
+
+
+def decode_regions(data, regions: List[dict]) -> str:
+    """Decode each region of a buffer with its own encoding and join the results"""
+    return "".join(codecs.decode(data[r["start"]:r["end"]], r["encoding"], 'replace') for r in regions)
+
+
+def _looks_mixed(data) -> bool:
+    """Cheap pre-check: an invalid UTF-8 buffer that still holds real UTF-8 sequences"""
+    return _UTF8_MULTIBYTE.search(data) is not None
+
+
+def _parse_subtitle_text(text: str) -> pysubs2.SSAFile:
+    """Parse decoded subtitle text, normalizing line endings like pysubs2.load does"""
+    with stage("parse"):
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return pysubs2.SSAFile.from_string(text)
+
+
+def normalize_subtitle(input_path: str, output_path: str, target_script: str = "auto",
+                       identify: bool = False) -> Tuple[str, str, str, Optional[dict]]:
+    """
+    Forcefully standardizes subtitles to UTF-8. 
+    Handles multiple scripts (Latin/French, Thai, etc.) by detecting script type
+    and choosing appropriate encoding candidates.
+    
+    BOM-marked and valid UTF-8 files are decided without running charset
+    detection; files mixing UTF-8 and legacy parts are decoded region by region
+    (tier "mixed"); only the remaining ambiguous files go through the
+    trial-decode loop below.
+    
+    Args:
+        input_path: Path to subtitle file in any encoding
+        output_path: Where to save the UTF-8 result
+        target_script: "thai", "french", "chinese", or "auto" to narrow the candidates
+        identify: Also identify the language from the decoded cues (see
+            langid.identify_track), without reading the file again; the
+            script comes from the profile of the whole decoded text
+    
+    Returns:
+        Tuple of (output_path, detected_encoding, detection_tier, language),
+        language being the identify_track dict, or None unless identify is set
+    """
+    with _open_buffer(input_path) as raw_data:
+        with stage("detect"):
+            detected_enc, tier = detect_encoding(raw_data, target_script)
+            
+            regions = None
+            if tier == "sampled" and _looks_mixed(raw_data):
+                regions = detect_encoding_regions(raw_data, target_script)
+        
+        with stage("decode"):
+            if tier in ("bom", "utf8"):
+                subs = _parse_subtitle_text(codecs.decode(raw_data, detected_enc))
+                best_encoding = 'utf-8' if detected_enc == 'utf-8-sig' else detected_enc
+            elif regions and len(regions) > 1:
+                # Stitched file: every region is decoded with its own encoding
+                subs = _parse_subtitle_text(decode_regions(raw_data, regions))
+                best_encoding = "+".join(dict.fromkeys(r["encoding"] for r in regions))
+                tier = "mixed"
+            else:
+                subs, best_encoding, tier = _decode_ambiguous(raw_data, detected_enc, target_script, tier)
+    
+    with stage("write"):
+        # Standardize internal line breaks
+        for line in subs:
+            line.text = line.text.replace("\r\n", "\n").replace("\r", "\n")
+        
+        # Save as UTF-8 without BOM
+        subs.save(output_path, encoding="utf-8")
+    
+    language = None
+    if identify:
+        # The whole-file profile settles the script, so identification only scores the sampled cues
+        profile = _script_profile("\n".join(line.text for line in subs))
+        language = identify_track(subs, script_profile=profile)
+    return output_path, best_encoding or 'unknown', tier, language
+
+
+def _decode_ambiguous(raw_data, detected_enc: Optional[str], target_script: str,
+                      tier: str) -> Tuple[pysubs2.SSAFile, str, str]:
+    """
+    Trial-decode a buffer that is neither BOM-marked nor valid UTF-8.
+    
+    Returns:
+        Tuple of (parsed subs, chosen encoding, deciding tier)
+    """
+    # Detect script type by checking for Thai byte patterns
+    # Thai characters are in Unicode range U+0E00 to U+0E7F
+    # In UTF-8, they appear as bytes 0xE0 0xB8-0xBB (partially broken UTF-8 files)
+    has_thai_bytes = any(pattern in raw_data for pattern in (b'\xe0\xb8', b'\xe0\xb9', b'\xe0\xba', b'\xe0\xbb'))
+    
+    enc_lower = (detected_enc or '').lower()
+    
+    # Check if detected encoding suggests Thai
+    is_thai_encoding = target_script == "thai" or any(k in enc_lower for k in ('874', 'thai', 'tis', '8859_11'))
+    
+    # Check if detected encoding suggests Chinese
+    is_chinese_encoding = target_script == "chinese" or any(k in enc_lower for k in ('gb', 'big5', 'hz'))
+    
+    # Build encoding list based on script detection
+    if has_thai_bytes or is_thai_encoding:
+        # Thai subtitle - prioritize Thai-specific encodings
+        encodings_to_try = [detected_enc, 'tis-620', 'cp874', 'iso-8859-11']
+    elif is_chinese_encoding:
+        # Chinese subtitle
+        encodings_to_try = [detected_enc, 'gb18030', 'gbk', 'gb2312', 'big5']
+    else:
+        # Latin/French subtitle - legacy Western encodings
+        encodings_to_try = [detected_enc, 'cp1252', 'windows-1252', 'iso-8859-1', 'latin-1', 'iso-8859-15']
+    
+    # Remove duplicates while preserving order
+    seen = set()
+    encodings_to_try = [x for x in encodings_to_try if x and x.lower() not in seen and not seen.add(x.lower())]
+    
+    # Corruption patterns to detect
+    # These patterns indicate the file was INCORRECTLY decoded/encoded
+    # Eastern European chars that shouldn't appear in French text (indicates wrong codepage)
+    western_corruption = ['ť', 'Ť', 'ŕ', 'Ŕ', 'č', 'Č', 'ś', 'Ś', 'ř', 'Ř', 'ů', 'Ů', '¶', 'Ķ', 'ķ']
+    # Garbage characters that indicate Thai encoding issues
+    thai_corruption = ['à¸', 'à¹', 'Ã ', 'Ã¡', 'Ã¨', 'Ã©']
+    
+    # Candidates are screened on the sampled windows; only the winner is parsed in full
+    sample = _sample_windows(raw_data)
+    
+    for enc in encodings_to_try:
+        try:
+            test_text = codecs.decode(sample, enc)
+            
+            # Check for corruption patterns based on detected script type
+            if has_thai_bytes or is_thai_encoding:
+                has_corruption = any(pattern in test_text for pattern in thai_corruption)
+            else:
+                has_corruption = any(pattern in test_text for pattern in western_corruption)
+            
+            # Additional check: if we expect Thai but see only ASCII/Latin, it's wrong
+            if (has_thai_bytes or is_thai_encoding) and enc in ['cp1252', 'iso-8859-1', 'latin-1']:
+                has_thai_chars = any(ord(c) >= 0x0E00 and ord(c) <= 0x0E7F for c in test_text)
+                if not has_thai_chars:
+                    continue  # Skip this encoding, it lost Thai characters
+            
+            # If no corruption detected, we found the right encoding
+            if not has_corruption:
+                return _parse_subtitle_text(codecs.decode(raw_data, enc)), enc, tier
+        except Exception:
+            continue
+    
+    # If all encodings showed corruption or failed, use smart fallback
+    if has_thai_bytes or is_thai_encoding:
+        try:
+            return _parse_subtitle_text(codecs.decode(raw_data, 'tis-620')), 'tis-620', "fallback"
+        except Exception:
+            return _parse_subtitle_text(codecs.decode(raw_data, 'utf-8', 'ignore')), 'utf-8', "fallback"
+    try:
+        return _parse_subtitle_text(codecs.decode(raw_data, 'cp1252')), 'cp1252', "fallback"
+    except Exception:
+        return _parse_subtitle_text(codecs.decode(raw_data, 'latin-1', 'ignore')), 'latin-1', "fallback"
@@ -0,0 +1,154 @@
+"""
+Segmented WebVTT and media playlists for HLS delivery.
+
+A track (merged or single) is cut into WebVTT segments of a fixed duration,
+aligned with the video segments, plus an .m3u8 playlist listing them. A cue
+spanning a boundary is repeated, with its full timing, in every segment it
+overlaps, as players expect (they drop the duplicates). Cues carry no
+identifier, so inserting one does not ripple through the later segments.
+Each segment carries X-TIMESTAMP-MAP so cue times line up with the video's
+MPEG-TS clock.
+
+Segments whose content did not change are not rewritten, and a time-range
+edit can restrict rendering to the segments it touches, so fixing one scene
+of a long episode rewrites one or two small files instead of the whole set.
+"""
+import math
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import pysubs2
+from pysubs2.formats.webvtt import WebVTTFormat
+
+from .matroska import _same_content
+from .profiling import stage
+
+DEFAULT_SEGMENT_MS = 6000
+DEFAULT_MPEGTS = 900000  # 10 s at 90 kHz, the usual first PTS of an MPEG-TS stream
+
+_FONT_OPEN_RE = re.compile(r'<font\b([^>]*)>', re.IGNORECASE)
+_COLOR_RE = re.compile(r'color="?#?([0-9a-fA-F]{6})\b', re.IGNORECASE)
+_FONT_CLOSE_RE = re.compile(r'</font>', re.IGNORECASE)
+_AMP_RE = re.compile(r'&(?!(?:[a-zA-Z]+|#\d+);)')
+_BLOCK_RE = re.compile(r'^(\d+)\n[\d:.]+ --> [\d:.]+\n', re.MULTILINE)
+
+
+def _font_class(match: re.Match) -> str:
+    """<font color="#rrggbb"> as a WebVTT class span (styled by the segment's STYLE block)"""
+    color = _COLOR_RE.search(match.group(1))
+    return f"<c.color_{color.group(1).lower()}>" if color else "<c>"
+
+
+def _vtt_cues(events: Sequence, styles: dict) -> List[Tuple[int, int, str]]:
+    """(start, end, WebVTT text) of cues"""
+    # pysubs2 converts override tags and styles; one pass over the cues, each
+    # retimed to its index so its block can be found again
+    probe = pysubs2.SSAFile()
+    probe.styles = styles
+    probe.events = [pysubs2.SSAEvent(start=k, end=k + 1, text=line.text, style=line.style)
+                    for k, line in enumerate(events)]
+    rendered = probe.to_string("vtt")
+    blocks = list(_BLOCK_RE.finditer(rendered))
+    texts = [""] * len(events)
+    for block, following in zip(blocks, blocks[1:] + [None]):
+        text = rendered[block.end():following.start() if following else len(rendered)].strip("\n")
+        texts[int(block.group(1)) - 1] = text
+
+    cues = []
+    for line, text in zip(events, texts):
+        text = _AMP_RE.sub("&amp;", text)
+        text = _FONT_OPEN_RE.sub(_font_class, text)
+        cues.append((line.start, line.end, _FONT_CLOSE_RE.sub("</c>", text)))
+    return cues
+
+
+def _segment_text(cues: Sequence[Tuple[int, int, str]], mpegts: int) -> str:
+    parts = ["WEBVTT", f"X-TIMESTAMP-MAP=MPEGTS:{mpegts},LOCAL:00:00:00.000", ""]
+    colors = sorted({color for *_, text in cues for color in re.findall(r'<c\.color_([0-9a-f]{6})>', text)})
+    if colors:
+        parts += ["STYLE"] + [f"::cue(.color_{c}) {{ color: #{c}; }}" for c in colors] + [""]
+    for start, end, text in cues:
+        parts += [f"{WebVTTFormat.ms_to_timestamp(start)} --> {WebVTTFormat.ms_to_timestamp(end)}",
+                  text, ""]
+    return "\n".join(parts) + "\n"
+
+
+def _write_if_changed(path: str, text: str) -> bool:
+    data = text.encode("utf-8")
+    if _same_content(path, data):
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def segment_webvtt(subs, output_dir: str, name: str = "subtitles",
+                   segment_ms: int = DEFAULT_SEGMENT_MS, duration_ms: Optional[int] = None,
+                   mpegts: int = DEFAULT_MPEGTS, changed: Optional[Tuple[int, int]] = None) -> dict:
+    """
+    Write a track as WebVTT segments and an HLS media playlist, in one pass
+
+    Files are <name>_<index>.vtt and <name>.m3u8 in output_dir; segments left
+    over from a longer earlier run are removed.
+
+    Args:
+        subs: Parsed track (a merged result or a single language)
+        segment_ms: Segment duration, the same as the video's
+        duration_ms: Stream duration (default: end of the last cue)
+        mpegts: MPEG-TS timestamp (90 kHz) of media time 0, as in the video segments
+        changed: (start_ms, end_ms) of an edit; only the segments it overlaps
+            are rendered. Cover both the old and the new times of moved cues
+
+    Raises:
+        ValueError: If segment_ms is not positive
+
+    Returns:
+        {"playlist": path, "segments": [paths], "written": [paths rewritten],
+        "removed": [paths], "cues": visible cues in the track}
+    """
+    if segment_ms <= 0:
+        raise ValueError("segment_ms must be positive")
+
+    with stage("segment"):
+        events = sorted((line for line in subs.get_text_events() if line.end > line.start), key=lambda l: l.start)
+        visible = len(events)
+        duration = duration_ms or max((line.end for line in events), default=0)
+        count = max(1, math.ceil(duration / segment_ms))
+        first, last = 0, count - 1
+        if changed:
+            first = max(first, changed[0] // segment_ms)
+            last = min(last, max(changed[1] - 1, changed[0]) // segment_ms)
+            events = [line for line in events
+                      if line.start < (last + 1) * segment_ms and line.end > first * segment_ms]
+
+        buckets = [[] for _ in range(max(0, last - first + 1))]
+        for start, end, text in _vtt_cues(events, subs.styles):
+            for index in range(max(start // segment_ms, first), min((end - 1) // segment_ms, last) + 1):
+                buckets[index - first].append((start, end, text))
+
+    with stage("write"):
+        os.makedirs(output_dir, exist_ok=True)
+        segments = [os.path.join(output_dir, f"{name}_{index:05d}.vtt") for index in range(count)]
+        written = [segments[index] for index, bucket in enumerate(buckets, first)
+                   if _write_if_changed(segments[index], _segment_text(bucket, mpegts))]
+
+        playlist = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{math.ceil(segment_ms / 1000)}",
+                    "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+        for index, path in enumerate(segments):
+            length = min(segment_ms, duration - index * segment_ms) if duration else segment_ms
+            playlist += [f"#EXTINF:{length / 1000:.3f},", os.path.basename(path)]
+        playlist.append("#EXT-X-ENDLIST")
+        playlist_path = os.path.join(output_dir, f"{name}.m3u8")
+        if _write_if_changed(playlist_path, "\n".join(playlist) + "\n"):
+            written.append(playlist_path)
+
+        removed = []
+        index = count
+        while os.path.exists(os.path.join(output_dir, f"{name}_{index:05d}.vtt")):
+            removed.append(os.path.join(output_dir, f"{name}_{index:05d}.vtt"))
+            os.remove(removed[-1])
+            index += 1
+
+    return {"playlist": playlist_path, "segments": segments, "written": written, "removed": removed,
+            "cues": visible}
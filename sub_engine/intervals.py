@@ -0,0 +1,89 @@
+"""
+Interval index over the cues of a track: which cues are active at a time, or
+inside a window, without scanning the track.
+
+Cues are sorted by start once; a max-end tree over that order (an augmented
+sorted array, stored as an implicit binary tree) skips every run of cues
+that ended before the query. Building is O(n log n); a query is a bisect
+plus a walk down the tree, O(log n + k log n) for k results and close to
+O(log n + k) on subtitle tracks, where long cues are rare.
+"""
+import bisect
+from typing import List, Sequence
+
+_NEG_INF = float("-inf")
+
+
+class CueIndex:
+    """
+    Static interval index of a track (cues are [start, end) in ms)
+
+    Query results are indices into the sequence given to the constructor,
+    in start order. The index does not follow later edits of the cues:
+    build a new one after shifting or resolving a track.
+    """
+
+    def __init__(self, events: Sequence):
+        if hasattr(events, "starts"):
+            # PackedTrack: read its arrays instead of building a cue object per entry
+            self.events = events
+            starts, ends = events.starts, events.ends
+        else:
+            self.events = list(events)
+            starts = [line.start for line in self.events]
+            ends = [line.end for line in self.events]
+        self.order = sorted(range(len(starts)), key=lambda i: (starts[i], ends[i]))
+        self.starts = [starts[i] for i in self.order]
+        self.ends = [ends[i] for i in self.order]
+
+        # tree[1] is the root; leaves tree[size + p] hold the end of the p-th cue by start
+        size = 1
+        while size < len(self.order):
+            size *= 2
+        tree = [_NEG_INF] * (2 * size)
+        tree[size:size + len(self.ends)] = self.ends
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._size = size
+        self._tree = tree
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _ending_after(self, limit: int, after: int) -> List[int]:
+        """Positions p < limit (start order) whose cue ends after `after`"""
+        if limit <= 0:
+            return []
+        size, tree = self._size, self._tree
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or tree[node] <= after:
+                continue
+            if node >= size:
+                found.append(lo)
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return [self.order[p] for p in found]
+
+    def at(self, time_ms: int) -> List[int]:
+        """Cues active at time_ms (start <= time_ms < end)"""
+        return self._ending_after(bisect.bisect_right(self.starts, time_ms), time_ms)
+
+    def between(self, start_ms: int, end_ms: int) -> List[int]:
+        """Cues overlapping the window [start_ms, end_ms)"""
+        return self._ending_after(bisect.bisect_left(self.starts, end_ms), start_ms)
+
+    def starting_between(self, start_ms: int, end_ms: int) -> List[int]:
+        """Cues whose start is within [start_ms, end_ms] (O(log n + k))"""
+        lo = bisect.bisect_left(self.starts, start_ms)
+        hi = bisect.bisect_right(self.starts, end_ms)
+        return self.order[lo:hi]
+
+    def overlapping(self, index: int) -> List[int]:
+        """Other cues overlapping cue `index` (touching end to start does not count)"""
+        line = self.events[index]
+        return [i for i in self.between(line.start, line.end) if i != index] if line.end > line.start else []
@@ -0,0 +1,224 @@
+"""
+Language identification of subtitle tracks from a sample of their cues.
+
+The script is decided first, from the file's script profile when the caller
+already has one, else from Unicode ranges (Thai, Han, kana, Hangul,
+Cyrillic...); Latin-script text is then matched against character trigram
+profiles built from the most frequent words of each language, which is what
+dialogue is mostly made of.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Sequence
+
+from .profiling import stage
+
+# Frequent words per Latin-script language, most frequent first
+_SEED_WORDS = {
+    "en": "the you i to a and it is that of what in me this we he for my your on have be not no do are was "
+          "just know don't can with all but get so like here there they she him her right go yeah okay oh "
+          "come want think about out up now how well got one did see why who were would let's going look",
+    "fr": "je de pas tu le la les est que un vous et à il ce ne une on en des ça qui pour c'est mais "
+          "moi me suis a du fait bien dans elle te oui non avec tout nous au sur se j'ai quoi plus sais "
+          "rien toi veux ai été où lui faire peux comme dit vais être très ils là alors aussi",
+    "es": "de que no a la el es y en lo un por qué me una te los se con para mi está si bien pero yo "
+          "eso las sí su tu aquí del al como le ya muy esto hay más todo estoy ahora él nada puedo "
+          "tengo algo así vamos creo gracias cuando ella dónde sé favor tiene",
+    "de": "ich die und sie der nicht du das ist es zu ein was wir ja mit den er mir in sich ein mich "
+          "auf dich eine hier so haben habe wie dass noch für an wenn von nein jetzt mal bin auch "
+          "kann aber gut hast doch uns nur schon alles weiß sind dem war da",
+    "it": "non che di è e la il un a per in mi sono ti ho una si lo ma cosa ci le con bene questo "
+          "no sei da io se qui mio hai come tu della sì gli del me ne al tutto perché fare vuoi "
+          "anche solo ora così sua molto grazie allora dove niente",
+    "pt": "que não de o a é e eu um você para se uma me do isso da em no com os está mas por na "
+          "te ele bem sim aqui meu tem o que vamos ela como foi mais estou sei só quero ao tudo "
+          "nós agora muito obrigado então onde fazer nada lá pode",
+    "nl": "ik je het de dat is een niet en wat van we in ze hij op te zijn er maar die met voor "
+          "me hebt heb dit als ben was mijn jij hier nee ja wel goed weet kan naar moet om bent "
+          "heeft zo nog dan gaan doen ook wil gaat niets",
+    "vi": "không tôi anh là có em được cô một của và cái này đi đó người chúng ta làm gì với cho "
+          "ông đã rồi bạn nó sẽ phải thì để biết đây ở nhé vậy những muốn nhưng như lại chuyện ra "
+          "khi đang cậu mình",
+}
+
+# Languages identified from their script alone
+_SCRIPT_LANGUAGES = {"thai": "th", "hangul": "ko", "cyrillic": "ru", "arabic": "ar",
+                     "hebrew": "he", "greek": "el"}
+
+_SCRIPT_RANGES = {
+    "thai": re.compile('[฀-๿]'),
+    "han": re.compile('[一-鿿㐀-䶿]'),
+    "kana": re.compile('[぀-ヿ]'),
+    "hangul": re.compile('[가-힯ᄀ-ᇿ]'),
+    "cyrillic": re.compile('[Ѐ-ӿ]'),
+    "arabic": re.compile('[؀-ۿ]'),
+    "hebrew": re.compile('[֐-׿]'),
+    "greek": re.compile('[Ͱ-Ͽ]'),
+    "latin": re.compile('[A-Za-zÀ-ɏḀ-ỿ]'),
+}
+
+# Names a track keyword may use for each language (lowercase)
+LANGUAGE_ALIASES = {
+    "en": ("en", "eng", "english"),
+    "fr": ("fr", "fre", "fra", "french", "français", "vf", "vff"),
+    "es": ("es", "spa", "spanish", "español", "esp"),
+    "de": ("de", "ger", "deu", "german", "deutsch"),
+    "it": ("it", "ita", "italian", "italiano"),
+    "pt": ("pt", "por", "portuguese", "português", "ptbr", "pt-br"),
+    "nl": ("nl", "dut", "nld", "dutch", "nederlands"),
+    "vi": ("vi", "vie", "vietnamese"),
+    "th": ("th", "tha", "thai"),
+    "zh": ("zh", "chi", "zho", "chinese", "chs", "cht", "cn"),
+    "ja": ("ja", "jpn", "japanese", "jp"),
+    "ko": ("ko", "kor", "korean", "kr"),
+    "ru": ("ru", "rus", "russian"),
+    "ar": ("ar", "ara", "arabic"),
+    "he": ("he", "heb", "hebrew"),
+    "el": ("el", "gre", "ell", "greek"),
+}
+
+_TAG_RE = re.compile(r'<[^>]+>|\{[^}]*\}|\\[Nn]')
+_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+
+def _trigrams(words: Iterable[str]) -> Counter:
+    counts = Counter()
+    for word in words:
+        padded = f" {word} "
+        counts.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return counts
+
+
+@lru_cache(maxsize=1)
+def _profiles() -> Dict[str, tuple]:
+    """language -> (trigram counts, total), built once from the seed words"""
+    profiles = {}
+    for language, words in _SEED_WORDS.items():
+        counts = _trigrams(words.split())
+        profiles[language] = (counts, sum(counts.values()))
+    return profiles
+
+
+def _profile_script(script_profile: dict) -> Optional[tuple]:
+    """
+    (script, share) settled by a whole-file script profile (see
+    repair.build_corruption_report), or None when the scan is still needed
+    """
+    non_ascii = script_profile.get("non_ascii", 0)
+    if not non_ascii:
+        return "latin", 1.0
+    thai, chinese = script_profile.get("thai", 0), script_profile.get("chinese", 0)
+    if thai > non_ascii / 2:
+        return "thai", thai / non_ascii
+    if chinese > non_ascii / 2:
+        return "han", chinese / non_ascii
+    if script_profile.get("french", 0) > non_ascii / 2:
+        return "latin", 1 - (thai + chinese) / non_ascii
+    return None
+
+
+def identify_language(texts: Iterable[str], script_profile: Optional[dict] = None) -> dict:
+    """
+    Identify the language of a piece of text (typically sampled cue texts)
+
+    Args:
+        texts: Cue texts
+        script_profile: Script character counts of the whole file, as in a
+            corruption report ({"thai", "chinese", "french", "non_ascii"}).
+            When it settles the script, the Unicode range scan is skipped and
+            only that script's languages are candidates (no Vietnamese for
+            pure ASCII text).
+
+    Returns:
+        {"language": ISO 639-1 code or "unknown", "script": dominant script,
+         "confidence": 0-100, "scores": {language: mean log-likelihood per
+         trigram} for Latin-script text}
+    """
+    text = _TAG_RE.sub(" ", "\n".join(texts))
+    result = {"language": "unknown", "script": "unknown", "confidence": 0, "scores": {}}
+    settled = _profile_script(script_profile) if script_profile else None
+    candidates = _SEED_WORDS
+    if settled:
+        script, share = settled
+        if script == "latin" and not script_profile.get("non_ascii"):
+            candidates = [language for language in _SEED_WORDS if language != "vi"]
+    else:
+        script_counts = {name: len(pattern.findall(text)) for name, pattern in _SCRIPT_RANGES.items()}
+        letters = sum(script_counts.values())
+        if not letters:
+            return result
+
+        # Han and kana count together (Japanese mixes both)
+        cjk = script_counts["han"] + script_counts["kana"]
+        script = max(script_counts, key=script_counts.get)
+        if cjk > script_counts[script]:
+            script = "han"
+        share = (cjk if script == "han" else script_counts[script]) / letters
+    result["script"] = script
+
+    if script == "han":
+        if settled:
+            script_counts = {name: len(_SCRIPT_RANGES[name].findall(text)) for name in ("han", "kana")}
+        cjk = script_counts["han"] + script_counts["kana"]
+        result["language"] = "ja" if script_counts["kana"] > 0.05 * cjk else "zh"
+        result["confidence"] = round(100 * share)
+        return result
+    if script in _SCRIPT_LANGUAGES:
+        result["language"] = _SCRIPT_LANGUAGES[script]
+        result["confidence"] = round(100 * share)
+        return result
+
+    # Latin script: naive Bayes over character trigrams
+    sample = _trigrams(w.lower() for w in _WORD_RE.findall(text))
+    n = sum(sample.values())
+    if not n:
+        return result
+    scores = {}
+    profiles = _profiles()
+    for language in candidates:
+        counts, total = profiles[language]
+        log_likelihood = sum(c * math.log((counts.get(t, 0) + 0.1) / (total + 0.1 * len(counts)))
+                             for t, c in sample.items())
+        scores[language] = log_likelihood / n
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    gap = scores[ranked[0]] - scores[ranked[1]]
+    # Evidence grows with the gap per trigram and the amount of text
+    result.update(language=ranked[0], scores={k: round(v, 3) for k, v in scores.items()},
+                  confidence=round(100 * share * (1 - math.exp(-gap * n / 10))))
+    return result
+
+
+def identify_track(subs, sample_size: int = 200, script_profile: Optional[dict] = None) -> dict:
+    """
+    Identify the language of a parsed track from up to sample_size cues
+    spread over the whole file (see identify_language for script_profile)
+    """
+    with stage("identify"):
+        events = list(subs)
+        step = max(1, len(events) // sample_size)
+        return identify_language((line.text for line in events[::step][:sample_size]), script_profile)
+
+
+# Stable order of the languages, for tracks that no keyword tells apart
+_LANGUAGE_ORDER = {code: idx for idx, code in enumerate(LANGUAGE_ALIASES)}
+
+
+def language_order(language: Optional[str]) -> int:
+    """Stable position of a language (LANGUAGE_ALIASES order), unknown ones last"""
+    return _LANGUAGE_ORDER.get(language, len(_LANGUAGE_ORDER))
+
+
+def language_matches(language: Optional[str], keyword: str) -> bool:
+    """True when a track keyword ("FR", "french", "VF"...) names the language code"""
+    return bool(language) and keyword.lower() in LANGUAGE_ALIASES.get(language, (language,))
+
+
+def language_rank(language: Optional[str], track_keywords: Sequence[str]) -> int:
+    """Position of a language among the track keywords (1-based), 0 when none names it"""
+    for idx, keyword in enumerate(track_keywords):
+        if language_matches(language, keyword):
+            return idx + 1
+    return 0
+
@@ -0,0 +1,262 @@
+"""
+Online two-track merge for live caption feeds.
+
+merge_subtitles needs both files up front. OnlineMerger takes the cues of
+Track A and Track B as they arrive and emits merged cues as soon as no future
+cue can still change them, with the pairing of merge_subtitles' greedy mode:
+every cue of A, in start order, takes the unmatched cue of B whose start is
+nearest within threshold_ms.
+
+Each track has a watermark: the start below which no more cue will enter the
+matcher. Cues may arrive up to slack_ms out of order (they wait in a small
+reorder buffer), so the watermark trails the latest start by slack_ms, or
+follows a timestamp the feed sends as a keep-alive during silent stretches.
+A cue of A is decided once B's watermark is past its start + threshold_ms;
+a cue of B is left unmatched once no pending or future cue of A can take it.
+Merged cues are released in start order, so only the cues of the last
+threshold_ms + slack_ms are ever held, however long the stream runs.
+"""
+import heapq
+import itertools
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional, Union
+
+import pysubs2
+
+from .tracks import _stack_cues, track_settings
+
+DEFAULT_SLACK_MS = 2000  # How far out of start order a feed may deliver cues
+
+_INF = float("inf")
+
+# A stream item: a cue, or a timestamp (ms) before which the track will send no more cue
+StreamItem = Union[pysubs2.SSAEvent, int]
+
+
+class OnlineMerger:
+    """
+    Incremental greedy merge of two cue streams
+
+    Feed it with push(track, cue) (track 0 is A, 1 is B), advance(time_ms)
+    when a feed is known to have reached a time without sending a cue, and
+    close(track) at the end of a feed. Every call returns the merged cues
+    that became final, in start order; finish() closes both tracks and
+    returns the rest. Input cues are copied, never modified.
+
+    Args:
+        threshold_ms: Maximum start difference between matched cues
+        slack_ms: How far out of start order cues of a track may arrive;
+            a later cue is emitted on its own and counted in stats["late"]
+        color_hex, color_track, shift_a, shift_b, shift_global: As in merge_subtitles
+    """
+
+    def __init__(self, threshold_ms: int = 1000, slack_ms: int = DEFAULT_SLACK_MS,
+                 color_hex: str = "#ffff54", color_track: str = "Track B",
+                 shift_a: int = 0, shift_b: int = 0, shift_global: int = 0):
+        if threshold_ms < 0 or slack_ms < 0:
+            raise ValueError("threshold_ms and slack_ms must not be negative")
+        self.threshold_ms = threshold_ms
+        self.slack_ms = slack_ms
+        self.shift_global = shift_global
+        self._colors = [opts["color"] for opts in track_settings(2, color_hex, color_track)]
+        self._shifts = (shift_a, shift_b)
+        self._incoming = ([], [])  # Reorder buffers: heaps of (start, seq, cue) above the watermark
+        self._latest = [-_INF, -_INF]  # Highest start received per track
+        self._clock = [-_INF, -_INF]  # Keep-alive timestamps per track
+        self._closed = [False, False]
+        self._pending_a = deque()  # Cues of A waiting for their match to be decided
+        self._pending_b: list = []  # Unmatched cues of B that A may still take, in start order
+        self._ready: list = []  # Heap of (start, end, seq, line) decided but not released
+        self._seq = itertools.count()
+        self.stats = {"cues_a": 0, "cues_b": 0, "emitted": 0, "matched": 0, "late": 0, "max_pending": 0}
+
+    def watermark(self, track: int) -> float:
+        """Start below which no more cue of the track will reach the matcher"""
+        if self._closed[track]:
+            return _INF
+        return max(self._latest[track] - self.slack_ms, self._clock[track])
+
+    def push(self, track: int, cue) -> List[pysubs2.SSAEvent]:
+        """
+        Add one cue (anything with start, end and text in ms) to Track A (0) or B (1)
+
+        Raises:
+            ValueError: If the track was already closed
+        """
+        if self._closed[track]:
+            raise ValueError(f"Track {'AB'[track]} is closed")
+        line = pysubs2.SSAEvent(start=cue.start, end=cue.end, text=cue.text)
+        if self._shifts[track]:
+            line.start = max(0, line.start + self._shifts[track])
+            line.end = max(0, line.end + self._shifts[track])
+        self.stats[f"cues_{'ab'[track]}"] += 1
+
+        if line.start < self.watermark(track):
+            # Too late to be matched without changing cues already decided
+            self.stats["late"] += 1
+            return [self._emit(self._stack([(track, line)]))]
+
+        heapq.heappush(self._incoming[track], (line.start, next(self._seq), line))
+        self._latest[track] = max(self._latest[track], line.start)
+        return self._drain()
+
+    def advance(self, time_ms: int, track: Optional[int] = None) -> List[pysubs2.SSAEvent]:
+        """Promise that no cue starting before time_ms will come (on one track, or both)"""
+        for k in (0, 1) if track is None else (track,):
+            self._clock[k] = max(self._clock[k], time_ms + self._shifts[k])
+        return self._drain()
+
+    def close(self, track: int) -> List[pysubs2.SSAEvent]:
+        """End of a feed: its buffered cues become final"""
+        self._closed[track] = True
+        return self._drain()
+
+    def finish(self) -> List[pysubs2.SSAEvent]:
+        """End of both feeds: every remaining cue"""
+        self._closed[0] = self._closed[1] = True
+        return self._drain()
+
+    @property
+    def pending(self) -> int:
+        """Cues currently held (reorder buffers, undecided cues and unreleased output)"""
+        return (len(self._incoming[0]) + len(self._incoming[1]) + len(self._pending_a) +
+                len(self._pending_b) + len(self._ready))
+
+    def _stack(self, cues) -> pysubs2.SSAEvent:
+        tracks = [[], []]
+        for k, cue in cues:
+            tracks[k].append(cue)
+        return _stack_cues(tracks, [[(k, 0) for k, _ in cues]], self._colors)[0]
+
+    def _emit(self, line: pysubs2.SSAEvent) -> pysubs2.SSAEvent:
+        if self.shift_global:
+            line.start = max(0, line.start + self.shift_global)
+            line.end = max(0, line.end + self.shift_global)
+        self.stats["emitted"] += 1
+        return line
+
+    def _decided(self, line: pysubs2.SSAEvent) -> None:
+        heapq.heappush(self._ready, (line.start, line.end, next(self._seq), line))
+
+    def _drain(self) -> List[pysubs2.SSAEvent]:
+        self.stats["max_pending"] = max(self.stats["max_pending"], self.pending)
+        threshold = self.threshold_ms
+        watermarks = [self.watermark(0), self.watermark(1)]
+
+        # Reorder buffers -> matcher, in start order
+        for line in self._admit(0, watermarks[0]):
+            self._pending_a.append(line)
+        for line in self._admit(1, watermarks[1]):
+            self._pending_b.append(line)
+
+        pending_a, pending_b = self._pending_a, self._pending_b
+        while True:
+            progress = False
+            # A cue of A is decided once every cue of B that could match it is in
+            while pending_a and watermarks[1] > pending_a[0].start + threshold:
+                line_a = pending_a.popleft()
+                best, best_diff = None, threshold + 1
+                for idx, line_b in enumerate(pending_b):
+                    if line_b.start > line_a.start + threshold:
+                        break
+                    diff = abs(line_a.start - line_b.start)
+                    if diff < best_diff:
+                        best, best_diff = idx, diff
+                if best is None:
+                    self._decided(self._stack([(0, line_a)]))
+                else:
+                    self._decided(self._stack([(0, line_a), (1, pending_b.pop(best))]))
+                    self.stats["matched"] += 1
+                progress = True
+            # A cue of B stays alone once no pending or future cue of A is within reach
+            while pending_b:
+                limit = pending_b[0].start + threshold
+                if watermarks[0] <= limit or (pending_a and pending_a[0].start <= limit):
+                    break
+                self._decided(self._stack([(1, pending_b.pop(0))]))
+                progress = True
+            if not progress:
+                break
+
+        # Release in start order: nothing still undecided can start earlier
+        frontier = min(pending_a[0].start if pending_a else watermarks[0],
+                       pending_b[0].start if pending_b else watermarks[1])
+        released = []
+        while self._ready and self._ready[0][0] < frontier:
+            released.append(self._emit(heapq.heappop(self._ready)[3]))
+        return released
+
+    def _admit(self, track: int, watermark: float) -> Iterator[pysubs2.SSAEvent]:
+        incoming = self._incoming[track]
+        while incoming and incoming[0][0] < watermark:
+            yield heapq.heappop(incoming)[2]
+
+
+def _feed(merger: OnlineMerger, track: int, item: StreamItem) -> List[pysubs2.SSAEvent]:
+    if isinstance(item, int):
+        return merger.advance(item, track)
+    return merger.push(track, item)
+
+
+def merge_streams(stream_a: Iterable[StreamItem], stream_b: Iterable[StreamItem],
+                  **options) -> Iterator[pysubs2.SSAEvent]:
+    """
+    Merge two cue iterables lazily (see OnlineMerger for the options)
+
+    The streams are read alternately, always from the one that is furthest
+    behind, so only the current window of either stays in memory. Items may
+    also be integers: a timestamp in ms before which that stream will send
+    no more cue (a keep-alive for silent stretches).
+
+    Yields:
+        Merged cues in start order, each as soon as it is final
+    """
+    merger = OnlineMerger(**options)
+    iterators = [iter(stream_a), iter(stream_b)]
+    heads = [next(iterators[0], None), next(iterators[1], None)]
+    for k in (0, 1):
+        if heads[k] is None:
+            yield from merger.close(k)
+
+    def position(item):
+        return item if isinstance(item, int) else item.start
+
+    while heads[0] is not None or heads[1] is not None:
+        if heads[1] is None or (heads[0] is not None and position(heads[0]) <= position(heads[1])):
+            k = 0
+        else:
+            k = 1
+        yield from _feed(merger, k, heads[k])
+        heads[k] = next(iterators[k], None)
+        if heads[k] is None:
+            yield from merger.close(k)
+
+
+async def amerge_streams(stream_a: AsyncIterable[StreamItem], stream_b: AsyncIterable[StreamItem],
+                         **options) -> AsyncIterator[pysubs2.SSAEvent]:
+    """
+    merge_streams for async feeds: both are awaited concurrently and every
+    item is merged as it arrives
+    """
+    import asyncio
+
+    merger = OnlineMerger(**options)
+    iterators = [stream_a.__aiter__(), stream_b.__aiter__()]
+    waiting = {asyncio.ensure_future(iterators[k].__anext__()): k for k in (0, 1)}
+    try:
+        while waiting:
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=waiting.get):
+                k = waiting.pop(task)
+                try:
+                    item = task.result()
+                except StopAsyncIteration:
+                    lines = merger.close(k)
+                else:
+                    lines = _feed(merger, k, item)
+                    waiting[asyncio.ensure_future(iterators[k].__anext__())] = k
+                for line in lines:
+                    yield line
+    finally:
+        for task in waiting:
+            task.cancel()
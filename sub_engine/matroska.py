@@ -0,0 +1,426 @@
+"""
+Subtitle tracks out of Matroska (.mkv/.mks) files, in pure Python.
+
+The file is memory-mapped and walked element header by element header:
+clusters are entered, blocks are identified by their track number (the
+first byte of the payload) and every video/audio payload is skipped without
+being read. Work therefore follows the number of elements, not the size of
+the file: a 4 GB episode costs about as much as a 400 MB one with the same
+number of frames.
+
+Text tracks come out as documents ready for the rest of the pipeline:
+S_TEXT/UTF8 and S_TEXT/WEBVTT as SRT, S_TEXT/ASS and S_TEXT/SSA as ASS
+rebuilt from the track header (CodecPrivate). zlib and header-stripping
+content compression are undone; bitmap subtitles (VobSub, PGS) are listed
+but not extracted.
+"""
+import mmap
+import os
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+from .profiling import stage
+
+# Element IDs (with their length marker bits, as written in the file)
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+CODEC_PRIVATE = 0x63A2
+LANGUAGE = 0x22B59C
+LANGUAGE_IETF = 0x22B59D
+NAME = 0x536E
+FLAG_DEFAULT = 0x88
+FLAG_FORCED = 0x55AA
+CONTENT_ENCODINGS = 0x6D80
+CONTENT_ENCODING = 0x6240
+CONTENT_ENCODING_TYPE = 0x5033
+CONTENT_COMPRESSION = 0x5034
+CONTENT_COMP_ALGO = 0x4254
+CONTENT_COMP_SETTINGS = 0x4255
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+BLOCK_DURATION = 0x9B
+
+SUBTITLE_TRACK_TYPE = 0x11
+TEXT_CODECS = {"S_TEXT/UTF8": "srt", "S_TEXT/WEBVTT": "srt", "D_WEBVTT/SUBTITLES": "srt",
+               "S_TEXT/ASS": "ass", "S_TEXT/SSA": "ass"}
+CONTAINER_EXTENSIONS = ('.mkv', '.mks')
+DEFAULT_DURATION_MS = 2000  # Blocks without a BlockDuration (SimpleBlocks)
+
+# Children expected inside a cluster of unknown size; any other ID ends it
+_CLUSTER_CHILDREN = {CLUSTER_TIMECODE, SIMPLE_BLOCK, BLOCK_GROUP, 0xA7, 0xAB, 0xA8, 0xEC, 0xBF}
+_ASS_EVENTS_FORMAT = b"Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"
+
+
+class _Walker:
+    """Element header reader over a mapped file; `elements` counts the headers read"""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.elements = 0
+
+    def header(self, pos: int):
+        """
+        (id, data start, data size or None when unknown) of the element at pos
+
+        Raises:
+            ValueError: If the header is malformed or runs past the end of the file
+        """
+        buf = self.buf
+        start = pos
+        if pos >= len(buf):
+            raise ValueError(f"Truncated element at byte {start}")
+        first = buf[pos]
+        id_len = 9 - first.bit_length()
+        if not 1 <= id_len <= 4:
+            raise ValueError(f"Invalid element ID at byte {pos}")
+        if pos + id_len >= len(buf):
+            raise ValueError(f"Truncated element at byte {start}")
+        element_id = int.from_bytes(buf[pos:pos + id_len], "big")
+        pos += id_len
+
+        first = buf[pos]
+        size_len = 9 - first.bit_length()
+        if not 1 <= size_len <= 8:
+            raise ValueError(f"Invalid element size at byte {pos}")
+        if pos + size_len > len(buf):
+            raise ValueError(f"Truncated element at byte {start}")
+        size = int.from_bytes(buf[pos:pos + size_len], "big") & ((1 << (7 * size_len)) - 1)
+        self.elements += 1
+        return element_id, pos + size_len, None if size == (1 << (7 * size_len)) - 1 else size
+
+    def children(self, start: int, end: int):
+        """(id, data start, size) of the direct children of an element with known size"""
+        pos = start
+        while pos < end:
+            element_id, data, size = self.header(pos)
+            if size is None:
+                size = end - data
+            elif data + size > end:
+                raise ValueError(f"Truncated element at byte {pos}")
+            yield element_id, data, size
+            pos = data + size
+
+    def uint(self, data: int, size: int) -> int:
+        return int.from_bytes(self.buf[data:data + size], "big")
+
+    def text(self, data: int, size: int) -> str:
+        return bytes(self.buf[data:data + size]).rstrip(b"\0").decode("utf-8", errors="replace")
+
+
+def _parse_track(walker: _Walker, data: int, size: int) -> dict:
+    track = {"number": None, "type": None, "codec": "", "language": "eng", "name": "",
+             "default": True, "forced": False, "private": b"", "compression": None}
+    for element_id, child, child_size in walker.children(data, data + size):
+        if element_id == TRACK_NUMBER:
+            track["number"] = walker.uint(child, child_size)
+        elif element_id == TRACK_TYPE:
+            track["type"] = walker.uint(child, child_size)
+        elif element_id == CODEC_ID:
+            track["codec"] = walker.text(child, child_size)
+        elif element_id == CODEC_PRIVATE:
+            track["private"] = bytes(walker.buf[child:child + child_size])
+        elif element_id == LANGUAGE and track.get("ietf") is None:
+            track["language"] = walker.text(child, child_size)
+        elif element_id == LANGUAGE_IETF:
+            track["language"] = track["ietf"] = walker.text(child, child_size)
+        elif element_id == NAME:
+            track["name"] = walker.text(child, child_size)
+        elif element_id == FLAG_DEFAULT:
+            track["default"] = bool(walker.uint(child, child_size))
+        elif element_id == FLAG_FORCED:
+            track["forced"] = bool(walker.uint(child, child_size))
+        elif element_id == CONTENT_ENCODINGS:
+            track["compression"] = _parse_encodings(walker, child, child_size)
+    track.pop("ietf", None)
+    return track
+
+
+def _parse_encodings(walker: _Walker, data: int, size: int):
+    """("zlib", b"") or ("strip", header bytes) for a compressed track, "encrypted", or None"""
+    for element_id, child, child_size in walker.children(data, data + size):
+        if element_id != CONTENT_ENCODING:
+            continue
+        kind, algo, settings = 0, 0, b""
+        for sub_id, sub, sub_size in walker.children(child, child + child_size):
+            if sub_id == CONTENT_ENCODING_TYPE:
+                kind = walker.uint(sub, sub_size)
+            elif sub_id == CONTENT_COMPRESSION:
+                for comp_id, comp, comp_size in walker.children(sub, sub + sub_size):
+                    if comp_id == CONTENT_COMP_ALGO:
+                        algo = walker.uint(comp, comp_size)
+                    elif comp_id == CONTENT_COMP_SETTINGS:
+                        settings = bytes(walker.buf[comp:comp + comp_size])
+        if kind == 1:
+            return "encrypted"
+        return ("zlib", b"") if algo == 0 else ("strip", settings) if algo == 3 else "unsupported"
+    return None
+
+
+def _top_level(walker: _Walker):
+    """(id, data start, size) of the children of the first Segment, unknown-size clusters included"""
+    buf = walker.buf
+    if buf[:4] != b"\x1a\x45\xdf\xa3":
+        raise ValueError("Not a Matroska file (no EBML header)")
+    pos = 0
+    while pos < len(buf):
+        element_id, data, size = walker.header(pos)
+        if element_id == SEGMENT:
+            break
+        if size is None:
+            raise ValueError("Unknown-size element before the Segment")
+        pos = data + size
+    else:
+        raise ValueError("Not a Matroska file (no Segment)")
+
+    end = len(buf) if size is None else min(len(buf), data + size)
+    pos = data
+    while pos < end:
+        element_id, child, child_size = walker.header(pos)
+        if child_size is None:
+            if element_id != CLUSTER:
+                raise ValueError(f"Unknown-size element 0x{element_id:X} is not supported")
+            child_size = _cluster_extent(walker, child, end) - child
+        elif child + child_size > end:
+            raise ValueError(f"Truncated element at byte {pos}")
+        yield element_id, child, child_size
+        pos = child + child_size
+
+
+def _cluster_extent(walker: _Walker, data: int, end: int) -> int:
+    """End of an unknown-size cluster: the first element that cannot be one of its children"""
+    pos = data
+    while pos < end:
+        element_id, child, child_size = walker.header(pos)
+        if element_id not in _CLUSTER_CHILDREN or child_size is None:
+            return pos
+        pos = child + child_size
+    return end
+
+
+def _read_tracks(walker: _Walker, top: list) -> tuple:
+    scale = 1_000_000
+    tracks = []
+    for element_id, data, size in top:
+        if element_id == INFO:
+            for child_id, child, child_size in walker.children(data, data + size):
+                if child_id == TIMECODE_SCALE:
+                    scale = walker.uint(child, child_size)
+        elif element_id == TRACKS:
+            tracks.extend(_parse_track(walker, child, child_size)
+                          for child_id, child, child_size in walker.children(data, data + size)
+                          if child_id == TRACK_ENTRY)
+    return scale, [t for t in tracks if t["type"] == SUBTITLE_TRACK_TYPE]
+
+
+def _public(track: dict) -> dict:
+    extractable = track["compression"] not in ("encrypted", "unsupported")
+    return {"number": track["number"], "codec": track["codec"], "language": track["language"],
+            "name": track["name"], "default": track["default"], "forced": track["forced"],
+            "format": TEXT_CODECS.get(track["codec"]) if extractable else None}
+
+
+def list_subtitle_tracks(path: str) -> List[dict]:
+    """
+    Subtitle tracks of a Matroska file, without reading any cluster
+
+    Returns:
+        List of {"number", "codec", "language", "name", "default", "forced",
+        "format": "srt"/"ass", or None when the track cannot be extracted}
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        walker = _Walker(buf)
+        top = []
+        for element_id, data, size in _top_level(walker):
+            if element_id in (INFO, TRACKS):
+                top.append((element_id, data, size))
+                if len(top) == 2:
+                    break  # The rest is clusters, cues and tags (possibly truncated)
+        return [_public(track) for track in _read_tracks(walker, top)[1]]
+
+
+def _format_srt_time(ms: int) -> bytes:
+    hours, ms = divmod(max(0, ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}".encode()
+
+
+def _format_ass_time(ms: int) -> bytes:
+    hours, ms = divmod(max(0, ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}.{ms // 10:02d}".encode()
+
+
+def _document(track: dict, cues: List[tuple]) -> bytes:
+    """SRT or ASS bytes from (start_ms, end_ms, payload) cues"""
+    if TEXT_CODECS[track["codec"]] == "srt":
+        cues.sort(key=lambda c: c[0])
+        parts = []
+        for idx, (start, end, payload) in enumerate(cues, 1):
+            text = payload.rstrip(b"\0").strip().replace(b"\r\n", b"\n")
+            parts.append(b"%d\n%s --> %s\n%s\n" % (idx, _format_srt_time(start), _format_srt_time(end), text))
+        return b"\n".join(parts)
+
+    # ASS/SSA payloads: ReadOrder, Layer (or Marked), Style, Name, MarginL, MarginR, MarginV, Effect, Text
+    header = track["private"].rstrip(b"\0").replace(b"\r\n", b"\n").rstrip()
+    if b"[Events]" not in header:
+        header += b"\n\n[Events]\n" + _ASS_EVENTS_FORMAT
+    lines = []
+    for start, end, payload in cues:
+        fields = payload.rstrip(b"\0").split(b",", 8)
+        if len(fields) < 9:
+            continue
+        read_order = int(fields[0]) if fields[0].strip().isdigit() else len(lines)
+        lines.append((start, read_order, b"Dialogue: %s,%s,%s,%s" % (
+            fields[1], _format_ass_time(start), _format_ass_time(end), b",".join(fields[2:]))))
+    lines.sort(key=lambda line: line[:2])
+    return header + b"\n" + b"\n".join(line for _, _, line in lines) + b"\n"
+
+
+def read_subtitle_tracks(path: str, numbers: Optional[Sequence[int]] = None) -> dict:
+    """
+    Extract the text subtitle tracks of a Matroska file in one walk
+
+    Args:
+        path: .mkv/.mks file
+        numbers: Track numbers to extract (default: every text track)
+
+    Returns:
+        {"tracks": [track dicts as list_subtitle_tracks, plus "cues" and "data":
+        the SRT/ASS document as bytes (None when not extracted)],
+        "stats": {"file_size", "clusters", "blocks", "skipped_blocks",
+        "elements", "payload_bytes"}}
+
+    Raises:
+        ValueError: If the file is not Matroska
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        walker = _Walker(buf)
+        with stage("extract"):
+            top = list(_top_level(walker))
+            scale, tracks = _read_tracks(walker, top)
+            wanted = {t["number"]: t for t in tracks if _public(t)["format"]
+                      and (numbers is None or t["number"] in numbers)}
+            cues: Dict[int, list] = {number: [] for number in wanted}
+            stats = {"file_size": len(buf), "clusters": 0, "blocks": 0, "skipped_blocks": 0, "payload_bytes": 0}
+            to_ms = scale / 1_000_000
+
+            for element_id, data, size in top:
+                if element_id != CLUSTER or not wanted:
+                    continue
+                stats["clusters"] += 1
+                cluster_time = 0
+                for child_id, child, child_size in walker.children(data, data + size):
+                    if child_id == CLUSTER_TIMECODE:
+                        cluster_time = walker.uint(child, child_size)
+                        continue
+                    if child_id == SIMPLE_BLOCK:
+                        block, block_size, duration = child, child_size, None
+                    elif child_id == BLOCK_GROUP:
+                        block, duration = None, None
+                        # Peek at the Block's track number before walking the rest of the group
+                        for group_id, item, item_size in walker.children(child, child + child_size):
+                            if group_id == BLOCK:
+                                block, block_size = item, item_size
+                                if buf[item] & 0x7F not in wanted and buf[item] & 0x80:
+                                    break
+                            elif group_id == BLOCK_DURATION:
+                                duration = walker.uint(item, item_size)
+                        if block is None:
+                            continue
+                    else:
+                        continue
+
+                    stats["blocks"] += 1
+                    first = buf[block]
+                    if first & 0x80:
+                        number, header = first & 0x7F, 1
+                    else:  # Track numbers above 127 (two-byte or longer vint)
+                        length = 9 - first.bit_length()
+                        number = int.from_bytes(buf[block:block + length], "big") & ((1 << (7 * length)) - 1)
+                        header = length
+                    track = wanted.get(number)
+                    if track is None or buf[block + header + 2] & 0x06:  # Other track, or laced
+                        stats["skipped_blocks"] += 1
+                        continue
+
+                    relative = int.from_bytes(buf[block + header:block + header + 2], "big", signed=True)
+                    payload = bytes(buf[block + header + 3:block + block_size])
+                    stats["payload_bytes"] += len(payload)
+                    compression = track["compression"]
+                    if compression == ("zlib", b""):
+                        payload = zlib.decompress(payload)
+                    elif compression:
+                        payload = compression[1] + payload
+                    start = round((cluster_time + relative) * to_ms)
+                    end = start + (round(duration * to_ms) if duration is not None else DEFAULT_DURATION_MS)
+                    cues[number].append((start, end, payload))
+            stats["elements"] = walker.elements
+
+        result = []
+        for track in tracks:
+            info = _public(track)
+            extracted = cues.get(track["number"])
+            info["cues"] = len(extracted) if extracted is not None else 0
+            info["data"] = _document(track, extracted) if extracted is not None else None
+            result.append(info)
+        return {"tracks": result, "stats": stats}
+
+
+def _same_content(path: str, data: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def extract_subtitles(path: str, output_dir: str, stem: Optional[str] = None,
+                      numbers: Optional[Sequence[int]] = None) -> List[dict]:
+    """
+    Write the text subtitle tracks of a Matroska file next to each other
+
+    Files are named <stem>.<language>[.forced][.<track number>].<srt|ass>,
+    the track number only being added when a name would repeat, so the
+    language reaches track keywords and episode pairing. Files whose content
+    did not change are left alone, so their mtime keeps later steps up to date.
+
+    Returns:
+        The track dicts of read_subtitle_tracks, with "path" (None when not
+        extracted) instead of "data"
+    """
+    stem = stem or os.path.splitext(os.path.basename(path))[0]
+    read = read_subtitle_tracks(path, numbers)
+    os.makedirs(output_dir, exist_ok=True)
+    names = {}
+    for track in read["tracks"]:
+        if track["data"] is not None:
+            name = f"{stem}.{track['language']}" + (".forced" if track["forced"] else "")
+            names.setdefault(name, []).append(track)
+
+    written = []
+    for track in read["tracks"]:
+        data = track.pop("data")
+        track["path"] = None
+        if data is not None:
+            name = f"{stem}.{track['language']}" + (".forced" if track["forced"] else "")
+            if len(names[name]) > 1:
+                name += f".{track['number']}"
+            track["path"] = os.path.join(output_dir, f"{name}.{track['format']}")
+            if not _same_content(track["path"], data):
+                with open(track["path"], "wb") as f:
+                    f.write(data)
+        written.append(track)
+    return written
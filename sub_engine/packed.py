@@ -0,0 +1,218 @@
+"""
+Packed binary tracks for handing parsed cues to worker processes without
+pickling them.
+
+Layout (little endian): a 24-byte header (b"SFPK", reserved, cue count,
+text size), then int64 arrays of starts, ends and text offsets (count + 1),
+then the UTF-8 text of every cue back to back. A track is published once in
+multiprocessing.shared_memory (or written to a file and mmap'd); workers
+attach by name, read starts and ends straight from the buffer and decode a
+cue's text only when it is used. Only the segment name goes to the worker,
+and only the (small) result comes back.
+
+PackedTrack behaves as a read-only sequence of cues with start, end, text
+and plaintext, so analyze_timing, match_cues and CueIndex take it as is.
+Styles, layers and other ASS fields are not packed.
+"""
+import mmap
+import struct
+from array import array
+from itertools import accumulate
+from typing import Any, Callable, List, Sequence, Tuple
+
+import pysubs2
+
+_HEADER = struct.Struct("<4sIQQ")
+_MAGIC = b"SFPK"
+
+
+def pack_track(events: Sequence) -> bytes:
+    """Packed bytes of cues (anything with start, end and text)"""
+    texts = [line.text.encode("utf-8") for line in events]
+    offsets = array("q", [0])
+    offsets.extend(accumulate(len(text) for text in texts))
+    return b"".join((_HEADER.pack(_MAGIC, 0, len(texts), offsets[-1]),
+                     array("q", (line.start for line in events)).tobytes(),
+                     array("q", (line.end for line in events)).tobytes(),
+                     offsets.tobytes(), *texts))
+
+
+class PackedCue:
+    """One cue of a PackedTrack; the text is decoded on first use"""
+
+    __slots__ = ("start", "end", "_track", "_index", "_text")
+    OVERRIDE_SEQUENCE = pysubs2.SSAEvent.OVERRIDE_SEQUENCE
+    plaintext = property(pysubs2.SSAEvent.plaintext.fget)
+
+    def __init__(self, track: "PackedTrack", index: int):
+        self.start = track.starts[index]
+        self.end = track.ends[index]
+        self._track = track
+        self._index = index
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._track.text(self._index)
+        return self._text
+
+    def to_event(self) -> pysubs2.SSAEvent:
+        return pysubs2.SSAEvent(start=self.start, end=self.end, text=self.text)
+
+
+class PackedTrack:
+    """
+    Read-only view of a packed track over any buffer (bytes, mmap, shared memory)
+
+    starts and ends are int64 memoryviews into the buffer (no copy). Call
+    close() (or use a with block) before the buffer is closed.
+
+    Raises:
+        ValueError: If the buffer does not hold a packed track
+    """
+
+    def __init__(self, buffer, owner=None):
+        self._view = memoryview(buffer)
+        magic, _, count, text_size = _HEADER.unpack_from(self._view)
+        if magic != _MAGIC:
+            raise ValueError("Not a packed track")
+        pos = _HEADER.size
+        self.starts = self._view[pos:pos + 8 * count].cast("q")
+        self.ends = self._view[pos + 8 * count:pos + 16 * count].cast("q")
+        self._offsets = self._view[pos + 16 * count:pos + 24 * count + 8].cast("q")
+        self._blob = self._view[pos + 24 * count + 8:pos + 24 * count + 8 + text_size]
+        self._owner = owner
+
+    @classmethod
+    def attach(cls, name: str) -> "PackedTrack":
+        """Attach to a track published by SharedTrack (in any process)"""
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm.buf, owner=shm)
+
+    @classmethod
+    def open(cls, path: str) -> "PackedTrack":
+        """Map a packed track file written by write_packed"""
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buf, owner=buf)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> PackedCue:
+        if index < 0:
+            index += len(self.starts)
+        if not 0 <= index < len(self.starts):
+            raise IndexError("cue index out of range")
+        return PackedCue(self, index)
+
+    def __iter__(self):
+        return (PackedCue(self, i) for i in range(len(self.starts)))
+
+    def text(self, index: int) -> str:
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def to_ssafile(self) -> pysubs2.SSAFile:
+        """Unpacked copy as a pysubs2 track"""
+        subs = pysubs2.SSAFile()
+        subs.events = [cue.to_event() for cue in self]
+        return subs
+
+    def close(self) -> None:
+        for view in (self.starts, self.ends, self._offsets, self._blob, self._view):
+            view.release()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def __enter__(self) -> "PackedTrack":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_packed(events: Sequence, path: str) -> int:
+    """Write a packed track file (see PackedTrack.open); returns its size"""
+    data = pack_track(events)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+class SharedTrack:
+    """
+    A track published in shared memory for worker processes
+
+    The publishing process owns the segment: close() (or the end of a with
+    block) removes it, so keep it open until the workers are done.
+    """
+
+    def __init__(self, events: Sequence):
+        from multiprocessing import shared_memory
+
+        data = pack_track(events)
+        self._shm = shared_memory.SharedMemory(create=True, size=len(data))
+        self._shm.buf[:len(data)] = data
+        self.name = self._shm.name
+        self.size = len(data)
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "SharedTrack":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _call_packed(func: Callable, names: Tuple[str, ...], args: tuple) -> Any:
+    """Worker side of map_shared: attach the tracks, run func, detach"""
+    tracks = [PackedTrack.attach(name) for name in names]
+    try:
+        return func(*tracks, *args)
+    finally:
+        for track in tracks:
+            track.close()
+
+
+def map_shared(func: Callable, tracks: Sequence[Sequence], calls: Sequence[Tuple[Sequence[int], tuple]],
+               jobs: int = 1) -> List[Any]:
+    """
+    Run func over shared tracks in a process pool, each track published once
+
+    Args:
+        func: Module-level function taking PackedTracks, then the call's
+            arguments; it should return a small result
+        tracks: Parsed tracks (pysubs2.SSAFile or lists of events)
+        calls: (track indices, extra args) per call, e.g. ((0, 1), (1000,))
+            runs func(tracks[0], tracks[1], 1000)
+        jobs: Worker processes (in-process, still on packed tracks, when 1)
+
+    Returns:
+        The results, in call order
+    """
+    if jobs <= 1 or len(calls) <= 1:
+        packed = [PackedTrack(pack_track(track)) for track in tracks]
+        return [func(*(packed[k] for k in indices), *args) for indices, args in calls]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    shared = []
+    try:
+        for track in tracks:
+            shared.append(SharedTrack(track))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(_call_packed, [func] * len(calls),
+                                 [tuple(shared[k].name for k in indices) for indices, _ in calls],
+                                 [tuple(args) for _, args in calls]))
+    finally:
+        for track in shared:
+            track.close()
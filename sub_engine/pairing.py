@@ -0,0 +1,195 @@
+"""
+Subtitle file discovery, episode codes and the pairing index that groups
+subtitle files into episodes.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .langid import language_order, language_rank
+
+SUBTITLE_EXTENSIONS = ('.srt', '.ass', '.ssa', '.vtt', '.sub')
+
+# Release and resolution tags: a 19xx/20xx number right before one (or in
+# parentheses) is a release year, not an episode ("Movie.2019.1080p")
+_RELEASE_TAG = (r'(?:\d{3,4}[pPiI]|(?i:4k|uhd|blu-?ray|bd(?:rip)?|brrip|web(?:-?(?:dl|rip))?|hdtv|dvd(?:rip)?'
+                r'|hdrip|[xh]\.?26[45]|hevc|remux|proper|repack))(?![A-Za-z])')
+_NOT_A_YEAR = rf'(?!(?:19|20)\d\d[ ._)\]-]*[\[(]?{_RELEASE_TAG}|(?<=\()(?:19|20)\d\d\))'
+
+# Episode code patterns, most specific first (compiled once). Each entry is
+# (name, pattern); the groups are read by _format_code.
+#   season_episode: S01E01, S01E01-E02, S01E01E02, S01.E01
+#   season_range:   S01-S03, Season 1-3 (season packs)
+#   cross:          1x01, 1x01-02, 1x01-1x02
+#   episode:        E01, EP01, Ep.12, Episode 01, E01-E02
+#   absolute:       "Show - 1023 [1080p]", "Show - 05v2", "Show 05 [BD]" (anime absolute numbering)
+#   season:         S02, Season 2 (a whole season in one file)
+#   number:         101, 0101 (not resolutions like 1080p, codecs like x264 or release years)
+EPISODE_PATTERNS = [
+    ("season_episode", re.compile(
+        r'(?<![A-Za-z])[sS](\d{1,2})[ ._-]?[eE][pP]?(\d{1,4})(?:(?:-?[eE][pP]?|-)(\d{1,4}))?(?![\dpPiI])')),
+    ("season_episode", re.compile(
+        r'(?<![A-Za-z])[sS]eason[ ._-]?(\d{1,2})[ ._-]*[eE]pisode[ ._-]?(\d{1,4})'
+        r'(?:-(?:[eE]pisode[ ._-]?)?(\d{1,4}))?(?![\dpPiI])')),
+    ("season_range", re.compile(
+        r'(?<![A-Za-z])(?:[sS]eason[ ._]?|[sS])(\d{1,2})[ ._]?-[ ._]?(?:[sS]eason[ ._]?|[sS])?(\d{1,2})(?![\deE])')),
+    ("cross", re.compile(r'(?<![\dA-Za-z])(\d{1,2})[xX](\d{2,3})(?:-(?:\d{1,2}[xX])?(\d{2,3}))?(?!\d)')),
+    ("episode", re.compile(
+        r'(?<![A-Za-z])(?:[eE]pisode[ ._]?|[eE][pP][ ._]?|[eE])(\d{1,4})(?:-(?:[eE][pP]?)?(\d{1,4}))?(?![\dpPiI])')),
+    ("absolute", re.compile(
+        rf'[ _]-[ _](\d{{1,4}})(?:-(\d{{1,4}}))?(?:v\d+)?(?![\dpPiI])|[ _]{_NOT_A_YEAR}(\d{{2,4}})(?:v\d+)?[ _]*[\[(]')),
+    ("season", re.compile(r'(?<![A-Za-z])(?:[sS]eason[ ._]?|[sS])(\d{1,2})(?![\deExX])')),
+    ("number", re.compile(rf'(?<![\dxXhH]){_NOT_A_YEAR}(\d{{3,4}})(?![\dpPiI])')),
+]
+
+
+def _format_code(kind: str, groups: Tuple[Optional[str], ...]) -> str:
+    """Canonical code for a match, so "1x01" and "S01E01" land in the same episode"""
+    if kind in ("season_episode", "cross"):
+        season, first, last = groups
+        code = f"S{int(season):02d}E{int(first):02d}"
+        return f"{code}-E{int(last):02d}" if last and int(last) != int(first) else code
+    if kind == "season_range":
+        return f"S{int(groups[0]):02d}-S{int(groups[1]):02d}"
+    if kind == "season":
+        return f"S{int(groups[0]):02d}"
+    if kind in ("episode", "absolute"):
+        first, last = (groups[0], groups[1]) if groups[0] else (groups[2], None)
+        code = f"E{int(first):02d}"
+        return f"{code}-E{int(last):02d}" if last and int(last) != int(first) else code
+    return groups[0]
+
+
+@lru_cache(maxsize=65536)
+def extract_episode_code(filename: str) -> str:
+    """
+    Extract episode/season code from filename
+
+    Supports formats: S01E01, S01E01-E02, Season 1 Episode 1, S01-S03, 1x01,
+    E01, Ep.01, anime absolute numbering ("Show - 1023"), S01, 101. Release
+    years next to release tags ("Movie.2019.1080p") are not episode numbers.
+    Codes are canonical (1x01, Season 1 Episode 1 -> S01E01).
+    Results are cached, so regrouping the same names is cheap.
+    """
+    name = os.path.basename(filename)
+    for kind, pattern in EPISODE_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            return _format_code(kind, match.groups())
+
+    # If no pattern matches, use filename without extension as code
+    return os.path.splitext(name)[0]
+
+
+def find_subtitles(input_path: str, extensions: Tuple[str, ...] = SUBTITLE_EXTENSIONS) -> List[Tuple[str, str]]:
+    """
+    List subtitle files (or other files by extension) under a file or directory
+
+    Returns:
+        Sorted list of (absolute_path, path_relative_to_input_root)
+    """
+    if os.path.isfile(input_path):
+        if not input_path.lower().endswith(extensions):
+            return []
+        return [(os.path.abspath(input_path), os.path.basename(input_path))]
+
+    found = []
+    for root, _, files in os.walk(input_path):
+        for name in files:
+            if name.lower().endswith(extensions):
+                full = os.path.join(root, name)
+                found.append((os.path.abspath(full), os.path.relpath(full, input_path)))
+    return sorted(found)
+
+
+@lru_cache(maxsize=256)
+def _keyword_token(keyword: str) -> "re.Pattern":
+    return re.compile(rf'(?<![A-Za-z]){re.escape(keyword)}(?![A-Za-z])', re.IGNORECASE)
+
+
+def track_rank(filename: str, track_keywords: Sequence[str], language: Optional[str] = None) -> int:
+    """
+    Position of a file among the tracks of its episode.
+
+    Files carrying none of the keywords come first (rank 0); the others follow
+    in keyword order. A keyword matches as a separate token ("FR" in
+    "Show.S01E01.FR.srt", not in "Friends"), falling back to a plain
+    substring match when no keyword matches as a token, then to the
+    identified language of the file ("FR" or "french" for "fr", see
+    langid.identify_track) when the name carries no keyword at all.
+    """
+    name = os.path.basename(filename)
+    for idx, keyword in enumerate(track_keywords):
+        if _keyword_token(keyword).search(name):
+            return idx + 1
+    lowered = name.lower()
+    for idx, keyword in enumerate(track_keywords):
+        if keyword.lower() in lowered:
+            return idx + 1
+    return language_rank(language, track_keywords)
+
+
+def track_order(filename: str, track_keywords: Sequence[str], language: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Sort key of a file among the tracks of its episode: track_rank, then the
+    identified language (langid.language_order), so tracks that no keyword
+    tells apart take their roles from their language, not from upload order
+    """
+    return track_rank(filename, track_keywords, language), language_order(language)
+
+
+def parse_track_keywords(text: str) -> List[str]:
+    """Split "EN, FR TH" into ["EN", "FR", "TH"]"""
+    return [k for k in re.split(r'[\s,;]+', text or "") if k]
+
+
+class EpisodeIndex:
+    """
+    Groups subtitle files into episodes in one pass.
+
+    Files are keyed by (scope, episode code), where scope is typically the
+    directory, and every episode keeps any number of tracks ordered by
+    track_rank. Items can be any object (paths, uploaded files...); the name
+    is only used for the code and the track order, with the identified
+    language (see track_order).
+    """
+
+    def __init__(self, track_keywords: Sequence[str] = ()):
+        self.track_keywords = [k for k in track_keywords if k]
+        self._groups: Dict[Tuple[str, str], List[tuple]] = {}
+
+    def add(self, name: str, item=None, scope: str = "", language: Optional[str] = None) -> Tuple[str, str]:
+        """Index one file (with its identified language, if known); returns its (scope, code) key"""
+        key = (scope, extract_episode_code(name))
+        rank = track_order(name, self.track_keywords, language)
+        self._groups.setdefault(key, []).append((rank, name, item if item is not None else name))
+        return key
+
+    def add_all(self, names: Iterable[str], scope: str = "") -> "EpisodeIndex":
+        for name in names:
+            self.add(name, scope=scope)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def episodes(self, min_tracks: int = 2, max_tracks: Optional[int] = None) -> List[Tuple[str, str, list]]:
+        """
+        Episodes with a usable number of tracks, sorted by (scope, code)
+
+        Returns:
+            List of (scope, code, [items in track order])
+        """
+        result = []
+        for (scope, code), entries in sorted(self._groups.items()):
+            if len(entries) < min_tracks or (max_tracks is not None and len(entries) > max_tracks):
+                continue
+            result.append((scope, code, [item for _, _, item in sorted(entries, key=lambda e: e[:2])]))
+        return result
+
+    def leftovers(self, min_tracks: int = 2, max_tracks: Optional[int] = None) -> List[Tuple[str, str, list]]:
+        """Episodes the same call to episodes() would leave out"""
+        kept = {(scope, code) for scope, code, _ in self.episodes(min_tracks, max_tracks)}
+        return [(scope, code, [item for _, _, item in sorted(entries, key=lambda e: e[:2])])
+                for (scope, code), entries in sorted(self._groups.items()) if (scope, code) not in kept]
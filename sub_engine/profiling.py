@@ -0,0 +1,181 @@
+"""
+Per-stage timings and memory peaks for the engine hot paths.
+"""
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, NamedTuple, Optional
+
+
+class StageProfiler:
+    """
+    Per-file stage timings (and optional tracemalloc peaks) for the engine hot paths.
+    
+    Engine functions mark their stages with `stage(name)`; the marks are only
+    recorded while a profiler is active, i.e. inside `with profiler.file(name):`.
+    Stages nest (e.g. "parse" inside "decode"); every record carries its own
+    duration and its self time, which excludes nested stages, so per-file
+    breakdowns add up to the file total.
+    
+    Records are plain dicts, so the ones collected in worker processes can be
+    merged with `StageProfiler(records=...)` before exporting.
+    
+    The active profiler, file and stage stack belong to the current thread
+    (or asyncio task), so concurrent runs, e.g. Streamlit sessions, each
+    record their own stages. tracemalloc is process-wide: it stays on while
+    any run traces memory, and peaks overlap when runs trace concurrently.
+    """
+    
+    def __init__(self, trace_memory: bool = False, records: Optional[List[dict]] = None):
+        self.trace_memory = trace_memory
+        self.records: List[dict] = list(records or [])
+    
+    @contextmanager
+    def file(self, name: str):
+        """Activate the profiler and attribute the enclosed stages to `name`"""
+        active = _Active(self, name, [])
+        token = _active.set(active)
+        if self.trace_memory:
+            _acquire_tracing()
+        try:
+            with self._stage("total", active):
+                yield self
+        finally:
+            if self.trace_memory:
+                _release_tracing()
+            _active.reset(token)
+    
+    @contextmanager
+    def _stage(self, name: str, active: "_Active"):
+        stack = active.stack
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        entry = {"children_ms": 0.0, "base": current if tracing else 0, "peak": current if tracing else 0}
+        stack.append(entry)
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter_ns() - started) / 1e6
+            stack.pop()
+            peak_kb = None
+            if tracing:
+                entry["peak"] = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+                peak_kb = round((entry["peak"] - entry["base"]) / 1024, 1)
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], entry["peak"])
+                tracemalloc.reset_peak()
+            if stack:
+                stack[-1]["children_ms"] += duration_ms
+            self.records.append({
+                "file": active.file,
+                "stage": name,
+                "depth": len(stack),
+                "ts_us": started // 1000,
+                "duration_ms": round(duration_ms, 3),
+                "self_ms": round(duration_ms - entry["children_ms"], 3),
+                "peak_kb": peak_kb,
+                "pid": os.getpid(),
+            })
+    
+    def summary(self) -> dict:
+        """
+        Returns:
+            {file: {"total": ms, stage: self_ms, ...}} with stages in the order
+            they started, plus "peak_kb" when memory was traced
+        """
+        files = {}
+        for r in sorted(self.records, key=lambda r: r["ts_us"]):
+            stages = files.setdefault(r["file"], {})
+            key = "total" if r["stage"] == "total" else r["stage"]
+            value = r["duration_ms"] if key == "total" else r["self_ms"]
+            stages[key] = round(stages.get(key, 0.0) + value, 3)
+            if r["peak_kb"] is not None and r["stage"] == "total":
+                stages["peak_kb"] = max(stages.get("peak_kb", 0.0), r["peak_kb"])
+        return files
+    
+    def breakdown(self, name: str) -> str:
+        """One-line breakdown of a file, e.g. "detect 1.2 ms · parse 8.0 ms = 9.6 ms" """
+        stages = dict(self.summary().get(name, {}))
+        total = stages.pop("total", 0.0)
+        peak_kb = stages.pop("peak_kb", None)
+        parts = [f"{stage} {ms:.1f} ms" for stage, ms in stages.items()]
+        line = f"{' · '.join(parts)} = {total:.1f} ms" if parts else f"{total:.1f} ms"
+        if peak_kb is not None:
+            line += f" (peak {peak_kb:.0f} KB)"
+        return line
+    
+    def to_json(self) -> dict:
+        """Summary and raw records, JSON-serialisable"""
+        return {"files": self.summary(), "records": self.records}
+    
+    def to_chrome_trace(self) -> dict:
+        """
+        Chrome trace event format (chrome://tracing, ui.perfetto.dev).
+        One track per worker process; files and stages are nested slices.
+        """
+        events = []
+        for r in self.records:
+            events.append({
+                "name": r["file"] if r["stage"] == "total" else r["stage"],
+                "cat": "file" if r["stage"] == "total" else "stage",
+                "ph": "X",
+                "ts": r["ts_us"],
+                "dur": round(r["duration_ms"] * 1000, 1),
+                "pid": r["pid"],
+                "tid": r["pid"],
+                "args": {"file": r["file"], "self_ms": r["self_ms"], "peak_kb": r["peak_kb"]},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class _Active(NamedTuple):
+    """Profiler, file name and open stages of the current context"""
+    profiler: StageProfiler
+    file: str
+    stack: list
+
+
+_active: ContextVar[Optional[_Active]] = ContextVar("sub_engine_profiler", default=None)
+
+# Profiled runs currently tracing memory, and whether they started tracemalloc themselves
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+def _acquire_tracing() -> None:
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _release_tracing() -> None:
+    """Stop tracemalloc after the last tracing run, unless the application started it"""
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+@contextmanager
+def stage(name: str):
+    """Mark an engine stage; a no-op unless a StageProfiler is active in this context"""
+    active = _active.get()
+    if active is None:
+        yield
+        return
+    with active.profiler._stage(name, active):
+        yield
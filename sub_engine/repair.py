@@ -0,0 +1,440 @@
+"""
+Mojibake repair, repair strategy scoring and corruption analysis.
+"""
+import codecs
+import re
+from typing import List, Optional, Tuple
+
+from .encoding import (_best_codepages, _looks_mixed, _open_buffer, _parse_subtitle_text, _sample_windows,
+                       _sniff_bom, decode_regions, detect_encoding, detect_encoding_regions)
+from .profiling import stage
+from .scoring import EASTERN_CODEPAGE_CHARS, MOJIBAKE_PATTERN, REPAIR_STRATEGIES, _script_profile, score_plausibility
+
+_MAX_HIT_POSITIONS = 50
+
+
+def _apply_repair_strategy(data, kind: str, codepage: str, target_script: str = "auto") -> str:
+    """Decode a buffer according to one repair strategy (strict, raises UnicodeError)"""
+    if kind == "identity":
+        return codecs.decode(data, 'utf-8')
+    if kind == "double":
+        return codecs.decode(data, 'utf-8').encode(codepage).decode('utf-8')
+    if kind == "segments":
+        return repair_mojibake_spans(codecs.decode(data, 'utf-8'))[0]
+    if kind == "regions":
+        regions = detect_encoding_regions(data, target_script)
+        if len(regions) < 2:
+            raise UnicodeError("single-encoding buffer")
+        return decode_regions(data, regions)
+    return codecs.decode(data, codepage)
+
+
+def _strategy_labels(kind: str, codepage: str) -> Tuple[str, str]:
+    """Return (corruption_type, applied_fix) names for a strategy"""
+    if kind == "identity":
+        return "none", "none"
+    if kind == "double":
+        return "double_encoding", f"repaired_double_encoding_via_{codepage}"
+    if kind == "segments":
+        return "partial_double_encoding", "repaired_mojibake_segments"
+    if kind == "regions":
+        return "mixed_encoding", "repaired_mixed_encoding_regions"
+    return "wrong_encoding", f"repaired_{codepage}_to_utf-8"
+
+
+def _build_reverse_table(codepage: str) -> dict:
+    """
+    str.translate table mapping each character a codepage produces for bytes
+    0x80-0xFF back to the latin-1 character of that byte. C1 controls map to
+    themselves, so bytes the codepage leaves undefined still round-trip.
+    """
+    table = {b: chr(b) for b in range(0x80, 0xA0)}
+    for b in range(0x80, 0x100):
+        try:
+            table[ord(bytes([b]).decode(codepage))] = chr(b)
+        except UnicodeDecodeError:
+            pass
+    return table
+
+
+def _byte_class(table: dict, lo: int, hi: int) -> str:
+    """Regex character class of every character the table maps into [lo, hi]"""
+    chars = sorted(chr(c) for c, b in table.items() if lo <= ord(b) <= hi)
+    return '[' + ''.join(re.escape(c) for c in chars) + ']'
+
+
+_LATIN_REVERSE = _build_reverse_table('cp1252')
+_THAI_REVERSE = _build_reverse_table('cp874')
+
+_LATIN_CONT = _byte_class(_LATIN_REVERSE, 0x80, 0xBF)
+_THAI_CONT = _byte_class(_THAI_REVERSE, 0x80, 0xBF)
+
+# One UTF-8 sequence seen through the codepage: lead byte + continuation bytes.
+# Via cp874 only Thai itself (E0 B8/B9 xx) is considered, and at least two
+# characters in a row, because cp874 lead bytes are ordinary Thai letters.
+MOJIBAKE_SPAN_PATTERNS = [
+    ("latin", re.compile(
+        f'(?:{_byte_class(_LATIN_REVERSE, 0xC2, 0xDF)}{_LATIN_CONT}'
+        f'|{_byte_class(_LATIN_REVERSE, 0xE0, 0xEF)}{_LATIN_CONT}{{2}}'
+        f'|{_byte_class(_LATIN_REVERSE, 0xF0, 0xF4)}{_LATIN_CONT}{{3}})+'
+    ), _LATIN_REVERSE),
+    ("thai", re.compile(
+        f'(?:{re.escape(bytes([0xE0]).decode("cp874"))}'
+        f'[{re.escape(bytes([0xB8, 0xB9]).decode("cp874"))}]{_THAI_CONT}){{2,}}'
+    ), _THAI_REVERSE),
+]
+
+
+def repair_mojibake_spans(text: str, max_layers: int = 2) -> Tuple[str, int]:
+    """
+    Reverse double-encoding only where it occurs, leaving clean text untouched.
+    
+    Each known mojibake span is mapped back to its bytes with a precomputed
+    str.translate table and decoded as UTF-8; spans that do not decode (or,
+    for Thai, do not decode to Thai) are kept as they are. Linear in text size.
+    
+    Args:
+        text: Decoded subtitle text, possibly mixing clean and corrupted lines
+        max_layers: How many nested layers of double-encoding to peel off
+    
+    Returns:
+        Tuple of (repaired_text, number_of_spans_fixed)
+    """
+    fixed_spans = 0
+    
+    def reverse(match, table, thai_only):
+        nonlocal fixed_spans
+        span = match.group(0)
+        try:
+            fixed = span.translate(table).encode('latin-1').decode('utf-8')
+        except UnicodeError:
+            return span
+        if any(0x80 <= ord(c) <= 0x9F for c in fixed):
+            return span
+        if thai_only and not all('\u0e00' <= c <= '\u0e7f' for c in fixed):
+            return span
+        fixed_spans += 1
+        return fixed
+    
+    for _ in range(max_layers):
+        before = fixed_spans
+        for name, pattern, table in MOJIBAKE_SPAN_PATTERNS:
+            text = pattern.sub(lambda m: reverse(m, table, name == "thai"), text)
+        if fixed_spans == before:
+            break
+    
+    return text, fixed_spans
+
+
+def score_repair_strategies(data, target_script: str = "auto") -> List[dict]:
+    """
+    Score every applicable repair strategy on the same sampled windows.
+    
+    Args:
+        data: bytes or any bytes-like buffer (e.g. mmap)
+        target_script: "thai", "french", "chinese", or "auto"
+    
+    Returns:
+        List of {"strategy", "corruption_type", "kind", "codepage", "score"} dicts,
+        best first; strategies that cannot decode the sample have score None
+    """
+    detected_enc, _ = detect_encoding(data, target_script)
+    return _score_strategies(_sample_windows(data), target_script, detected_enc)
+
+
+def _score_strategies(sample: bytes, target_script: str, detected_enc: Optional[str]) -> List[dict]:
+    """Rank the repair strategies on an already sampled buffer"""
+    scores = []
+    
+    # The sampled detector breaks ties between codepages that decode equally well
+    try:
+        detected_name = codecs.lookup(detected_enc).name if detected_enc else None
+    except LookupError:
+        detected_name = None
+    
+    for priority, (kind, codepage, scripts) in enumerate(REPAIR_STRATEGIES):
+        if target_script != "auto" and target_script not in scripts:
+            continue
+        corruption_type, applied_fix = _strategy_labels(kind, codepage)
+        try:
+            repaired = _apply_repair_strategy(sample, kind, codepage, target_script)
+            score = round(score_plausibility(repaired, target_script), 3)
+        except (UnicodeError, LookupError):
+            score = None
+        scores.append({
+            "strategy": applied_fix,
+            "corruption_type": corruption_type,
+            "kind": kind,
+            "codepage": codepage,
+            "score": score,
+            "_detected": kind == "codepage" and codecs.lookup(codepage).name == detected_name,
+            "_priority": priority,
+        })
+    
+    # Highest score wins; ties go to the detected codepage, then the simplest explanation (table order)
+    scores.sort(key=lambda s: (s["score"] is None, -(s["score"] or 0), not s["_detected"], s["_priority"]))
+    for s in scores:
+        del s["_detected"], s["_priority"]
+    return scores
+
+
+def repair_corrupted_encoding(input_path: str, output_path: str, 
+                              target_script: str = "auto",
+                              report: Optional[dict] = None) -> Tuple[bool, str, str, List[dict]]:
+    """
+    Attempt to repair badly corrupted subtitle files.
+    This handles double-encoding, mojibake, and other encoding disasters.
+    
+    All strategies are scored on the same sampled windows; only the winner is
+    applied to the full buffer and parsed.
+    
+    Args:
+        input_path: Path to corrupted subtitle file
+        output_path: Where to save repaired file
+        target_script: "thai", "french", "chinese", or "auto" for auto-detection
+        report: Result of analyze_corruption() for the same file. Its strategy
+            scores (and buffer, if kept) are reused instead of starting over;
+            a report without scores is scored here.
+    
+    Returns:
+        Tuple of (success, detected_corruption_type, applied_fix, strategy_scores)
+    """
+    if report is None or report.get("target_script") != target_script:
+        report = analyze_corruption(input_path, target_script, keep_buffer=True)
+    if "error" in report:
+        return False, "unrepairable", "none", []
+    
+    scores = report["strategy_scores"]
+    raw_data = report.get("raw_data")
+    if raw_data is None:
+        with stage("read"), open(input_path, "rb") as f:
+            raw_data = f.read()
+    if not scores:
+        # Report built with score_strategies=False: score now rather than give up
+        with stage("score"):
+            scores = _score_strategies(_sample_windows(raw_data), target_script, report.get("suspected_codepage"))
+    
+    # Walk down the ranking: a strategy can pass the sample but fail further in the file
+    for candidate in scores:
+        if candidate["score"] is None:
+            break
+        try:
+            with stage("decode"):
+                repaired_text = _apply_repair_strategy(raw_data, candidate["kind"], candidate["codepage"],
+                                                       target_script)
+                subs = _parse_subtitle_text(repaired_text)
+        except Exception:
+            continue
+        
+        with stage("write"):
+            subs.save(output_path, encoding='utf-8')
+        return True, candidate["corruption_type"], candidate["strategy"], scores
+    
+    return False, "unrepairable", "none", scores
+
+
+def build_corruption_report(data, target_script: str = "auto", score_strategies: bool = True) -> dict:
+    """
+    Single pass over a raw buffer producing everything analysis and repair need.
+    
+    The buffer is decoded in full exactly once (as UTF-8 when valid, otherwise
+    with the suspected codepage); mojibake hits and the script profile are
+    collected on that one view. With score_strategies=False the repair
+    strategies are not scored (strategy_scores is empty), which is most of
+    the cost when only the diagnosis is needed.
+    
+    Returns:
+        Dictionary with file_size_bytes, bom, utf8_valid, suspected_codepage,
+        detection_tier, encoding_regions (mixed files only), script_profile,
+        mojibake_hits, eastern_codepage_chars, target_script and strategy_scores
+    """
+    with stage("detect"):
+        view, bom_encoding, utf8_valid, suspected, tier, encoding_regions, sample = _decode_for_report(
+            data, target_script)
+    
+    with stage("scan"):
+        mojibake_hits = {}
+        for match in MOJIBAKE_PATTERN.finditer(view):
+            hit = mojibake_hits.setdefault(match.lastgroup, {"count": 0, "positions": []})
+            hit["count"] += 1
+            if len(hit["positions"]) < _MAX_HIT_POSITIONS:
+                hit["positions"].append(match.start())
+        
+        script_profile = _script_profile(view)
+        eastern_chars = sum(view.count(c) for c in EASTERN_CODEPAGE_CHARS)
+    
+    strategy_scores = []
+    if score_strategies:
+        with stage("score"):
+            strategy_scores = _score_strategies(sample, target_script, suspected)
+    
+    return {
+        "file_size_bytes": len(data),
+        "bom": bom_encoding,
+        "utf8_valid": utf8_valid,
+        "suspected_codepage": suspected,
+        "detection_tier": tier,
+        "encoding_regions": encoding_regions,
+        "script_profile": script_profile,
+        "mojibake_hits": mojibake_hits,
+        "eastern_codepage_chars": eastern_chars,
+        "target_script": target_script,
+        "strategy_scores": strategy_scores,
+    }
+
+
+def _repair_codepage(sample, target_script: str, suspected: Optional[str]) -> Optional[str]:
+    """
+    Prefer the codepage repair would apply when it reads the sample more
+    plausibly than the detector's guess (cp1250 is often guessed for clean
+    cp1252 French, which would then look like Eastern European text)
+    """
+    best = _best_codepages(sample, target_script)[0]
+    if not suspected or best == 'latin-1':
+        return suspected
+    try:
+        current = score_plausibility(codecs.decode(sample, suspected, 'replace'), target_script)
+        if codecs.lookup(best).name == codecs.lookup(suspected).name:
+            return suspected
+    except LookupError:
+        return best
+    if score_plausibility(codecs.decode(sample, best), target_script) > current:
+        return best
+    return suspected
+
+
+def _decode_for_report(data, target_script: str) -> tuple:
+    """Decode the whole buffer once: as UTF-8 when valid, region by region, or with the suspected codepage"""
+    bom_encoding = _sniff_bom(data)
+    sample = _sample_windows(data)
+    encoding_regions = []
+    
+    try:
+        view = codecs.decode(data, bom_encoding or 'utf-8')
+        utf8_valid = bom_encoding in (None, 'utf-8-sig')
+        suspected, tier = (bom_encoding, "bom") if bom_encoding else ('utf-8', "utf8")
+    except UnicodeDecodeError:
+        utf8_valid = False
+        regions = detect_encoding_regions(data, target_script) if _looks_mixed(data) else []
+        if len(regions) > 1:
+            encoding_regions = regions
+            suspected = "+".join(dict.fromkeys(r["encoding"] for r in regions))
+            tier = "mixed"
+            view = decode_regions(data, regions)
+        else:
+            suspected, tier = detect_encoding(sample, target_script)
+            suspected = _repair_codepage(sample, target_script, suspected)
+            try:
+                view = codecs.decode(data, suspected or 'latin-1', 'replace')
+            except LookupError:
+                view = codecs.decode(data, 'latin-1')
+    
+    return view, bom_encoding, utf8_valid, suspected, tier, encoding_regions, sample
+
+
+def decode_with_report(data, analysis: dict) -> Tuple[str, Optional[str]]:
+    """
+    Decode a buffer with what its corruption report found (BOM, UTF-8, encoding
+    regions or the suspected codepage), without repairing it
+
+    Returns:
+        Tuple of (text without BOM, encoding name or "cp1252+utf-8" for mixed buffers)
+    """
+    encoding = analysis["bom"] or ("utf-8" if analysis["utf8_valid"] else analysis["suspected_codepage"])
+    if analysis["encoding_regions"]:
+        text = decode_regions(data, analysis["encoding_regions"])
+    else:
+        text = codecs.decode(data, encoding or "latin-1", "replace")
+    return text.lstrip("\ufeff"), encoding
+
+
+def analyze_corruption(file_path: str, target_script: str = "auto", keep_buffer: bool = False,
+                       score_strategies: bool = True) -> dict:
+    """
+    Analyze a subtitle file to detect what kind of corruption (if any) is present.
+    
+    Args:
+        file_path: Path to subtitle file
+        target_script: "thai", "french", "chinese", or "auto"
+        keep_buffer: Keep the raw bytes under "raw_data" so a following
+            repair_corrupted_encoding() call does not read the file again
+        score_strategies: Also score every repair strategy (strategy_scores)
+    
+    Returns:
+        Dictionary with corruption analysis (see build_corruption_report) plus
+        corruption_indicators, detected_script, confidence and recommendations
+    """
+    try:
+        with _open_buffer(file_path) as raw_data:
+            analysis = build_corruption_report(raw_data, target_script, score_strategies)
+            if keep_buffer:
+                analysis["raw_data"] = bytes(raw_data)
+        return diagnose_corruption(analysis)
+        
+    except Exception as e:
+        return {
+            "error": str(e),
+            "corruption_indicators": ["Unable to read file"],
+            "recommendations": ["Check if file is actually a subtitle file"]
+        }
+
+
+def diagnose_corruption(analysis: dict) -> dict:
+    """
+    Add corruption_indicators, detected_script, confidence and recommendations
+    to a build_corruption_report() result (in place, for buffers already in memory)
+    
+    Returns:
+        The same dictionary
+    """
+    analysis.update({
+        "corruption_indicators": [],
+        "detected_script": "unknown",
+        "confidence": 0,
+        "recommendations": []
+    })
+    hits = analysis["mojibake_hits"]
+    
+    # Check for Thai mojibake patterns
+    if "thai_latin1" in hits or "thai_cp874" in hits:
+        analysis["corruption_indicators"].append("Thai mojibake (double-encoding)")
+        analysis["detected_script"] = "thai"
+        analysis["confidence"] = 80
+        analysis["recommendations"].append("Use 'Repair Corrupted Subtitles' feature with Thai target")
+    
+    # Check for French mojibake
+    if "french_latin1" in hits or "french_quotes" in hits:
+        analysis["corruption_indicators"].append("French mojibake (double-encoding)")
+        analysis["detected_script"] = "french"
+        analysis["confidence"] = 80
+        analysis["recommendations"].append("Use 'Repair Corrupted Subtitles' feature with French target")
+    
+    # Check for Eastern European characters in Western text
+    if analysis["eastern_codepage_chars"]:
+        analysis["corruption_indicators"].append("Wrong codepage (Western text as Eastern European)")
+        analysis["detected_script"] = "french"
+        analysis["confidence"] = 70
+        analysis["recommendations"].append("Use Sanitizer with 'Fix encoding issues' enabled")
+    
+    profile = analysis["script_profile"]
+    dominant = max(("thai", "chinese", "french"), key=lambda s: profile[s])
+    
+    if analysis["utf8_valid"]:
+        # Valid UTF-8 with actual Thai/Chinese/French characters
+        if not analysis["corruption_indicators"]:
+            if profile[dominant]:
+                analysis["detected_script"] = dominant
+                analysis["confidence"] = 100
+            analysis["corruption_indicators"].append("None - file appears clean")
+            analysis["recommendations"].append("No repair needed, encoding is correct")
+    else:
+        # Script as seen through the suspected codepage
+        if analysis["detected_script"] == "unknown" and profile[dominant]:
+            analysis["detected_script"] = dominant
+            analysis["confidence"] = 60
+        analysis["corruption_indicators"].append("Not valid UTF-8")
+        if analysis["suspected_codepage"]:
+            analysis["corruption_indicators"].append(f"Suspected codepage: {analysis['suspected_codepage']}")
+        analysis["recommendations"].append("File needs encoding repair")
+    
+    return analysis
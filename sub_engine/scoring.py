@@ -0,0 +1,123 @@
+"""
+Script profiles, mojibake patterns, the repair strategy table and the
+plausibility score shared by encoding detection and repair.
+"""
+import re
+
+
+# Known mojibake sequences: UTF-8 text read through a single-byte codepage
+#   french_latin1: Ã©, Ã , Â«  -> Latin accents via latin-1/cp1252
+#   french_quotes: â€™, â€œ    -> typographic quotes via cp1252
+#   thai_latin1:   à¸, à¹      -> Thai via latin-1/cp1252
+#   thai_cp874:    เธ, เน      -> Thai via cp874/tis-620 (followed by a 0x80-0xBF byte, so "เธอ" is not a hit)
+_CP1252_HIGH = '€‚ƒ„…†‡ˆ‰Š‹ŒŽ‘’“”•–—˜™š›œžŸ'
+MOJIBAKE_PATTERN = re.compile(
+    f'(?P<french_latin1>[ÃÂ][\u0080-\u00bf{_CP1252_HIGH}])'
+    '|(?P<french_quotes>â€[\u0080-\u00bf€™œ“”˜¦¢¡])'
+    f'|(?P<thai_latin1>à[¸¹][\u0080-\u00bf{_CP1252_HIGH}])'
+    '|(?P<thai_cp874>เ[ธน][\u0e01-\u0e1f\u0080-\u00a0€…‘’“”•–—])'
+)
+
+# Characters of a Central European codepage showing up in Western text
+EASTERN_CODEPAGE_CHARS = 'ťŤŕŔčČśŚřŘůŮĶķ'
+
+_SCRIPT_PATTERNS = {
+    "thai": re.compile('[\u0e00-\u0e7f]'),
+    "chinese": re.compile('[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]'),
+}
+_NON_ASCII_RE = re.compile('[^\x00-\x7f]')
+
+FRENCH_CHARS = 'éèêëàâäôöùûüÿçœæÉÈÊËÀÂÄÔÖÙÛÜŸÇŒÆîïÎÏ'
+_SCRIPT_PATTERNS["french"] = re.compile(f'[{FRENCH_CHARS}]')
+
+
+def _script_profile(text: str) -> dict:
+    """Character counts per script pattern plus "non_ascii" (the report's script_profile)"""
+    profile = {name: len(pattern.findall(text)) for name, pattern in _SCRIPT_PATTERNS.items()}
+    profile["non_ascii"] = len(_NON_ASCII_RE.findall(text))
+    return profile
+
+
+# Repair strategies: (kind, codepage, target scripts it applies to)
+#   "identity":  the bytes are already correct UTF-8
+#   "double":    UTF-8 text was decoded through `codepage` and saved again as UTF-8
+#   "segments":  only some spans are double-encoded (see repair_mojibake_spans)
+#   "regions":   UTF-8 and legacy parts stitched together (see detect_encoding_regions)
+#   "codepage":  the bytes are legacy `codepage` text
+REPAIR_STRATEGIES = [
+    ("identity", "utf-8", ("thai", "french", "chinese")),
+    ("double", "latin-1", ("thai", "french")),
+    ("double", "cp1252", ("thai", "french")),
+    ("double", "cp874", ("thai",)),
+    ("double", "tis-620", ("thai",)),
+    ("segments", "utf-8", ("thai", "french")),
+    ("regions", "auto", ("thai", "french", "chinese")),
+    ("codepage", "tis-620", ("thai",)),
+    ("codepage", "cp874", ("thai",)),
+    ("codepage", "iso-8859-11", ("thai",)),
+    ("codepage", "cp1252", ("french",)),
+    ("codepage", "iso-8859-1", ("french",)),
+    ("codepage", "iso-8859-15", ("french",)),
+    ("codepage", "gb18030", ("chinese",)),
+    ("codepage", "big5", ("chinese",)),
+]
+
+
+def score_plausibility(text: str, target_script: str = "auto") -> float:
+    """
+    Score how plausible a decoded text is for the target script.
+    
+    Every non-ASCII character counts: letters of the expected script are good,
+    replacement characters, C1 controls and mojibake sequences are bad.
+    Thai or CJK characters glued to ASCII letters (Latin text decoded through
+    an Asian codepage) are bad too.
+    
+    Returns:
+        Score in [-2.0, 1.0]; pure ASCII text scores 1.0
+    """
+    bad = 0
+    mojibake_chars = 0
+    for match in MOJIBAKE_PATTERN.finditer(text):
+        mojibake_chars += len(match.group(0))
+    bad += mojibake_chars
+    
+    non_ascii = 0
+    thai = cjk = latin = 0
+    last = len(text) - 1
+    for i, c in enumerate(text):
+        code = ord(c)
+        if code < 128:
+            continue
+        non_ascii += 1
+        if c == '\ufffd' or 0x80 <= code <= 0x9F:
+            bad += 1
+            continue
+        is_thai = 0x0E00 <= code <= 0x0E7F
+        is_cjk = 0x4E00 <= code <= 0x9FFF or 0x3000 <= code <= 0x303F or 0xFF00 <= code <= 0xFFEF
+        if is_thai or is_cjk:
+            prev_c = text[i - 1] if i > 0 else ' '
+            next_c = text[i + 1] if i < last else ' '
+            if (prev_c.isascii() and prev_c.isalpha()) or (next_c.isascii() and next_c.isalpha()):
+                bad += 1
+            elif is_thai:
+                thai += 1
+            else:
+                cjk += 1
+        elif c in FRENCH_CHARS or c in '’‘“”«»…–—':
+            latin += 1
+    
+    if non_ascii == 0:
+        return 1.0
+    
+    if target_script == "thai":
+        good = thai
+    elif target_script == "chinese":
+        good = cjk
+    elif target_script == "french":
+        good = latin
+    else:
+        good = max(thai, cjk, latin)
+    
+    # Characters inside mojibake sequences cannot also count as good letters
+    good = max(0, good - mojibake_chars)
+    return max(-2.0, (good - 2 * bad) / non_ascii)
@@ -0,0 +1,129 @@
+"""
+Merges that keep their parsed tracks, so changing a setting only re-runs the
+stages after it.
+"""
+from typing import Dict, Optional, Sequence
+
+import pysubs2
+
+from .intervals import CueIndex
+from .profiling import stage
+from .tracks import _kway_groups, _stack_cues, match_cues, pair_groups, shift_subtitles, track_settings
+
+
+class MergeSession:
+    """
+    Merge of already normalized tracks, cached stage by stage
+
+    The stages run in this order, each cached on its own settings:
+
+        shift     per-track shift (a track is only re-shifted when its shift changes)
+        match     cue groups, from the shifts, threshold_ms, mode and priorities
+        assemble  colors and global shift applied to the groups
+
+    So a new color only re-assembles, a new threshold re-matches without
+    re-shifting, and nothing ever re-parses or re-detects encodings. Two
+    tracks merge like merge_subtitles, more like merge_tracks. `runs` counts
+    how often each stage actually ran. index() gives interval indexes of the
+    last result and of its shifted tracks, built once per result.
+    """
+
+    def __init__(self, tracks: Sequence[pysubs2.SSAFile]):
+        if len(tracks) < 2:
+            raise ValueError("A merge needs at least two tracks")
+        self.tracks = list(tracks)
+        self.runs = {"shift": 0, "match": 0, "assemble": 0}
+        self._shifted: Dict[int, tuple] = {}
+        self._matched: Optional[tuple] = None
+        self._assembled: Optional[tuple] = None
+        self._indexes: Dict[Optional[int], tuple] = {}
+
+    @classmethod
+    def from_files(cls, paths: Sequence[str]) -> "MergeSession":
+        """Parse normalized (UTF-8) subtitle files once"""
+        with stage("parse"):
+            return cls([pysubs2.load(path, encoding="utf-8") for path in paths])
+
+    def _shift(self, k: int, shift_ms: int) -> list:
+        cached = self._shifted.get(k)
+        if cached is None or cached[0] != shift_ms:
+            copy = pysubs2.SSAFile()
+            copy.events = [line.copy() for line in self.tracks[k]]
+            shift_subtitles(copy, shift_ms)
+            if len(self.tracks) > 2:
+                copy.sort()  # The k-way merge walks sorted tracks
+            cached = self._shifted[k] = (shift_ms, copy.events)
+            self.runs["shift"] += 1
+        return cached[1]
+
+    def _match(self, settings: Sequence[dict], threshold_ms: int, mode: str):
+        shifts = tuple(int(opts.get("shift_ms", 0)) for opts in settings)
+        priorities = tuple(opts.get("priority", k) for k, opts in enumerate(settings))
+        key = (shifts, threshold_ms, mode if len(settings) == 2 else None, priorities)
+        if self._matched is None or self._matched[0] != key:
+            events = [self._shift(k, shift) for k, shift in enumerate(shifts)]
+            with stage("match"):
+                if len(events) == 2:
+                    groups = pair_groups(match_cues(events[0], events[1], threshold_ms, mode))
+                else:
+                    groups = _kway_groups(events, list(priorities), threshold_ms)
+            self._matched = (key, events, groups)
+            self.runs["match"] += 1
+        return self._matched
+
+    def render(self, settings: Optional[Sequence[dict]] = None, threshold_ms: int = 1000,
+               shift_global: int = 0, mode: str = "greedy") -> pysubs2.SSAFile:
+        """
+        Merged track for these settings, re-running only the stages they change
+
+        Args:
+            settings: Per-track {"shift_ms", "color", "priority"} dicts, as for
+                merge_tracks (see track_settings). Defaults to track_settings(n)
+            threshold_ms: Maximum time difference to consider subs as matching
+            shift_global: Shift applied to the merged result
+            mode: "greedy" or "align" (two tracks only, see match_cues)
+
+        Returns:
+            The merged pysubs2.SSAFile (shared with the cache: copy it before
+            editing it in place)
+        """
+        settings = list(settings) if settings is not None else track_settings(len(self.tracks))
+        if len(settings) != len(self.tracks):
+            raise ValueError(f"{len(self.tracks)} tracks but {len(settings)} track settings")
+
+        match_key, events, groups = self._match(settings, threshold_ms, mode)
+        key = (match_key, tuple(opts.get("color") for opts in settings), shift_global)
+        if self._assembled is None or self._assembled[0] != key:
+            with stage("assemble"):
+                merged = pysubs2.SSAFile()
+                merged.info = dict(self.tracks[0].info)
+                merged.styles = {name: style.copy() for name, style in self.tracks[0].styles.items()}
+                merged.events = _stack_cues(events, groups, [opts.get("color") for opts in settings])
+                shift_subtitles(merged, shift_global)
+                merged.sort()
+            self._assembled = (key, merged)
+            self.runs["assemble"] += 1
+        return self._assembled[1]
+
+    def index(self, track: Optional[int] = None) -> CueIndex:
+        """
+        CueIndex of the last render()'s merged result, or of one of its input
+        tracks as shifted for it (track 0 is Track A)
+
+        Raises:
+            ValueError: If nothing was rendered yet
+        """
+        if self._assembled is None:
+            raise ValueError("render() the merge before indexing it")
+        events = self._assembled[1].events if track is None else self._matched[1][track]
+        cached = self._indexes.get(track)
+        if cached is None or cached[0] is not events:
+            cached = self._indexes[track] = (events, CueIndex(events))
+        return cached[1]
+
+    def save(self, output_path: str, **kwargs) -> int:
+        """render(**kwargs) and write the result as UTF-8; returns the number of entries"""
+        merged = self.render(**kwargs)
+        with stage("write"):
+            merged.save(output_path, encoding="utf-8")
+        return len(merged)
@@ -0,0 +1,164 @@
+"""
+Timing analysis (sweep line over cue intervals) and overlap resolution.
+"""
+import heapq
+import re
+
+from .profiling import stage
+
+# HTML tags and ASS override blocks, left out of character counts
+_TAG_RE = re.compile(r'<[^>]+>|\{[^}]*\}')
+
+DEFAULT_MAX_CPS = 20.0  # Reading speed above which a cue is hard to follow
+MIN_DURATION_MS = 500  # Shortest cue the resolver leaves behind
+OVERLAP_POLICIES = ("trim", "shift", "stack")
+
+
+def _char_count(line) -> int:
+    return len(_TAG_RE.sub("", line.plaintext).replace("\n", ""))
+
+
+def analyze_timing(subs, max_cps: float = DEFAULT_MAX_CPS, max_reported: int = 100) -> dict:
+    """
+    Timing statistics of a track in one sweep over its cues sorted by start
+
+    Cues whose start falls before the end of an active cue overlap it, so
+    every overlapping pair is found in O(n log n + overlaps), whatever the
+    order of the file. Cues touching end to start do not overlap.
+
+    Args:
+        subs: pysubs2.SSAFile (or any sequence of events)
+        max_cps: Reading speed limit for the "over_limit" count
+        max_reported: Cap on the entry numbers listed in "overlaps" and
+            "invalid_entries" (the counts are always exact)
+
+    Returns:
+        Dictionary with entries, sorted, invalid_durations, invalid_entries,
+        overlap_count, overlaps ([(entry, entry)], 1-based file positions),
+        max_concurrency, max_concurrency_at (ms), gaps {count, min_ms, max_ms,
+        mean_ms} and cps {mean, max, over_limit}
+    """
+    events = list(subs)
+    order = sorted(range(len(events)), key=lambda i: (events[i].start, events[i].end))
+    report = {
+        "entries": len(events),
+        "sorted": order == list(range(len(events))),
+        "invalid_durations": 0,
+        "invalid_entries": [],
+        "overlap_count": 0,
+        "overlaps": [],
+        "max_concurrency": 0,
+        "max_concurrency_at": None,
+    }
+
+    active = []  # (end, index) of the cues still running at the sweep position
+    covered_end = None
+    gaps = []
+    speeds = []
+
+    for idx in order:
+        line = events[idx]
+        if line.end <= line.start:
+            report["invalid_durations"] += 1
+            if len(report["invalid_entries"]) < max_reported:
+                report["invalid_entries"].append(idx + 1)
+            continue
+
+        while active and active[0][0] <= line.start:
+            heapq.heappop(active)
+        if active:
+            report["overlap_count"] += len(active)
+            for _, other in active:
+                if len(report["overlaps"]) >= max_reported:
+                    break
+                report["overlaps"].append((min(other, idx) + 1, max(other, idx) + 1))
+        heapq.heappush(active, (line.end, idx))
+        if len(active) > report["max_concurrency"]:
+            report["max_concurrency"] = len(active)
+            report["max_concurrency_at"] = line.start
+
+        if covered_end is not None and line.start > covered_end:
+            gaps.append(line.start - covered_end)
+        covered_end = line.end if covered_end is None else max(covered_end, line.end)
+
+        speeds.append(_char_count(line) * 1000 / (line.end - line.start))
+
+    report["gaps"] = {
+        "count": len(gaps),
+        "min_ms": min(gaps) if gaps else None,
+        "max_ms": max(gaps) if gaps else None,
+        "mean_ms": round(sum(gaps) / len(gaps), 1) if gaps else None,
+    }
+    report["cps"] = {
+        "mean": round(sum(speeds) / len(speeds), 1) if speeds else None,
+        "max": round(max(speeds), 1) if speeds else None,
+        "over_limit": sum(1 for cps in speeds if cps > max_cps),
+    }
+    return report
+
+
+def resolve_overlaps(subs, policy: str = "trim", min_gap_ms: int = 0,
+                     min_duration_ms: int = MIN_DURATION_MS) -> int:
+    """
+    Remove overlapping cues (in place); the track is sorted first
+
+    Policies:
+        trim: end the earlier cue where the next one starts (minus min_gap_ms);
+            when that would leave it shorter than min_duration_ms, the next
+            cue is pushed back instead
+        shift: push the later cue back, keeping its duration (later cues
+            follow when they overlap in turn)
+        stack: combine overlapping cues into one entry showing all their
+            lines, as a merge does for matched cues
+
+    Cues with a non-positive duration are first given min_duration_ms.
+    Works on any track, including merged outputs.
+
+    Raises:
+        ValueError: If policy is unknown
+
+    Returns:
+        Number of cues changed or combined
+    """
+    if policy not in OVERLAP_POLICIES:
+        raise ValueError(f"Unknown overlap policy {policy!r} (expected one of {', '.join(OVERLAP_POLICIES)})")
+
+    with stage("resolve"):
+        changed = set()
+        for line in subs:
+            if line.end <= line.start:
+                line.end = line.start + min_duration_ms
+                changed.add(id(line))
+        subs.sort()
+        events = list(subs)
+
+        if policy == "stack":
+            stacked = []
+            for line in events:
+                current = stacked[-1] if stacked else None
+                if current is not None and line.start < current.end:
+                    current.end = max(current.end, line.end)
+                    current.text = f"{current.text.strip()}\n{line.text.strip()}"
+                    changed.update((id(current), id(line)))
+                    continue
+                stacked.append(line)
+            subs.events = stacked
+            return len(changed)
+
+        for prev, line in zip(events, events[1:]):
+            if line.start >= prev.end + min_gap_ms:
+                continue
+            if policy == "trim" and line.start - min_gap_ms - prev.start >= min_duration_ms:
+                prev.end = line.start - min_gap_ms
+                changed.add(id(prev))
+                continue
+            if policy == "trim":
+                prev.end = min(prev.end, prev.start + min_duration_ms)
+                changed.add(id(prev))
+            delta = prev.end + min_gap_ms - line.start
+            if delta > 0:
+                line.start += delta
+                line.end += delta
+                changed.add(id(line))
+
+        return len(changed)
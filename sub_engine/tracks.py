@@ -0,0 +1,559 @@
+"""
+Validation, timing, merging and cleanup of parsed subtitle tracks.
+"""
+import bisect
+import heapq
+import math
+import re
+from typing import Collection, List, Optional, Sequence, Tuple
+
+import pysubs2
+
+from .boilerplate import boilerplate_key
+from .intervals import CueIndex
+from .profiling import stage
+from .timing import _TAG_RE, analyze_timing
+
+
+def validate_subtitle_file(file_path: str, subs=None) -> Tuple[bool, str]:
+    """
+    Validate that a subtitle file is properly formatted
+    
+    Args:
+        file_path: Subtitle file (UTF-8)
+        subs: The already parsed track, to skip loading file_path again
+    
+    Returns:
+        Tuple of (is_valid, message)
+    """
+    try:
+        if subs is None:
+            subs = pysubs2.load(file_path, encoding="utf-8")
+        
+        if len(subs) == 0:
+            return False, "File contains no subtitle entries"
+        
+        # Check for overlapping subtitles (in any order) and negative durations
+        report = analyze_timing(subs, max_reported=3)
+        issues = [f"Overlap at entries {i}/{j}" for i, j in report["overlaps"]]
+        issues += [f"Invalid duration at entry {i}" for i in report["invalid_entries"]]
+        total = report["overlap_count"] + report["invalid_durations"]
+        
+        if issues:
+            return True, f"Warning: {', '.join(issues[:3])}" + (f" (+{total-3} more)" if total > 3 else "")
+        
+        return True, f"Valid subtitle file ({len(subs)} entries)"
+        
+    except Exception as e:
+        return False, f"Parse error: {str(e)}"
+
+
+def shift_subtitles(subs, shift_ms: int, speed_factor: float = 1.0):
+    """
+    Shift subtitle timing and/or adjust speed
+    
+    Args:
+        subs: pysubs2.SSAFile object
+        shift_ms: Milliseconds to shift (positive = later, negative = earlier)
+        speed_factor: Speed multiplier (>1.0 = slower, <1.0 = faster)
+    
+    Returns:
+        Modified subs object
+    """
+    if shift_ms == 0 and speed_factor == 1.0: 
+        return subs
+    
+    for line in subs:
+        # Apply speed factor first, then shift
+        line.start = int(line.start * speed_factor) + shift_ms
+        line.end = int(line.end * speed_factor) + shift_ms
+        
+        # Ensure times don't go negative
+        if line.start < 0:
+            line.start = 0
+        if line.end < 0:
+            line.end = 0
+    
+    return subs
+
+
+def merge_subtitles(path_a: str, path_b: str, output_path: str, 
+                    threshold_ms: int = 1000, 
+                    color_hex: str = "#ffff54", 
+                    color_track: str = "Track B",
+                    shift_a: int = 0, 
+                    shift_b: int = 0, 
+                    shift_global: int = 0,
+                    mode: str = "greedy") -> int:
+    """
+    Merge two subtitle files with alignment and coloring
+    
+    Args:
+        path_a, path_b: Input subtitle file paths
+        output_path: Output file path
+        threshold_ms: Maximum time difference to consider subs as matching
+        color_hex: Color for highlighted track
+        color_track: Which track to colorize ("Track A", "Track B", or "None")
+        shift_a, shift_b, shift_global: Timing adjustments in milliseconds
+        mode: "greedy" (nearest start, cue by cue) or "align" (global
+            alignment on overlap and length, with 1:2 and 2:1 merges)
+    
+    Returns:
+        Number of merged subtitle entries
+    """
+    # Normalized files are now GUARANTEED UTF-8
+    with stage("parse"):
+        subs_a = pysubs2.load(path_a, encoding="utf-8")
+        subs_b = pysubs2.load(path_b, encoding="utf-8")
+    
+    with stage("match"):
+        _match_tracks(subs_a, subs_b, threshold_ms, color_hex, color_track, shift_a, shift_b, shift_global, mode)
+    
+    # Save as UTF-8 WITHOUT BOM (most players prefer this)
+    with stage("write"):
+        subs_a.save(output_path, encoding="utf-8")
+    
+    return len(subs_a)
+
+
+def _match_tracks(subs_a, subs_b, threshold_ms: int, color_hex: str, color_track: str,
+                  shift_a: int, shift_b: int, shift_global: int, mode: str = "greedy") -> None:
+    """Shift, colorize and merge Track B into Track A (in place)"""
+    # Apply individual track shifts
+    shift_subtitles(subs_a, shift_a)
+    shift_subtitles(subs_b, shift_b)
+
+    # Match on the plain text: color tags would skew the length ratio
+    groups = pair_groups(match_cues(subs_a.events, subs_b.events, threshold_ms, mode))
+    colors = [opts["color"] for opts in track_settings(2, color_hex, color_track)]
+    subs_a.events = _stack_cues([subs_a.events, subs_b.events], groups, colors)
+
+    # Apply global shift and sort
+    shift_subtitles(subs_a, shift_global)
+    subs_a.sort()
+
+
+def pair_groups(groups: List[Tuple[List[int], List[int]]]) -> List[List[Tuple[int, int]]]:
+    """match_cues groups as stack groups: [(track, index), ...] with Track A first"""
+    return [[(0, i) for i in a_idx] + [(1, j) for j in b_idx] for a_idx, b_idx in groups]
+
+
+def _stack_cues(tracks: Sequence[Sequence], groups: List[List[Tuple[int, int]]],
+                colors: Sequence[Optional[str]]) -> list:
+    """
+    Build merged entries from groups of (track, index), top track first
+    
+    An entry takes the timing of its first track (up to the end of that
+    track's last cue, for a 1:2/2:1 group) and shows one line per track; cues
+    of the same track are joined on that line. Colored tracks get a font tag
+    per cue. The input cues are left untouched.
+    """
+    def text(k, cue):
+        return f'<font color="{colors[k]}">{cue.text.strip()}</font>' if colors[k] else cue.text
+
+    merged = []
+    for group in groups:
+        top_track, top_index = group[0]
+        line = tracks[top_track][top_index].copy()
+        if len(group) == 1:
+            line.text = text(top_track, line)
+            merged.append(line)
+            continue
+        lines = {}
+        for k, i in group:
+            lines.setdefault(k, []).append(text(k, tracks[k][i]).strip())
+            if k == top_track:
+                line.end = max(line.end, tracks[k][i].end)
+        line.text = "\n".join(" ".join(parts) for parts in lines.values())
+        merged.append(line)
+    return merged
+
+
+MATCH_MODES = ("greedy", "align")
+
+
+def match_cues(events_a: Sequence, events_b: Sequence, threshold_ms: int = 1000,
+               mode: str = "greedy") -> List[Tuple[List[int], List[int]]]:
+    """
+    Pair the cues of two tracks
+    
+    "greedy": every cue of A, in order, takes the unmatched cue of B whose
+    start is nearest (within threshold_ms), looked up in a CueIndex of B.
+    "align": global alignment of both tracks (see _align_cues), which also
+    merges 1:2 and 2:1 when one track splits a sentence the other keeps
+    whole.
+    
+    Returns:
+        List of (indices in A, indices in B). Unmatched cues come as ([i], [])
+        or ([], [j]); greedy lists A in order, then the unmatched cues of B
+    """
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode {mode!r} (expected one of {', '.join(MATCH_MODES)})")
+    if mode == "align":
+        return _align_cues(events_a, events_b, threshold_ms)
+
+    # Merge Logic: Match subtitles within threshold (candidates from the start index of B)
+    groups = []
+    matched_indices_b = set()
+    index_b = CueIndex(events_b)
+    
+    for idx_a, line_a in enumerate(events_a):
+        best_match = None
+        best_key = (threshold_ms + 1, 0)
+        
+        for idx in index_b.starting_between(line_a.start - threshold_ms, line_a.start + threshold_ms):
+            if idx in matched_indices_b:
+                continue
+            
+            # Nearest start, the earliest cue of B on ties
+            key = (abs(line_a.start - events_b[idx].start), idx)
+            if key < best_key:
+                best_match = idx
+                best_key = key
+        
+        if best_match is not None:
+            groups.append(([idx_a], [best_match]))
+            matched_indices_b.add(best_match)
+        else:
+            groups.append(([idx_a], []))
+
+    # Add unmatched subtitles from Track B
+    groups.extend(([], [idx]) for idx in range(len(events_b)) if idx not in matched_indices_b)
+    return groups
+
+
+# Global alignment costs: leaving a cue unmatched costs SKIP_COST, a pair
+# costs 1 - IoU of the time spans plus up to LENGTH_WEIGHT for a text length
+# ratio away from the tracks' average. Any pair allowed by threshold_ms costs
+# less than skipping both of its cues.
+SKIP_COST = 1.0
+LENGTH_WEIGHT = 0.25
+MIN_GROUP_COVERAGE = 0.5  # Share of each cue of a 1:2/2:1 group inside the other side
+
+
+def _align_cues(events_a: Sequence, events_b: Sequence, threshold_ms: int) -> List[Tuple[List[int], List[int]]]:
+    """
+    Banded DP alignment of two tracks (monotonic, like DTW with skips)
+    
+    D[i][j] is the cheapest alignment of the first i cues of A with the first
+    j cues of B; moves are skip A, skip B, 1:1, 1:2 and 2:1. Row i only keeps
+    the j whose cues start within threshold_ms of the neighbouring cues of A,
+    so time and memory are O(n * band) instead of O(n * m).
+    """
+    order_a = sorted(range(len(events_a)), key=lambda i: (events_a[i].start, events_a[i].end))
+    order_b = sorted(range(len(events_b)), key=lambda j: (events_b[j].start, events_b[j].end))
+    a = [(events_a[i].start, events_a[i].end, len(_TAG_RE.sub("", events_a[i].text).strip())) for i in order_a]
+    b = [(events_b[j].start, events_b[j].end, len(_TAG_RE.sub("", events_b[j].text).strip())) for j in order_b]
+    n, m = len(a), len(b)
+    if not n or not m:
+        return [([i], []) for i in order_a] + [([], [j]) for j in order_b]
+
+    # Expected text length ratio between the tracks (languages differ in length)
+    log_ratio = math.log((sum(x[2] for x in a) / n + 1) / (sum(x[2] for x in b) / m + 1))
+
+    def pair_cost(group_a, group_b):
+        start_a, end_a = group_a[0][0], max(x[1] for x in group_a)
+        start_b, end_b = group_b[0][0], max(x[1] for x in group_b)
+        inter = min(end_a, end_b) - max(start_a, start_b)
+        if abs(start_a - start_b) > threshold_ms and inter <= 0:
+            return None
+        for cues, span_start, span_end in ((group_a, start_b, end_b), (group_b, start_a, end_a)):
+            if len(cues) > 1:
+                for start, end, _ in cues:
+                    inside = min(end, span_end) - max(start, span_start)
+                    if inside < MIN_GROUP_COVERAGE * max(end - start, 1):
+                        return None
+        iou = max(inter, 0) / max(max(end_a, end_b) - min(start_a, start_b), 1)
+        len_a = sum(x[2] for x in group_a) + 1
+        len_b = sum(x[2] for x in group_b) + 1
+        return (1 - iou) + LENGTH_WEIGHT * min(1.0, abs(math.log(len_a / len_b) - log_ratio))
+
+    # Band: after i cues of A, the cues of B already consumed must start before
+    # A[i] + threshold, and the ones left must start after A[i-1] - threshold
+    starts_b = [x[0] for x in b]
+    lo = [0] + [bisect.bisect_left(starts_b, a[i - 1][0] - threshold_ms) for i in range(1, n + 1)]
+    hi = [bisect.bisect_right(starts_b, a[i][0] + threshold_ms) for i in range(n)] + [m]
+    for i in range(1, n + 1):  # Keep the band monotonic and connected
+        lo[i] = max(lo[i], lo[i - 1])
+    for i in range(n - 1, -1, -1):
+        hi[i] = min(hi[i], hi[i + 1])
+        hi[i] = max(hi[i], lo[i + 1])
+
+    inf = float("inf")
+    cost = [[inf] * (hi[i] - lo[i] + 1) for i in range(n + 1)]
+    back = [[None] * (hi[i] - lo[i] + 1) for i in range(n + 1)]
+    cost[0][0] = 0.0
+
+    def relax(i, j, value, move):
+        if i <= n and lo[i] <= j <= hi[i] and value < cost[i][j - lo[i]]:
+            cost[i][j - lo[i]] = value
+            back[i][j - lo[i]] = move
+
+    for i in range(n + 1):
+        row = cost[i]
+        for j in range(lo[i], hi[i] + 1):
+            here = row[j - lo[i]]
+            if here == inf:
+                continue
+            if j < m:
+                relax(i, j + 1, here + SKIP_COST, (0, 1))
+            if i < n:
+                relax(i + 1, j, here + SKIP_COST, (1, 0))
+                if j < m:
+                    for da, db in ((1, 1), (1, 2), (2, 1)):
+                        if i + da <= n and j + db <= m:
+                            step = pair_cost(a[i:i + da], b[j:j + db])
+                            if step is not None:
+                                relax(i + da, j + db, here + step, (da, db))
+
+    # Walk back from (n, m)
+    groups = []
+    i, j = n, m
+    while i or j:
+        da, db = back[i][j - lo[i]]
+        i, j = i - da, j - db
+        if da and db:
+            groups.append(([order_a[k] for k in range(i, i + da)], [order_b[k] for k in range(j, j + db)]))
+        elif da:
+            groups.append(([order_a[i]], []))
+        else:
+            groups.append(([], [order_b[j]]))
+    groups.reverse()
+    return groups
+
+
+# Colors for the tracks after Track B when more than two tracks are merged
+TRACK_COLORS = ["#54ffff", "#ff9f54", "#9fff54", "#ff54ff", "#54a0ff"]
+
+
+def track_settings(n_tracks: int, color_hex: str = "#ffff54", color_track: str = "Track B",
+                   shift_a: int = 0, shift_b: int = 0) -> List[dict]:
+    """
+    Per-track settings for merge_tracks from the two-track options.
+    
+    Track A keeps shift_a; every other track gets shift_b. With color_track
+    "Track B", Track B gets color_hex and the following tracks TRACK_COLORS.
+    
+    Returns:
+        List of {"shift_ms", "color", "priority"} dicts in track order
+    """
+    settings = []
+    for k in range(n_tracks):
+        if color_track == "Track A":
+            color = color_hex if k == 0 else None
+        elif color_track == "Track B" and k > 0:
+            color = color_hex if k == 1 else TRACK_COLORS[(k - 2) % len(TRACK_COLORS)]
+        else:
+            color = None
+        settings.append({"shift_ms": shift_a if k == 0 else shift_b, "color": color, "priority": k})
+    return settings
+
+
+def merge_tracks(paths: Sequence[str], output_path: str, tracks: Optional[Sequence[dict]] = None,
+                 threshold_ms: int = 1000, shift_global: int = 0) -> int:
+    """
+    Merge any number of subtitle files in one k-way pass
+    
+    Every track is sorted once; a heap holding the next cue of each track
+    yields cues in start order, and the cues of different tracks starting
+    within threshold_ms of the earliest one are stacked into one entry.
+    O(total * log k) for k tracks, and the output is written once.
+    
+    Args:
+        paths: Input subtitle file paths (UTF-8)
+        output_path: Output file path
+        tracks: Per-track settings in the order of `paths`, each with
+            "shift_ms" (int), "color" (hex or None) and "priority" (lower is
+            stacked higher and gives the merged entry its timing).
+            Defaults to track_settings(len(paths))
+        threshold_ms: Maximum start difference to stack cues together
+        shift_global: Shift applied to the merged result
+    
+    Returns:
+        Number of merged subtitle entries
+    """
+    settings = list(tracks) if tracks is not None else track_settings(len(paths))
+    if len(settings) != len(paths):
+        raise ValueError(f"{len(paths)} tracks but {len(settings)} track settings")
+    
+    with stage("parse"):
+        loaded = [pysubs2.load(path, encoding="utf-8") for path in paths]
+    
+    with stage("match"):
+        track_events = []
+        for subs, opts in zip(loaded, settings):
+            shift_subtitles(subs, int(opts.get("shift_ms", 0)))
+            subs.sort()
+            track_events.append(subs.events)
+        priorities = [opts.get("priority", k) for k, opts in enumerate(settings)]
+        groups = _kway_groups(track_events, priorities, threshold_ms)
+        
+        merged = loaded[0]
+        merged.events = _stack_cues(track_events, groups, [opts.get("color") for opts in settings])
+        shift_subtitles(merged, shift_global)
+        merged.sort()  # Entries take the timing of their top track, so only near-sorted
+    
+    with stage("write"):
+        merged.save(output_path, encoding="utf-8")
+    return len(merged)
+
+
+def _kway_groups(tracks: List[list], priorities: List[int], threshold_ms: int) -> List[List[Tuple[int, int]]]:
+    """
+    Group the cues of sorted tracks that start within threshold_ms of each other
+    
+    Returns:
+        Groups of (track, index), in start order, each ordered by priority
+    """
+    heap = [(events[0].start, priorities[k], k, 0) for k, events in enumerate(tracks) if events]
+    heapq.heapify(heap)
+    groups = []
+    
+    def advance(k, i):
+        if i + 1 < len(tracks[k]):
+            heapq.heappush(heap, (tracks[k][i + 1].start, priorities[k], k, i + 1))
+    
+    while heap:
+        anchor_start, _, k, i = heapq.heappop(heap)
+        group = {k: i}
+        advance(k, i)
+        
+        # One cue per track: a track already in the group waits for the next entry
+        deferred = []
+        while heap and heap[0][0] - anchor_start <= threshold_ms:
+            entry = heapq.heappop(heap)
+            if entry[2] in group:
+                deferred.append(entry)
+                continue
+            group[entry[2]] = entry[3]
+            advance(entry[2], entry[3])
+        for entry in deferred:
+            heapq.heappush(heap, entry)
+        
+        groups.append([(k, group[k]) for k in sorted(group, key=lambda k: (priorities[k], k))])
+    
+    return groups
+
+
+def remove_duplicates(subs, time_threshold_ms: int = 100) -> int:
+    """
+    Remove duplicate subtitle entries based on timing and text
+    
+    Returns:
+        Number of duplicates removed
+    """
+    unique_lines = []
+    duplicates_removed = 0
+    
+    for line in subs:
+        is_duplicate = False
+        
+        for unique_line in unique_lines:
+            # Check if timing is very similar and text is identical
+            if (abs(line.start - unique_line.start) <= time_threshold_ms and 
+                abs(line.end - unique_line.end) <= time_threshold_ms and
+                line.text.strip() == unique_line.text.strip()):
+                is_duplicate = True
+                duplicates_removed += 1
+                break
+        
+        if not is_duplicate:
+            unique_lines.append(line)
+    
+    subs.events = unique_lines
+    return duplicates_removed
+
+
+def fix_common_issues(subs) -> List[str]:
+    """
+    Fix common subtitle issues
+    
+    Returns:
+        List of fixes applied
+    """
+    fixes = []
+    
+    # Fix 1: Remove lines with only whitespace
+    original_count = len(subs)
+    subs.events = [line for line in subs if line.text.strip()]
+    if len(subs) < original_count:
+        fixes.append(f"Removed {original_count - len(subs)} empty lines")
+    
+    # Fix 2: Normalize whitespace
+    for line in subs:
+        new_text = ' '.join(line.text.split())
+        if new_text != line.text:
+            line.text = new_text
+    
+    # Fix 3: Fix negative durations (1 second, but never past the next cue)
+    fixed_durations = 0
+    starts = sorted(line.start for line in subs)
+    for line in subs:
+        if line.end <= line.start:
+            next_idx = bisect.bisect_right(starts, line.start)
+            next_start = starts[next_idx] if next_idx < len(starts) else None
+            line.end = line.start + 1000 if next_start is None else min(line.start + 1000, next_start)
+            fixed_durations += 1
+    if fixed_durations > 0:
+        fixes.append(f"Fixed {fixed_durations} invalid durations")
+    
+    return fixes
+
+
+# Advertising / credit lines removed by the Sanitizer (links, not dialogue that
+# merely names a site: "ordered it on amazon.com" stays)
+AD_PATTERNS = [
+    r'subtitles? by', r'corrected by', r'www\.', r'https?://',
+    r'opensubtitles', r'addic7ed', r'subscene', r'yify'
+]
+_AD_RE = re.compile('|'.join(AD_PATTERNS), re.IGNORECASE)
+_HI_RE = re.compile(r'\[.*?\]|\(.*?\)')
+
+
+def sanitize_subtitles(subs, remove_ads: bool = True, remove_hi: bool = False, 
+                       remove_empty: bool = True, find_text: str = "", 
+                       replace_text: str = "", boilerplate: Collection[str] = ()) -> int:
+    """
+    Strip hearing-impaired tags, apply a custom regex replacement and drop
+    advertising and empty lines
+    
+    Args:
+        boilerplate: Line keys found across files (see detect_boilerplate and
+            boilerplate_keys); matching lines are dropped with the ads
+    
+    Raises:
+        re.error: If find_text is not a valid regex
+    
+    Returns:
+        Number of lines removed
+    """
+    with stage("sanitize"):
+        find_re = re.compile(find_text) if find_text else None
+        new_lines = []
+        
+        for line in subs:
+            # 1. Remove HI tags
+            if remove_hi:
+                line.text = _HI_RE.sub('', line.text)
+            
+            # 2. Custom Find/Replace
+            if find_re:
+                line.text = find_re.sub(replace_text, line.text)
+            
+            # 3. Strip whitespace
+            line.text = line.text.strip()
+            
+            # 4. Ad Removal
+            is_ad = remove_ads and _AD_RE.search(line.text) is not None
+            if boilerplate and not is_ad:
+                is_ad = boilerplate_key(line.text) in boilerplate
+            
+            # 5. Empty line check
+            is_empty = remove_empty and not line.text
+            
+            if not is_ad and not is_empty:
+                new_lines.append(line)
+        
+        removed = len(subs) - len(new_lines)
+        subs.events = new_lines
+        return removed
@@ -0,0 +1,84 @@
+"""
+Subtitle translation through an OpenAI-compatible chat completions API.
+
+requests is imported on first use so the rest of the engine never loads it.
+"""
+from .profiling import stage
+
+
+def translate_subs(subs, base_url, model, source_lang, target_lang, context_info="", batch_size=10):
+    """
+    Translate subtitles using a local LLM API
+    
+    Yields progress updates with (progress_float, original_lines, translated_lines)
+    """
+    import requests
+    
+    lines = [line.text for line in subs]
+    translated_lines = []
+    
+    for i in range(0, len(lines), batch_size):
+        batch = lines[i:i + batch_size]
+        batch_text = "\n---\n".join(batch)
+        
+        prompt = f"""Context: {context_info}
+Task: Translate these subtitle lines from {source_lang} to {target_lang}.
+Requirements:
+- Maintain the original tone and style
+- Keep the format (one line per subtitle, separated by ---)
+- Keep translations concise (suitable for subtitles)
+- No explanations or comments
+- Preserve formatting tags if present
+
+Subtitles:
+{batch_text}
+"""
+
+        try:
+            with stage("llm"):
+                response = requests.post(
+                    f"{base_url}/chat/completions",
+                    json={
+                        "model": model,
+                        "messages": [
+                            {"role": "system", "content": "You are a professional subtitle translator. Output ONLY the translated subtitles, separated by ---, without any preamble or explanation."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        "temperature": 0.3,
+                        "max_tokens": 2000
+                    },
+                    timeout=60
+                )
+                result = response.json()['choices'][0]['message']['content']
+            
+            # Clean up common artifacts
+            result = result.replace('```', '').strip()
+            
+            # Split by separator
+            translated_batch = [line.strip() for line in result.split("\n---\n")]
+            
+            # Verify we got the right number of translations
+            if len(translated_batch) != len(batch):
+                # Fallback: try splitting by newlines
+                translated_batch = [line.strip() for line in result.split("\n") if line.strip()]
+                
+                # If still mismatched, pad or truncate
+                if len(translated_batch) < len(batch):
+                    translated_batch.extend([f"[Translation missing]"] * (len(batch) - len(translated_batch)))
+                elif len(translated_batch) > len(batch):
+                    translated_batch = translated_batch[:len(batch)]
+                    
+        except requests.exceptions.Timeout:
+            translated_batch = [f"[Timeout] {line}" for line in batch]
+        except requests.exceptions.ConnectionError:
+            translated_batch = [f"[Connection Error] {line}" for line in batch]
+        except Exception as e:
+            translated_batch = [f"[Error: {str(e)[:50]}] {line}" for line in batch]
+            
+        translated_lines.extend(translated_batch)
+        yield (i + len(batch)) / len(lines), batch, translated_batch
+
+    # Apply translations to subtitle objects
+    for i, line in enumerate(subs):
+        if i < len(translated_lines):
+            line.text = translated_lines[i]
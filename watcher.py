@@ -0,0 +1,236 @@
+"""
+Watch-folder daemon: merges episodes as soon as two of their tracks have landed
+(a track arriving later triggers a new merge with every track).
+
+The input tree is rescanned every `interval` seconds (or as soon as inotify
+reports a change, when the optional `inotify_simple` package is installed).
+A file only counts once its size and mtime have been stable for `settle`
+seconds, so half-written downloads are never picked up. Finished pairs are
+recorded in a JSON state file, so a restart does not redo them.
+"""
+import json
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from sub_engine import find_subtitles
+from workers import group_tracks, merge_episode
+
+STATE_VERSION = 1
+
+
+def _signature(path: str) -> list:
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+
+class WatchFolder:
+    """
+    Incremental merge daemon over an input tree
+
+    Args:
+        input_dir: Directory receiving new subtitle files
+        output_dir: Where Merged_<code>.srt files are written (mirrors the input tree)
+        merge_step: Merge options, as in a pipeline spec step ({"track_b": "FR", ...})
+        state_path: JSON state file (default: <output_dir>/.watch_state.json)
+        interval: Seconds between scans
+        settle: Seconds a file must stay unchanged before it is used
+        jobs: Maximum merges running at the same time
+        log: Callable receiving progress messages
+    """
+
+    def __init__(self, input_dir: str, output_dir: str, merge_step: Optional[dict] = None,
+                 state_path: Optional[str] = None, interval: float = 5.0, settle: float = 10.0,
+                 jobs: int = 1, log: Callable[[str], None] = print):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.merge_step = dict(merge_step or {})
+        self.state_path = state_path or os.path.join(output_dir, ".watch_state.json")
+        self.interval = interval
+        self.settle = settle
+        self.jobs = max(1, jobs)
+        self.log = log
+
+        self.done = self._load_state()
+        self._observed: Dict[str, tuple] = {}   # path -> (size, mtime_ns, unchanged_since)
+        self._running: Dict[str, tuple] = {}    # pair key -> (future, signature, output)
+        self._failed: Dict[str, list] = {}      # pair key -> signature that failed (retried once files change)
+        self._stopping = False
+        self._inotify = None
+        self._watched_dirs = set()
+
+    # --- State file ---------------------------------------------------------
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") == STATE_VERSION:
+                return state.get("done", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_state(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "done": self.done}, f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    # --- Scanning -----------------------------------------------------------
+
+    def stable_files(self) -> list:
+        """
+        Rescan the input tree and return the files that have settled
+
+        Returns:
+            List of (absolute_path, relative_path)
+        """
+        now = time.monotonic()
+        present = find_subtitles(self.input_dir)
+        observed = {}
+        stable = []
+
+        for path, rel in present:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Deleted between listing and stat
+            previous = self._observed.get(path)
+            if previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                since = previous[2]
+            elif previous:
+                since = now
+            else:
+                # First sighting: a file last written long ago has already settled
+                since = now - max(0.0, time.time() - stat.st_mtime)
+            observed[path] = (stat.st_size, stat.st_mtime_ns, since)
+            if stat.st_size > 0 and now - since >= self.settle:
+                stable.append((path, rel))
+
+        # Only files still present are remembered, so memory follows the tree, not its history
+        self._observed = observed
+        return stable
+
+    def poll(self) -> int:
+        """
+        One scan: collect finished merges and submit newly complete pairs
+
+        Returns:
+            Number of merges submitted
+        """
+        self._collect()
+        episodes, _ = group_tracks(self.stable_files(), self.merge_step.get("track_b", ""))
+        submitted = 0
+
+        for rel_dir, code, paths in episodes:
+            key = f"{rel_dir}|{code}"
+            if key in self._running:
+                continue
+            try:
+                signature = [_signature(path) for path in paths]
+            except OSError:
+                continue
+            if self.done.get(key, {}).get("signature") == signature or self._failed.get(key) == signature:
+                continue  # Already merged (or failed) from these exact files
+            if len(self._running) >= self.jobs:
+                break  # Throttle: the rest waits for the next scan
+
+            output = os.path.join(self.output_dir, rel_dir, f"Merged_{code}.srt")
+            future = self._pool.submit(merge_episode, paths, output, self.merge_step)
+            self._running[key] = (future, signature, output)
+            roles = " + ".join(f"{os.path.basename(path)} ({chr(ord('A') + k)})" for k, path in enumerate(paths))
+            self.log(f"→ {code}: {roles}")
+            submitted += 1
+
+        return submitted
+
+    def _collect(self) -> None:
+        """Record merges that finished since the last scan"""
+        changed = False
+        for key, (future, signature, output) in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[key]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "failed", "error": str(e)}
+
+            if result["status"] == "ok":
+                self.done[key] = {"signature": signature, "output": output, "finished": time.time()}
+                self._failed.pop(key, None)
+                changed = True
+                languages = " + ".join(result.get("languages") or [])
+                self.log(f"✓ {key.split('|')[-1]} merged -> {output}" + (f" ({languages})" if languages else ""))
+            else:
+                self._failed[key] = signature
+                self.log(f"✗ {key.split('|')[-1]} failed: {result.get('error')}")
+        if changed:
+            self._save_state()
+
+    # --- Waiting ------------------------------------------------------------
+
+    def _setup_inotify(self) -> None:
+        try:
+            from inotify_simple import INotify
+        except ImportError:
+            return
+        self._inotify = INotify()
+
+    def _watch_new_dirs(self) -> None:
+        if not self._inotify:
+            return
+        from inotify_simple import flags
+        mask = flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO | flags.DELETE
+        for root, _, _ in os.walk(self.input_dir):
+            if root not in self._watched_dirs:
+                self._inotify.add_watch(root, mask)
+                self._watched_dirs.add(root)
+
+    def _wait(self) -> None:
+        """Sleep until the next scan, waking early on filesystem events"""
+        # The timeout matters with inotify too: settling files need a rescan without new events
+        if self._inotify:
+            self._watch_new_dirs()
+            self._inotify.read(timeout=int(self.interval * 1000))
+        else:
+            time.sleep(self.interval)
+
+    # --- Main loop ----------------------------------------------------------
+
+    def stop(self, *_) -> None:
+        self._stopping = True
+
+    def run(self, once: bool = False) -> None:
+        """
+        Run until stopped (SIGINT/SIGTERM), or for a single scan with once=True
+
+        Workers are recycled after a few merges so the daemon's memory stays flat.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if not once:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+            self._setup_inotify()
+            mode = "inotify" if self._inotify else "polling"
+            self.log(f"Watching {self.input_dir} ({mode}, {self.jobs} job(s), settle {self.settle}s)")
+
+        with ProcessPoolExecutor(max_workers=self.jobs, max_tasks_per_child=20) as self._pool:
+            while True:
+                submitted = self.poll()
+                if once:
+                    if not submitted and not self._running:
+                        break
+                    wait([future for future, _, _ in self._running.values()], return_when=FIRST_COMPLETED)
+                    continue
+                if self._stopping:
+                    break
+                self._wait()
+            # Let in-flight merges finish so their results reach the state file
+            for future, _, _ in self._running.values():
+                future.exception()
+            self._collect()
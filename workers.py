@@ -0,0 +1,284 @@
+"""
+Worker entry points shared by the command line, the watch-folder daemon and
+the HTTP service.
+
+Each takes paths and a step dict, runs in a worker process and returns a
+result dict ("status" is "ok" or "failed", with the error message) instead of
+raising, so one bad file never takes down a batch.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+def _profiler(profile: bool, trace_memory: bool):
+    """A StageProfiler for one worker call, or None when profiling is off"""
+    if not profile:
+        return None
+    from sub_engine import StageProfiler
+    return StageProfiler(trace_memory=trace_memory)
+
+
+def run_file_steps(input_path: str, output_path: str, steps: List[dict],
+                   profile: bool = False, trace_memory: bool = False) -> dict:
+    """
+    Run the per-file steps of a pipeline on one file (worker entry point)
+
+    Returns:
+        Result dict with input, output, status ("ok"/"failed"), steps and timing
+        (plus the stage records under "stages" when profiling)
+    """
+    import pysubs2
+    from sub_engine import (normalize_subtitle, repair_corrupted_encoding, analyze_corruption, analyze_timing,
+                            decode_with_report, resolve_overlaps, sanitize_subtitles, shift_subtitles)
+
+    result = {"input": input_path, "output": output_path, "status": "ok", "steps": []}
+    started = time.perf_counter()
+    profiler = _profiler(profile, trace_memory)
+
+    try:
+        with profiler.file(input_path) if profiler else nullcontext(), \
+                tempfile.TemporaryDirectory() as work_dir:
+            ext = os.path.splitext(output_path)[1] or ".srt"
+            current = input_path
+
+            for idx, step in enumerate(steps):
+                op = step["op"]
+                target = os.path.join(work_dir, f"step{idx}{ext}")
+                info = {"op": op}
+
+                if op == "normalize":
+                    _, encoding, tier, language = normalize_subtitle(
+                        current, target, step.get("target_script", "auto"), identify=True)
+                    info.update(encoding=encoding, tier=tier, language=language["language"],
+                                language_confidence=language["confidence"])
+                elif op == "repair":
+                    success, corruption_type, applied_fix, _ = repair_corrupted_encoding(
+                        current, target, step.get("target_script", "auto"))
+                    if not success:
+                        raise ValueError("unrepairable encoding")
+                    info.update(corruption_type=corruption_type, applied_fix=applied_fix)
+                elif op == "analyze":
+                    analysis = analyze_corruption(current, step.get("target_script", "auto"), keep_buffer=True,
+                                                  score_strategies=False)
+                    if "error" in analysis:
+                        raise ValueError(analysis["error"])
+                    # Time the cues as decoded with the detected encoding, so legacy files are analyzed too
+                    text, _ = decode_with_report(analysis.pop("raw_data"), analysis)
+                    info["analysis"] = {k: v for k, v in analysis.items() if k != "strategy_scores"}
+                    subs = pysubs2.SSAFile.from_string(text.replace("\r\n", "\n").replace("\r", "\n"))
+                    info["timing"] = analyze_timing(subs)
+                    target = current
+                else:
+                    subs = pysubs2.load(current, encoding="utf-8")
+                    if op == "sanitize":
+                        info["removed_lines"] = sanitize_subtitles(
+                            subs,
+                            remove_ads=step.get("remove_ads", True),
+                            remove_hi=step.get("remove_hi", False),
+                            remove_empty=step.get("remove_empty", True),
+                            find_text=step.get("find", ""),
+                            replace_text=step.get("replace", ""),
+                            boilerplate=load_boilerplate(step["boilerplate"]) if step.get("boilerplate") else (),
+                        )
+                    elif op == "resolve":
+                        info["changed"] = resolve_overlaps(subs, step.get("policy", "trim"),
+                                                           int(step.get("min_gap_ms", 0)))
+                    else:
+                        shift_subtitles(subs, int(step.get("shift_ms", 0)), float(step.get("speed_factor", 1.0)))
+                    subs.save(target, encoding="utf-8")
+
+                result["steps"].append(info)
+                current = target
+
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            shutil.copyfile(current, output_path)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+
+    result["elapsed_s"] = round(time.perf_counter() - started, 4)
+    if profiler:
+        result["stages"] = profiler.records
+    return result
+
+
+def extract_container(input_path: str, output_dir: str, numbers: Optional[List[int]] = None) -> dict:
+    """Extract the text subtitle tracks of one Matroska file (worker entry point)"""
+    from sub_engine import extract_subtitles
+
+    result = {"input": input_path, "output": output_dir, "status": "ok"}
+    started = time.perf_counter()
+    try:
+        result["tracks"] = extract_subtitles(input_path, output_dir, numbers=numbers)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["elapsed_s"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def hls_dir(output_path: str) -> str:
+    """Directory of the WebVTT segments and playlist of an output (<dir>/<stem>/<stem>.m3u8)"""
+    return os.path.splitext(output_path)[0]
+
+
+def segment_file(input_path: str, output_path: str, segment_ms: int, mpegts: int) -> dict:
+    """Normalize one subtitle file and write it as HLS WebVTT segments (worker entry point)"""
+    import pysubs2
+    from sub_engine import normalize_subtitle, segment_webvtt
+
+    output_dir = hls_dir(output_path)
+    result = {"input": input_path, "output": output_dir, "status": "ok"}
+    started = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            target = os.path.join(work_dir, "clean" + (os.path.splitext(input_path)[1] or ".srt"))
+            normalize_subtitle(input_path, target)
+            subs = pysubs2.load(target, encoding="utf-8", keep_unknown_html_tags=True)
+        segmented = segment_webvtt(subs, output_dir, os.path.basename(output_dir), segment_ms, mpegts=mpegts)
+        written = [path for path in segmented["written"] if path != segmented["playlist"]]
+        result["steps"] = [{"segments": len(segmented["segments"]), "written": len(written)}]
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["elapsed_s"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def run_merge(paths: List[str], output_path: str, step: dict,
+              profile: bool = False, trace_memory: bool = False) -> dict:
+    """Merge the tracks of one episode, in track order (worker entry point)"""
+    import pysubs2
+    from sub_engine import (DEFAULT_MPEGTS, merge_subtitles, merge_tracks, resolve_overlaps, segment_webvtt,
+                            track_settings)
+
+    result = {"inputs": list(paths), "output": output_path, "status": "ok"}
+    started = time.perf_counter()
+    profiler = _profiler(profile, trace_memory)
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with profiler.file(output_path) if profiler else nullcontext():
+            if len(paths) == 2:
+                result["entries"] = merge_subtitles(
+                    paths[0], paths[1], output_path,
+                    threshold_ms=int(step.get("threshold_ms", 1000)),
+                    color_hex=step.get("color_hex", "#ffff54"),
+                    color_track=step.get("color_track", "Track B"),
+                    shift_a=int(step.get("shift_a", 0)),
+                    shift_b=int(step.get("shift_b", 0)),
+                    shift_global=int(step.get("shift_global", 0)),
+                    mode=step.get("mode", "greedy"),
+                )
+            else:
+                tracks = step.get("tracks") or track_settings(
+                    len(paths), step.get("color_hex", "#ffff54"), step.get("color_track", "Track B"),
+                    int(step.get("shift_a", 0)), int(step.get("shift_b", 0)))
+                result["entries"] = merge_tracks(
+                    paths, output_path, tracks,
+                    threshold_ms=int(step.get("threshold_ms", 1000)),
+                    shift_global=int(step.get("shift_global", 0)),
+                )
+            if step.get("overlaps"):
+                merged = pysubs2.load(output_path, encoding="utf-8", keep_unknown_html_tags=True)
+                result["overlaps_changed"] = resolve_overlaps(merged, step["overlaps"])
+                merged.save(output_path, encoding="utf-8")
+                result["entries"] = len(merged)
+            if step.get("hls_segment_ms"):
+                merged = pysubs2.load(output_path, encoding="utf-8", keep_unknown_html_tags=True)
+                output_dir = hls_dir(output_path)
+                result["hls"] = segment_webvtt(merged, output_dir, os.path.basename(output_dir),
+                                               int(step["hls_segment_ms"]),
+                                               mpegts=int(step.get("hls_mpegts", DEFAULT_MPEGTS)))["playlist"]
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["elapsed_s"] = round(time.perf_counter() - started, 4)
+    if profiler:
+        result["stages"] = profiler.records
+    return result
+
+
+def group_tracks(files: List[Tuple[str, str]], track_b: str = "",
+                 languages: Optional[Dict[str, str]] = None) -> Tuple[List[tuple], List[str]]:
+    """
+    Group files by (directory, episode code) and keep the episodes with two or more tracks
+
+    Args:
+        files: (path, path relative to the input root) tuples
+        track_b: Track B keyword, or several keywords giving the track order ("EN,FR,TH")
+        languages: path -> identified language, ranking files whose name carries no keyword
+
+    Returns:
+        Tuple of ([(rel_dir, code, [paths in track order]), ...], [unpaired paths])
+    """
+    from sub_engine import EpisodeIndex, parse_track_keywords
+
+    index = EpisodeIndex(parse_track_keywords(track_b))
+    for path, rel in files:
+        index.add(os.path.basename(rel), path, scope=os.path.dirname(rel), language=(languages or {}).get(path))
+
+    unpaired = [path for _, _, paths in index.leftovers(2) for path in paths]
+    return index.episodes(2), unpaired
+
+
+def merge_episode(paths: List[str], output_path: str, merge_step: dict) -> dict:
+    """
+    Normalize every track and merge them (worker entry point)
+
+    Files whose name carries no track keyword are re-ranked by the language
+    identified while normalizing them, so the roles do not depend on naming.
+    """
+    from sub_engine import parse_track_keywords, track_order
+
+    keywords = parse_track_keywords(merge_step.get("track_b", ""))
+    with tempfile.TemporaryDirectory() as work_dir:
+        tracks = []
+        for idx, path in enumerate(paths):
+            target = os.path.join(work_dir, f"track{idx}.srt")
+            result = run_file_steps(path, target, [{"op": "normalize"}])
+            if result["status"] != "ok":
+                return {"inputs": list(paths), "output": output_path,
+                        "status": "failed", "error": f"{path}: {result['error']}"}
+            language = result["steps"][0]["language"]
+            tracks.append((track_order(os.path.basename(path), keywords, language), idx, path, target, language))
+        tracks.sort()
+        result = run_merge([target for *_, target, _ in tracks], output_path, merge_step)
+        result["inputs"] = [path for _, _, path, _, _ in tracks]
+        result["languages"] = [language for *_, language in tracks]
+        return result
+
+
+@lru_cache(maxsize=8)
+def load_boilerplate(path: str) -> frozenset:
+    """Line keys of a findings file written by the boilerplate command (read once per worker)"""
+    from sub_engine import boilerplate_keys
+    with open(path, "r", encoding="utf-8") as f:
+        return boilerplate_keys(json.load(f)["findings"])
+
+
+def boilerplate_counts(path: str) -> dict:
+    """Normalize one file in a scratch directory and count its lines (worker entry point)"""
+    import pysubs2
+    from sub_engine import file_counts, normalize_subtitle
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        target = os.path.join(work_dir, "clean" + (os.path.splitext(path)[1] or ".srt"))
+        try:
+            normalize_subtitle(path, target)
+            return file_counts(pysubs2.load(target, encoding="utf-8"))
+        except Exception:
+            return {}  # Unreadable files do not vote
+
+
+def analyze_file(path: str, target_script: str = "auto") -> dict:
+    """Corruption report of one file, without repair strategy scores (worker entry point)"""
+    from sub_engine import analyze_corruption
+
+    analysis = analyze_corruption(path, target_script, score_strategies=False)
+    analysis.pop("strategy_scores", None)
+    return analysis